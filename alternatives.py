@@ -0,0 +1,260 @@
+"""This module finds the nearest available alternatives when the number for a word is taken, so that a search
+for 1-800-222-TAXI can offer something close instead of just saying no. Three kinds of alternative are
+looked for:
+
+1. The same word in another place in an available number, as in 1-800-TAXI-222 or 1-800-2-TAXI-22.
+2. The same word spelled with digits that look like its letters: 0 for O, and 1 for I or L, as in
+   1-800-222-C00L. 0 and 1 have no letters on the keypad, so these spell endings that no word can.
+3. Dictionary words a letter or two away from the word (TAXA, TAXIS), whose numbers are available.
+
+Similar words are found with a BK-tree over the digit strings in the word index. A BK-tree files every key
+under its edit distance from its parent, so a search for the keys near a given one only walks the branches
+that can hold them. Every letter edit is at most one digit edit, so the words within n letter edits of a word
+all have digits within n digit edits of its digits: searching the digits finds all of them (along with some
+words that are further off in letters, which are then dropped).
+
+Alternatives are scored like the vanity ranking scores numbers, less a penalty for being further from what was
+asked for, so the best offers come first.
+"""
+
+import threading
+
+import available_num_finder as anf
+import instrumentation
+import word_checker as wc
+from vanity_ranking import score_span
+
+# How many letter edits away a similar word may be. Short words get one edit, since two edits can turn a
+# three or four letter word into almost any other.
+MAX_EDIT_DISTANCE = 2
+MAX_EDIT_DISTANCE_SHORT_WORD = 1
+SHORT_WORD_LENGTH = 4
+# Letters that a digit can stand in for, as in C00L and 1OVE
+DIGIT_LOOKALIKES = {'o': '0', 'i': '1', 'l': '1'}
+# How much is taken off an alternative's score for each way it differs from the word that was asked for
+POINTS_PER_EDIT = -15
+POINTS_PER_LOOKALIKE = -5
+# How many alternatives are offered, best first
+DEFAULT_LIMIT = 10
+
+# What each kind of alternative is called in the results
+KIND_DESCRIPTIONS = {
+    "position": "same word, another place",
+    "lookalike": "spelled with digits",
+    "similar": "similar word",
+}
+
+# The BK-tree of the word index's digit strings, and the index it was built from. Built on first use, and again
+# if the word index is swapped out.
+_digit_tree = None
+_digit_tree_index = None
+_digit_tree_lock = threading.Lock()
+
+def letter_masks(pattern : str) -> dict[str, int]:
+    # Maps each letter of a string to a bitmask of the positions it is found at, for edit_distance_from_masks.
+    masks = {}
+    for position, letter in enumerate(pattern):
+        masks[letter] = masks.get(letter, 0) | (1 << position)
+    return masks
+
+def edit_distance_from_masks(masks : dict[str, int], pattern_length : int, text : str) -> int:
+    # Returns the Levenshtein distance between a pattern (given by its letter_masks) and a text: the fewest
+    # letters that must be inserted, deleted or replaced to turn one into the other. This is Myers' bit-parallel
+    # algorithm, which keeps a whole column of the usual distance table in two bitmasks (where the distance
+    # goes up and where it goes down from one row to the next), so each letter of the text costs a few integer
+    # operations instead of a pass over the pattern.
+    if not pattern_length:
+        return len(text)
+    all_rows = (1 << pattern_length) - 1
+    last_row = 1 << (pattern_length - 1)
+    plus_vertical, minus_vertical = all_rows, 0
+    distance = pattern_length
+    for letter in text:
+        matches = masks.get(letter, 0)
+        crossing_vertical = matches | minus_vertical
+        crossing_horizontal = (((matches & plus_vertical) + plus_vertical) ^ plus_vertical) | matches
+        plus_horizontal = minus_vertical | (~(crossing_horizontal | plus_vertical) & all_rows)
+        minus_horizontal = plus_vertical & crossing_horizontal
+        if plus_horizontal & last_row:
+            distance += 1
+        elif minus_horizontal & last_row:
+            distance -= 1
+        plus_horizontal = ((plus_horizontal << 1) | 1) & all_rows
+        minus_horizontal = (minus_horizontal << 1) & all_rows
+        plus_vertical = minus_horizontal | (~(crossing_vertical | plus_horizontal) & all_rows)
+        minus_vertical = plus_horizontal & crossing_vertical
+    return distance
+
+def edit_distance(first : str, second : str) -> int:
+    # Returns the Levenshtein distance between two strings.
+    return edit_distance_from_masks(letter_masks(first), len(first), second)
+
+"""This class is a BK-tree of strings. Each node is a (key, children) pair, where children maps an edit
+distance to the child whose key is that far from this node's key."""
+class BKTree():
+    def __init__(self, keys=()):
+        self.root = None
+        self.size = 0
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key : str):
+        if self.root is None:
+            self.root = (key, {})
+            self.size = 1
+            return
+        masks = letter_masks(key)
+        node_key, children = self.root
+        while True:
+            distance = edit_distance_from_masks(masks, len(key), node_key)
+            if distance == 0:
+                return          # already in the tree
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (key, {})
+                self.size += 1
+                return
+            node_key, children = child
+
+    def search(self, key : str, radius : int) -> list[tuple[int, str]]:
+        # Returns (distance, key) for every key within `radius` edits of the given one, nearest first. By the
+        # triangle inequality, only children filed between distance - radius and distance + radius from a
+        # node can be close enough, so the other branches are skipped.
+        masks = letter_masks(key)
+        found = []
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node_key, children = nodes.pop()
+            distance = edit_distance_from_masks(masks, len(key), node_key)
+            if distance <= radius:
+                found.append((distance, node_key))
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    nodes.append(child)
+        found.sort()
+        return found
+
+"""This class is one alternative to a number that is not available: the available number, the word it
+spells, where the word sits in the number's last seven digits, what kind of alternative it is and its score."""
+class Alternative():
+    __slots__ = ("phone_num", "word", "start", "stop", "kind", "score")
+
+    def __init__(self, phone_num:str, word:str, start:int, stop:int, kind:str, score:float):
+        self.phone_num = phone_num
+        self.word = word
+        self.start = start
+        self.stop = stop
+        self.kind = kind
+        self.score = score
+
+    def __repr__(self):
+        return f"Alternative({self.phone_num!r}, {self.word!r}, {self.start}, {self.stop}, {self.kind!r}, {self.score})"
+
+    def spelled_number(self) -> str:
+        # Writes the number with its word in place, as in 1-800-TAXI-222.
+        local_digits = self.phone_num[len(anf.PREFIX):]
+        parts = [local_digits[:self.start], self.word.upper(), local_digits[self.stop:]]
+        return "1-800-" + "-".join(part for part in parts if part)
+
+    def as_list(self) -> list:
+        # The alternative's fields in the order Alternative() takes them, for sending as JSON.
+        return [self.phone_num, self.word, self.start, self.stop, self.kind, self.score]
+
+    def describe(self) -> str:
+        return f"{self.spelled_number()}  ({KIND_DESCRIPTIONS[self.kind]})"
+
+def get_digit_tree() -> BKTree:
+    # Returns the BK-tree of the digit strings that spell words, building it from the word index the first
+    # time. Strings too short to be offered on their own are left out.
+    global _digit_tree, _digit_tree_index
+    word_index = wc.get_word_index()
+    if _digit_tree is None or _digit_tree_index is not word_index:
+        with _digit_tree_lock:
+            if _digit_tree is None or _digit_tree_index is not word_index:
+                with instrumentation.measure("alternatives.build_digit_tree"):
+                    _digit_tree = BKTree(digits for digits, _ in word_index.items() if len(digits) >= wc.MIN_SPAN_LENGTH)
+                    _digit_tree_index = word_index
+    return _digit_tree
+
+def find_first_at_each(available_nums, digits : str, stops) -> dict[int, str]:
+    # Finds, for each of the stops, the first available number with the digits just before that position of 
+    # its last seven digits, in a single pass. Returns {stop: number} for the stops that have one. Inventories, 
+    # their indexes and lookup clients have a method for this; a plain list of number strings is scanned.
+    if hasattr(available_nums, "find_first_at_each"):
+        return available_nums.find_first_at_each(digits, stops)
+    wanted = {stop: len(anf.PREFIX) + stop for stop in stops}
+    found = {}
+    for phone_num in available_nums:
+        for stop, end in list(wanted.items()):
+            if phone_num[end - len(digits):end] == digits:
+                found[stop] = phone_num
+                del wanted[stop]
+        if not wanted:
+            break
+    return found
+
+def find_same_word_elsewhere(word : str, digits : str, available_nums) -> list[Alternative]:
+    # Looks for the word everywhere in the last seven digits but the end, where it was not available.
+    alternatives = []
+    for stop, phone_num in sorted(find_first_at_each(available_nums, digits, range(len(digits), anf.LOCAL_DIGITS)).items()):
+        start = stop - len(digits)
+        alternatives.append(Alternative(phone_num, word, start, stop, "position", score_span(start, stop, word, anf.LOCAL_DIGITS)))
+    return alternatives
+
+def find_lookalike_spellings(word : str, available_nums) -> list[Alternative]:
+    # Tries every way of writing the word's O, I and L letters as 0 and 1, at the end of the number.
+    spellings = [""]
+    for letter in word:
+        spellings = [spelling + character for spelling in spellings for character in (letter, DIGIT_LOOKALIKES.get(letter)) if character]
+    alternatives = []
+    for spelling in spellings[1:]:          # the first spelling is the word itself
+        phone_num = wc.search_available_nums_for_word(spelling, available_nums)
+        if phone_num is not None:
+            start = anf.LOCAL_DIGITS - len(spelling)
+            score = score_span(start, anf.LOCAL_DIGITS, word, anf.LOCAL_DIGITS)
+            score += POINTS_PER_LOOKALIKE * sum(letter != character for letter, character in zip(word, spelling))
+            alternatives.append(Alternative(phone_num, spelling, start, anf.LOCAL_DIGITS, "lookalike", score))
+    return alternatives
+
+def find_similar_words(word : str, digits : str, available_nums) -> list[Alternative]:
+    # Looks for dictionary words a few letters away from the word that are available at the end of a number.
+    max_distance = MAX_EDIT_DISTANCE_SHORT_WORD if len(word) <= SHORT_WORD_LENGTH else MAX_EDIT_DISTANCE
+    word_index = wc.get_word_index()
+    alternatives = []
+    for _, similar_digits in get_digit_tree().search(digits, max_distance):
+        if similar_digits == digits:
+            continue            # spelled by the same digits, so no more available than the word itself
+        phone_num = wc.search_available_nums_for_word(similar_digits, available_nums)
+        if phone_num is None:
+            continue
+        start = anf.LOCAL_DIGITS - len(similar_digits)
+        for similar_word in word_index.get(similar_digits, ()):
+            distance = edit_distance(word, similar_word)
+            if distance <= max_distance:
+                score = score_span(start, anf.LOCAL_DIGITS, similar_word, anf.LOCAL_DIGITS) + POINTS_PER_EDIT * distance
+                alternatives.append(Alternative(phone_num, similar_word, start, anf.LOCAL_DIGITS, "similar", score))
+    return alternatives
+
+@instrumentation.timed("alternatives.find_alternatives")
+def find_alternatives(word : str, available_nums, limit : int = DEFAULT_LIMIT) -> list[Alternative]:
+    # Returns up to `limit` available alternatives to a word, best first, with at most one per number. The
+    # available numbers can be a list of number strings or an available_num_finder inventory or index. A 
+    # lookup_server.LookupClient has the server find them.
+    if hasattr(available_nums, "find_alternatives"):
+        return available_nums.find_alternatives(word, limit)
+    word = word.strip().lower()
+    digits = wc.find_num_for_word(word)
+    if not digits or len(digits) > anf.LOCAL_DIGITS or len(digits) != len(word):
+        return []           # blank, too long, or has characters that are not on the keypad
+    alternatives = find_same_word_elsewhere(word, digits, available_nums)
+    alternatives += find_lookalike_spellings(word, available_nums)
+    if word.isalpha() and len(digits) >= wc.MIN_SPAN_LENGTH:
+        alternatives += find_similar_words(word, digits, available_nums)
+
+    best_by_number = {}
+    for alternative in sorted(alternatives, key=lambda alternative: (-alternative.score, alternative.phone_num, alternative.word)):
+        best_by_number.setdefault(alternative.phone_num, alternative)
+    return list(best_by_number.values())[:limit]
@@ -1,34 +1,649 @@
 """This program simulates finding available 1-800 phone numbers, by making numbers up. It 
-can make up a long run of phone numbers and make a short run that is a subset of a long run.
+can make up a long run of phone numbers and make a short run that is a subset of a long run. It can also 
+index a run of numbers by their endings, so that searches for an ending do not have to scan the run.
+
+A real inventory can be loaded instead from a flat file of numbers, one a line. Set HELPER_INVENTORY to its 
+path to have the app use it.
 """
 
+import itertools
+import mmap
+import os
 import random
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+
+import instrumentation
+
+try:        # numpy is optional. Without it, endings are matched one number at a time.
+    import numpy as np
+except ImportError:
+    np = None
+
+# Every available number shares this prefix, so only the last seven digits are stored.
+PREFIX = "1800"
+LOCAL_DIGITS = 7
+LOCAL_RANGE = 10 ** LOCAL_DIGITS
+# Gives every inventory its own serial number, so caches can tell inventories apart. See PhoneInventory.cache_key.
+_inventory_serials = itertools.count()
+# How many recent changes an inventory remembers, so that diff() can replay them instead of comparing everything.
+CHANGE_LOG_LENGTH = 10000
+# A flat file of available numbers to use in place of made-up ones
+INVENTORY_PATH = os.environ.get("HELPER_INVENTORY")
+# Fixed-width inventory files are checked this many lines at a time, which bounds the memory used
+FILE_BLOCK_LINES = 1 << 18
+# Looking for digits in the middle of the numbers scans this many stored numbers at a time, and stops at the 
+# first block with a match, so a common word is found without reading the whole inventory
+SCAN_BLOCK_NUMBERS = 1 << 16
+# The ending index keeps a number's slot in the low bits of each of its keys. Every slot is below 2**24.
+SLOT_BITS = 24
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+# Throws an exception when a number cannot be stored in an inventory.
+class InvalidInventoryNumberError(Exception):
+    def __init__(self, message="The input is not a 1-800 phone number"):
+        self.message = message
+        super().__init__(self.message)
+
+def to_local_number(phone_num) -> int:
+    # Turns "18002278779", "8002278779" or "2278779" (or an int of the last seven digits) into the int 2278779.
+    if isinstance(phone_num, int) and 0 <= phone_num < LOCAL_RANGE:
+        return phone_num
+    if isinstance(phone_num, str) and phone_num.isdigit():
+        if len(phone_num) == LOCAL_DIGITS + len(PREFIX) and phone_num.startswith(PREFIX):
+            return int(phone_num[len(PREFIX):])
+        if len(phone_num) == LOCAL_DIGITS + len(PREFIX) - 1 and phone_num.startswith(PREFIX[1:]):
+            return int(phone_num[len(PREFIX) - 1:])
+        if len(phone_num) == LOCAL_DIGITS:
+            return int(phone_num)
+    raise InvalidInventoryNumberError(f"{phone_num!r} is not a 1-800 phone number")
+
+def format_local_number(local_num:int) -> str:
+    # Turns the int 2278779 back into the string "18002278779".
+    return f"{PREFIX}{local_num:07d}"
+
+def local_suffix(suffix:str) -> tuple[int, int]|None:
+    # Turns an ending into (modulus, remainder) over the stored ints, so that a number ends with it when 
+    # local_num % modulus == remainder. Returns None when no 1-800 number can end that way.
+    if not suffix.isdigit() and suffix != "":
+        return None
+    if len(suffix) > LOCAL_DIGITS:
+        if not PREFIX.endswith(suffix[:-LOCAL_DIGITS]):
+            return None
+        suffix = suffix[-LOCAL_DIGITS:]
+    return 10 ** len(suffix), int(suffix or "0")
+
+def scan_first_at(local_numbers, digits:str, stop:int) -> int|None:
+    # Returns the first stored int (from a numpy array, or any sequence of ints) whose seven digits have the 
+    # given digits just before position `stop`, or None.
+    return scan_first_at_each(local_numbers, digits, [stop]).get(stop)
+
+def scan_first_at_each(local_numbers, digits:str, stops) -> dict[int, int]:
+    # Like scan_first_at for several stops at once, in a single pass: returns {stop: first stored int with the 
+    # digits there} for the stops that have one. A numpy array is checked a block at a time, and the scan ends 
+    # as soon as every stop has been found.
+    if not digits.isdigit():
+        return {}
+    modulus, remainder = 10 ** len(digits), int(digits)
+    divisors = {stop: 10 ** (LOCAL_DIGITS - stop) for stop in stops if len(digits) <= stop <= LOCAL_DIGITS}
+    found = {}
+    if np is not None and isinstance(local_numbers, np.ndarray):
+        for block_start in range(0, len(local_numbers), SCAN_BLOCK_NUMBERS):
+            block = local_numbers[block_start:block_start + SCAN_BLOCK_NUMBERS]
+            for stop, divisor in list(divisors.items()):
+                positions = np.flatnonzero(block // divisor % modulus == remainder)
+                if len(positions):
+                    found[stop] = int(block[positions[0]])
+                    del divisors[stop]
+            if not divisors:
+                break
+        return found
+    for local_num in local_numbers:
+        for stop, divisor in list(divisors.items()):
+            if local_num // divisor % modulus == remainder:
+                found[stop] = local_num
+                del divisors[stop]
+        if not divisors:
+            break
+    return found
+
+def parse_local_number(line:bytes) -> int|None:
+    # The bytes form of to_local_number, for reading files: takes a line like b"1-800-227-8779\n" and returns 
+    # 2278779, or None if it is not a 1-800 number.
+    digits = line.strip().replace(b"-", b"")
+    if not digits.isdigit():
+        return None
+    if len(digits) == LOCAL_DIGITS + len(PREFIX) and digits.startswith(PREFIX.encode()):
+        return int(digits[len(PREFIX):])
+    if len(digits) == LOCAL_DIGITS + len(PREFIX) - 1 and digits.startswith(PREFIX[1:].encode()):
+        return int(digits[len(PREFIX) - 1:])
+    if len(digits) == LOCAL_DIGITS:
+        return int(digits)
+    return None
 
-"""This class 'retrieves' numbers by making them up."""
+def generate_local_numbers(count:int, generator=random):
+    # Returns `count` different ints of last seven digits, picked at random: a numpy int32 array, or an 
+    # array of ints without numpy. Pass a seeded random.Random as the generator to get the same ones every time.
+    if not 0 <= count <= LOCAL_RANGE:
+        raise ValueError(f"count must be between 0 and {LOCAL_RANGE}, not {count}")
+    if np is not None:
+        numpy_generator = np.random.default_rng(generator.getrandbits(64))
+        return numpy_generator.choice(LOCAL_RANGE, size=count, replace=False).astype(np.int32)
+    return array("i", generator.sample(range(LOCAL_RANGE), count))
+
+def _read_fixed_width_lines(mapped:mmap.mmap) -> tuple[list, int, int]|None:
+    # Reads a file in which every line is an 11 digit number ("18002278779\n", or with "\r\n") as blocks of 
+    # numpy rows, checking and converting a whole block at once. Returns (arrays of ints, lines read, invalid 
+    # lines), or None if the file is not laid out that way, in which case it is read line by line.
+    width = mapped.find(b"\n") + 1
+    line_ending = b"\r\n" if width == len(PREFIX) + LOCAL_DIGITS + 2 else b"\n"
+    if np is None or width - len(line_ending) != len(PREFIX) + LOCAL_DIGITS or len(mapped) % width:
+        return None
+    rows = np.frombuffer(mapped, dtype=np.uint8).reshape(-1, width)
+    place_values = 10 ** np.arange(LOCAL_DIGITS - 1, -1, -1, dtype=np.int64)
+    local_arrays = []
+    invalid = 0
+    for block_start in range(0, len(rows), FILE_BLOCK_LINES):
+        block = rows[block_start:block_start + FILE_BLOCK_LINES]
+        if not (block[:, -len(line_ending):] == np.frombuffer(line_ending, dtype=np.uint8)).all():
+            return None         # a line of another length has put the rows out of step
+        digits = block[:, :len(PREFIX) + LOCAL_DIGITS]
+        valid = ((digits >= ord("0")) & (digits <= ord("9"))).all(axis=1) & (digits[:, :len(PREFIX)] == np.frombuffer(PREFIX.encode(), dtype=np.uint8)).all(axis=1)
+        invalid += int(len(block) - valid.sum())
+        local_arrays.append(((digits[valid, len(PREFIX):].astype(np.int64) - ord("0")) @ place_values).astype(np.int32))
+    return local_arrays, len(rows), invalid
+
+def load_inventory_file(path:str) -> tuple["PhoneInventory", dict[str, int]]:
+    # Loads a flat file of available numbers, one a line, into an inventory. The file is memory-mapped, and 
+    # only ints are kept (never a string per number), so files of millions of numbers load quickly. Lines 
+    # that are not 1-800 numbers are skipped, and repeats are dropped. Returns the inventory and counts of 
+    # the lines, numbers, invalid lines and duplicates.
+    with open(path, "rb") as inventory_file:
+        if os.fstat(inventory_file.fileno()).st_size == 0:
+            return PhoneInventory(), {"lines": 0, "numbers": 0, "invalid": 0, "duplicates": 0}
+        with mmap.mmap(inventory_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            fixed_width = _read_fixed_width_lines(mapped)
+            if fixed_width is not None:
+                local_arrays, lines, invalid = fixed_width
+                local_numbers = np.concatenate(local_arrays) if local_arrays else np.zeros(0, dtype=np.int32)
+            else:
+                local_numbers = array("i")
+                lines = invalid = 0
+                for line in iter(mapped.readline, b""):
+                    if not line.strip():
+                        continue
+                    lines += 1
+                    local_num = parse_local_number(line)
+                    if local_num is None:
+                        invalid += 1
+                    else:
+                        local_numbers.append(local_num)
+    inventory = PhoneInventory.from_local_numbers(local_numbers)
+    stats = {"lines": lines, "numbers": len(inventory), "invalid": invalid, "duplicates": len(local_numbers) - len(inventory)}
+    return inventory, stats
+
+"""This class 'retrieves' numbers by making them up, or by loading them from a file. Give it a seed to make up 
+the same numbers every time."""
 class NumberRetrieval():
-    def __init__(self):
+    def __init__(self, seed=None):
 
         self.SHORT_RUN = 20
         self.LONG_RUN = 20000
+        self.random = random.Random(seed)
 
+    @instrumentation.timed("number_retrieval.get_available_phone_nums_short")
     def get_available_phone_nums_short(self, long_list) -> list[str]:
 
-        # Creates a long list of randomly generated 1-800 phone numbers. 
+        # Picks SHORT_RUN different numbers at random from the list passed to it (or from an inventory).
+        # Designed to be used on the output of the "long" function. Only the picked numbers are touched, 
+        # so this takes the same time however long the list is.
 
-        available_phone_nums = []
-        for i in range(self.SHORT_RUN):
-            available_phone_nums.append(str(random.choice(long_list)))
-        return available_phone_nums
+        if hasattr(long_list, "sample"):
+            return long_list.sample(self.SHORT_RUN, self.random)
+        return [str(phone_num) for phone_num in self.random.sample(long_list, min(self.SHORT_RUN, len(long_list)))]
 
+    @instrumentation.timed("number_retrieval.get_available_phone_nums_long")
     def get_available_phone_nums_long(self) -> list[str]:
 
-        # Makes a short list of phone numbers that is a subset of the list passed to it.
-        # Designed to be used on the output of the "long" function.
-        
-        available_phone_nums = []
-        for i in range(self.LONG_RUN):
-            available_phone_nums.append(str(random.randint(18000000000, 18009999999)))
-        return available_phone_nums
+        # Creates a long list of LONG_RUN different, randomly generated 1-800 phone numbers.
+
+        return [format_local_number(local_num) for local_num in generate_local_numbers(self.LONG_RUN, self.random).tolist()]
+
+    @instrumentation.timed("number_retrieval.generate_inventory")
+    def generate_inventory(self, count:int|None = None) -> "PhoneInventory":
+
+        # Like get_available_phone_nums_long, but builds the inventory in one go without making a string 
+        # for every number, so it can make up all ten million numbers if asked to.
+
+        return PhoneInventory.from_local_numbers(generate_local_numbers(self.LONG_RUN if count is None else count, self.random))
+
+    @instrumentation.timed("number_retrieval.load_available_phone_nums")
+    def load_available_phone_nums(self, path:str) -> "PhoneInventory":
+
+        # Loads a real inventory from a flat file. See load_inventory_file.
+
+        return load_inventory_file(path)[0]
+
+    def get_inventory(self) -> "PhoneInventory":
+
+        # Returns the inventory the app should use: the file at HELPER_INVENTORY if it is set, otherwise 
+        # made-up numbers.
+
+        if INVENTORY_PATH:
+            return self.load_available_phone_nums(INVENTORY_PATH)
+        return self.generate_inventory()
+
+    @instrumentation.timed("number_retrieval.index_available_phone_nums")
+    def index_available_phone_nums(self, long_list) -> "AvailabilityIndex":
+
+        # Builds the suffix index for a list of numbers (or an inventory). Meant to be called once on the 
+        # output of the "long" function and then used in place of the list. An index is returned as it is, 
+        # rather than being indexed again.
+
+        if isinstance(long_list, AvailabilityIndex):
+            return long_list
+        return AvailabilityIndex(long_list)
+
+"""This class is a copy of an inventory's numbers at one moment, to compare the inventory against later with 
+PhoneInventory.diff()."""
+class InventorySnapshot():
+    def __init__(self, inventory):
+        self.serial = inventory.serial
+        self.version = inventory.version
+        self.local_numbers = array("i", inventory.local_numbers)
+
+    def __len__(self):
+        return len(self.local_numbers)
+
+    def __iter__(self):
+        for local_num in self.local_numbers:
+            yield format_local_number(local_num)
+
+"""This class holds a set of available numbers compactly. Each number is stored as the int of its last seven 
+digits in an array (4 bytes a number), and a bitmap over all ten million possible numbers answers membership. 
+It can be used like the list of strings returned by NumberRetrieval: it iterates, indexes and samples as 
+formatted number strings, which are made only when asked for.
+
+Numbers can be added, removed and marked sold one at a time. Removing moves the last stored number into the 
+freed slot, so it costs O(1) once the inventory has built a map from numbers to their slots (on the first 
+removal). Every change is passed to the inventory's listeners as listener(event, phone_num), with event 
+"added", "removed" or "sold", so that indexes, caches and rankings built on the inventory can update 
+themselves instead of being rebuilt.
+
+Scans look at the stored ints through a numpy view, and the array cannot grow or shrink while a view of it 
+is alive. So scans and changes take the inventory's lock, and a scan drops its view before letting go."""
+class PhoneInventory():
+    def __init__(self, available_nums=()):
+        self.local_numbers = array("i")
+        self.bitmap = bytearray(LOCAL_RANGE // 8)
+        self.serial = next(_inventory_serials)
+        self.version = 0        # goes up whenever the numbers change
+        self.listeners = []
+        self.changes = deque(maxlen=CHANGE_LOG_LENGTH)     # (version, event, local_num) for recent changes
+        self.positions = None   # local_num -> slot in local_numbers, built on the first removal
+        self.lock = threading.RLock()       # held while the stored ints are scanned or changed
+        for phone_num in available_nums:
+            self.add(phone_num)
+
+    @classmethod
+    def from_local_numbers(cls, local_numbers) -> "PhoneInventory":
+        # Builds an inventory from ints of last seven digits in one go, keeping the first of any repeats. Much 
+        # faster than adding a whole inventory one number at a time, and no events are sent.
+        inventory = cls()
+        if np is not None:
+            local_array = np.asarray(local_numbers if hasattr(local_numbers, "__len__") else list(local_numbers), dtype=np.int64)
+            if len(local_array) and (local_array.min() < 0 or local_array.max() >= LOCAL_RANGE):
+                raise InvalidInventoryNumberError("Every local number must have at most seven digits")
+            unique_numbers, first_positions = np.unique(local_array, return_index=True)
+            if len(unique_numbers) != len(local_array):
+                local_array = local_array[np.sort(first_positions)]
+            bitmap = np.zeros(LOCAL_RANGE // 8, dtype=np.uint8)
+            np.bitwise_or.at(bitmap, local_array >> 3, (1 << (local_array & 7)).astype(np.uint8))
+            inventory.bitmap = bytearray(bitmap.tobytes())
+            inventory.local_numbers = array("i", local_array.astype(np.int32).tobytes())
+            return inventory
+        bitmap = inventory.bitmap
+        for local_num in local_numbers:
+            local_num = to_local_number(int(local_num))
+            if not bitmap[local_num >> 3] & (1 << (local_num & 7)):
+                bitmap[local_num >> 3] |= 1 << (local_num & 7)
+                inventory.local_numbers.append(local_num)
+        return inventory
+
+    @property
+    def cache_key(self) -> int:
+        # Identifies this inventory. It does not change when the numbers do: listeners are told about each 
+        # change instead, so that only the cached answers it affects have to be dropped.
+        return self.serial
+
+    def subscribe(self, listener):
+        # Calls listener(event, phone_num) after every change to the inventory, on the thread that made it.
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def _changed(self, event:str, local_num:int):
+        self.version += 1
+        self.changes.append((self.version, event, local_num))
+        if self.listeners:
+            phone_num = format_local_number(local_num)
+            for listener in list(self.listeners):
+                listener(event, phone_num)
+
+    def __len__(self):
+        return len(self.local_numbers)
+
+    def __iter__(self):
+        for local_num in self.local_numbers:
+            yield format_local_number(local_num)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [format_local_number(local_num) for local_num in self.local_numbers[position]]
+        return format_local_number(self.local_numbers[position])
+
+    def __contains__(self, phone_num):
+        try:
+            local_num = to_local_number(phone_num)
+        except InvalidInventoryNumberError:
+            return False
+        return bool(self.bitmap[local_num >> 3] & (1 << (local_num & 7)))
+
+    def add(self, phone_num) -> bool:
+        # Adds a number to the inventory. Returns False if it was already there.
+        local_num = to_local_number(phone_num)
+        with self.lock:
+            if self.bitmap[local_num >> 3] & (1 << (local_num & 7)):
+                return False
+            self.local_numbers.append(local_num)        # the only step that can fail, so it goes first
+            self.bitmap[local_num >> 3] |= 1 << (local_num & 7)
+            if self.positions is not None:
+                self.positions[local_num] = len(self.local_numbers) - 1
+            self._changed("added", local_num)
+        return True
+
+    def remove(self, phone_num, event:str = "removed") -> bool:
+        # Takes a number out of the inventory. Returns False if it was not there.
+        local_num = to_local_number(phone_num)
+        with self.lock:
+            if not self.bitmap[local_num >> 3] & (1 << (local_num & 7)):
+                return False
+            if self.positions is None:
+                self.positions = {stored_num: position for position, stored_num in enumerate(self.local_numbers)}
+            position = self.positions[local_num]
+            last_num = self.local_numbers.pop()         # the only step that can fail, so it goes first
+            if last_num != local_num:       # fill the freed slot with the last number
+                self.local_numbers[position] = last_num
+                self.positions[last_num] = position
+            del self.positions[local_num]
+            self.bitmap[local_num >> 3] &= ~(1 << (local_num & 7))
+            self._changed(event, local_num)
+        return True
+
+    def mark_sold(self, phone_num) -> bool:
+        # Removes a number that has just been bought.
+        return self.remove(phone_num, "sold")
+
+    def snapshot(self) -> InventorySnapshot:
+        with self.lock:
+            return InventorySnapshot(self)
+
+    def diff(self, snapshot:InventorySnapshot) -> tuple[list[str], list[str]]:
+        # Returns (numbers added, numbers removed or sold) since the snapshot was taken. Recent changes are 
+        # replayed from the change log; if the snapshot is older than the log, the two sets of numbers are 
+        # compared instead.
+        if snapshot.serial != self.serial:
+            raise ValueError("The snapshot was taken of a different inventory")
+        oldest_logged = self.changes[0][0] if self.changes else self.version + 1
+        if snapshot.version + 1 >= oldest_logged:
+            added, removed = {}, {}         # dicts keep the order of the changes
+            for version, event, local_num in self.changes:
+                if version <= snapshot.version:
+                    continue
+                if event == "added":
+                    if local_num in removed:
+                        del removed[local_num]      # removed and put back
+                    else:
+                        added[local_num] = None
+                elif local_num in added:
+                    del added[local_num]            # added and taken out again
+                else:
+                    removed[local_num] = None
+        else:
+            old_numbers = set(snapshot.local_numbers)
+            added = [local_num for local_num in self.local_numbers if local_num not in old_numbers]
+            new_numbers = set(self.local_numbers)
+            removed = [local_num for local_num in snapshot.local_numbers if local_num not in new_numbers]
+        return [format_local_number(local_num) for local_num in added], [format_local_number(local_num) for local_num in removed]
+
+    def as_numpy(self):
+        # Returns the stored ints as a numpy int32 array that shares memory with the inventory, or None 
+        # without numpy. Hold the inventory's lock for as long as the array is alive: the inventory cannot 
+        # grow or shrink while it is shared.
+        if np is None:
+            return None
+        return np.frombuffer(self.local_numbers, dtype=np.int32)
+
+    def local_suffix(self, suffix:str) -> tuple[int, int]|None:
+        return local_suffix(suffix)
+
+    def _find_local_numbers(self, suffix:str, first_only:bool) -> list[int]:
+        # Finds the stored ints of the numbers that end with the suffix, in order.
+        local_suffix = self.local_suffix(suffix)
+        if local_suffix is None:
+            return []
+        modulus, remainder = local_suffix
+        if modulus == LOCAL_RANGE:      # the whole number was given, so the bitmap can answer
+            return [remainder] if self.bitmap[remainder >> 3] & (1 << (remainder & 7)) else []
+        if np is not None:
+            with self.lock:
+                local_array = self.as_numpy()
+                positions = np.flatnonzero(local_array % modulus == remainder)
+                local_numbers = local_array[positions[:1] if first_only else positions].tolist()
+                del local_array
+            return local_numbers
+        local_numbers = []
+        for local_num in self.local_numbers:
+            if local_num % modulus == remainder:
+                local_numbers.append(local_num)
+                if first_only:
+                    break
+        return local_numbers
+
+    def find_all(self, suffix:str) -> list[str]:
+        # Returns every number that ends with the suffix, by checking the stored ints with modular arithmetic.
+        return [format_local_number(local_num) for local_num in self._find_local_numbers(suffix, False)]
+
+    def find_first(self, suffix:str) -> str|None:
+        # Returns the first number that ends with the suffix, or None if there isn't one.
+        local_numbers = self._find_local_numbers(suffix, True)
+        return format_local_number(local_numbers[0]) if local_numbers else None
+
+    def find_first_at(self, digits:str, stop:int) -> str|None:
+        # Returns the first number whose last seven digits have the given digits just before position `stop`, 
+        # as in 1-800-MOVE-222 for "6683" and stop 4, or None. find_first is the case stop=LOCAL_DIGITS.
+        with self.lock:
+            local_array = self.as_numpy()
+            local_num = scan_first_at(self.local_numbers if local_array is None else local_array, digits, stop)
+            del local_array
+        return None if local_num is None else format_local_number(local_num)
+
+    def find_first_at_each(self, digits:str, stops) -> dict[int, str]:
+        # Does find_first_at for several stops in one pass over the numbers. Returns {stop: number} for the 
+        # stops that have one.
+        with self.lock:
+            local_array = self.as_numpy()
+            found = scan_first_at_each(self.local_numbers if local_array is None else local_array, digits, stops)
+            del local_array
+        return {stop: format_local_number(local_num) for stop, local_num in found.items()}
+
+    def sample(self, count:int, generator=random) -> list[str]:
+        # Returns up to count different numbers picked at random, in O(count). Only the picked numbers are formatted.
+        positions = generator.sample(range(len(self.local_numbers)), min(count, len(self.local_numbers)))
+        return [format_local_number(self.local_numbers[position]) for position in positions]
+
+"""This class holds an inventory of available numbers along with an index of their endings. For each ending 
+length from 3 to 6 digits, a sorted array of ints holds one key per stored number: the number's ending, shifted 
+above the slot the number is stored in. The numbers with an ending sit together in that array, in the order the 
+inventory stores them, so finding the first number for a word is a binary search (a full 7 digit ending is 
+answered by the inventory's bitmap), and the index costs 32 bytes a number. It can be used like the inventory 
+it wraps, and it finds the same first number the inventory would. The index listens to the inventory, so each 
+number added, removed or sold is filed or unfiled under its endings, however the change was made; a change 
+moves the tail of each array along in memory, and does no Python work per stored number. Call close() when an 
+index of an inventory that outlives it is no longer needed, so that the inventory stops updating it."""
+class AvailabilityIndex():
+    MIN_SUFFIX_LENGTH = 3
+    MAX_SUFFIX_LENGTH = 6
+
+    def __init__(self, available_nums=()):
+        self.inventory = available_nums if isinstance(available_nums, PhoneInventory) else PhoneInventory(available_nums)
+        with self.inventory.lock:
+            self.suffixes = {length: self._build_keys(length) for length in range(self.MIN_SUFFIX_LENGTH, self.MAX_SUFFIX_LENGTH + 1)}
+            self.inventory.subscribe(self._on_change)
+
+    def __iter__(self):
+        return iter(self.inventory)
+
+    def __len__(self):
+        return len(self.inventory)
+
+    def __getitem__(self, position):
+        return self.inventory[position]
+
+    def __contains__(self, phone_num):
+        return phone_num in self.inventory
+
+    @property
+    def cache_key(self) -> int:
+        return self.inventory.cache_key
+
+    @property
+    def version(self) -> int:
+        return self.inventory.version
+
+    @property
+    def lock(self):
+        return self.inventory.lock
+
+    def _build_keys(self, length:int) -> array:
+        # Returns the sorted keys of every stored number's ending of the given length.
+        modulus = 10 ** length
+        local_array = self.inventory.as_numpy()
+        if local_array is None:         # no numpy
+            return array("q", sorted((local_num % modulus) << SLOT_BITS | slot for slot, local_num in enumerate(self.inventory.local_numbers)))
+        keys = (local_array.astype(np.int64) % modulus) << SLOT_BITS | np.arange(len(local_array), dtype=np.int64)
+        del local_array
+        keys.sort()
+        return array("q", keys.tobytes())
+
+    def _first_key_position(self, length:int, ending:int) -> int:
+        # Returns where the keys for an ending start in the array for its length.
+        return bisect_left(self.suffixes[length], ending << SLOT_BITS)
+
+    def _slots_for(self, ending:int, length:int, first_only:bool) -> list[int]:
+        # Returns the slots of the stored numbers with the given ending, in the inventory's order.
+        keys = self.suffixes[length]
+        position = self._first_key_position(length, ending)
+        stop = position + 1 if first_only else bisect_left(keys, (ending + 1) << SLOT_BITS)
+        return [key & SLOT_MASK for key in keys[position:stop] if key >> SLOT_BITS == ending]
+
+    def _file(self, local_num:int, slot:int):
+        for length, keys in self.suffixes.items():
+            insort(keys, (local_num % 10 ** length) << SLOT_BITS | slot)
+
+    def _unfile(self, local_num:int, slot:int):
+        for length, keys in self.suffixes.items():
+            del keys[bisect_left(keys, (local_num % 10 ** length) << SLOT_BITS | slot)]
+
+    def _moved_into(self, local_num:int, last_slot:int) -> int|None:
+        # Removing a number moves the inventory's last number, from last_slot, into the freed slot. Returns 
+        # that slot, which is the one filed under the removed number's longest ending that now holds a number 
+        # with another ending. Returns None if nothing moved, or if the moved number has the same endings, in 
+        # which case the keys of the freed slot are still right.
+        modulus = 10 ** self.MAX_SUFFIX_LENGTH
+        ending = local_num % modulus
+        for slot in self._slots_for(ending, self.MAX_SUFFIX_LENGTH, False):
+            if slot < last_slot and self.inventory.local_numbers[slot] % modulus != ending:
+                return slot
+        return None
+
+    def _on_change(self, event:str, phone_num:str):
+        # Runs while the inventory's lock is held, right after the change, so the inventory's slots can be read.
+        local_num = to_local_number(phone_num)
+        stored_count = len(self.inventory.local_numbers)
+        if event == "added":            # added in the last slot
+            self._file(local_num, stored_count - 1)
+            return
+        freed_slot = self._moved_into(local_num, stored_count)
+        if freed_slot is None:
+            self._unfile(local_num, stored_count)
+        else:
+            moved_num = self.inventory.local_numbers[freed_slot]
+            self._unfile(local_num, freed_slot)
+            self._unfile(moved_num, stored_count)
+            self._file(moved_num, freed_slot)
+
+    def close(self):
+        # Stops listening to the inventory. The index no longer follows its changes, so it should not be used 
+        # after this.
+        if self._on_change in self.inventory.listeners:
+            self.inventory.unsubscribe(self._on_change)
+
+    def subscribe(self, listener):
+        self.inventory.subscribe(listener)
+
+    def unsubscribe(self, listener):
+        self.inventory.unsubscribe(listener)
+
+    def add(self, phone_num) -> bool:
+        # Adds a number to the inventory, which files it under each of its endings.
+        return self.inventory.add(phone_num)
+
+    def remove(self, phone_num, event:str = "removed") -> bool:
+        return self.inventory.remove(phone_num, event)
+
+    def mark_sold(self, phone_num) -> bool:
+        return self.inventory.mark_sold(phone_num)
+
+    def snapshot(self) -> InventorySnapshot:
+        return self.inventory.snapshot()
+
+    def diff(self, snapshot:InventorySnapshot) -> tuple[list[str], list[str]]:
+        return self.inventory.diff(snapshot)
+
+    def find_all(self, suffix:str) -> list[str]:
+        # Returns every number that ends with the suffix. Endings that are not indexed are left to the inventory.
+        if len(suffix) in self.suffixes and suffix.isdigit():
+            with self.inventory.lock:
+                return [format_local_number(self.inventory.local_numbers[slot]) for slot in self._slots_for(int(suffix), len(suffix), False)]
+        return self.inventory.find_all(suffix)
+
+    def find_first(self, suffix:str) -> str|None:
+        # Returns the first number that ends with the suffix, or None if there isn't one.
+        if len(suffix) in self.suffixes and suffix.isdigit():
+            with self.inventory.lock:
+                slots = self._slots_for(int(suffix), len(suffix), True)
+                return format_local_number(self.inventory.local_numbers[slots[0]]) if slots else None
+        return self.inventory.find_first(suffix)
+
+    def find_first_at(self, digits:str, stop:int) -> str|None:
+        # Endings are answered by the index. Digits in the middle of a number are left to the inventory.
+        if stop == LOCAL_DIGITS:
+            return self.find_first(digits)
+        return self.inventory.find_first_at(digits, stop)
+
+    def find_first_at_each(self, digits:str, stops) -> dict[int, str]:
+        stops = list(stops)
+        found = self.inventory.find_first_at_each(digits, [stop for stop in stops if stop != LOCAL_DIGITS])
+        if LOCAL_DIGITS in stops and (phone_num := self.find_first(digits)) is not None:
+            found[LOCAL_DIGITS] = phone_num
+        return found
+
+    def sample(self, count:int, generator=random) -> list[str]:
+        return self.inventory.sample(count, generator)
 
 if __name__ == "__main__":
     test_instance = NumberRetrieval()
@@ -0,0 +1,236 @@
+"""This program runs the 1-800 Helper's lookups over whole files, without the window. It never imports
+tkinter or the ChatGPT key, and the spell checker is only loaded if the word index has to be built, so it
+starts quickly and can run on a server.
+
+It has two modes:
+
+- words: for each candidate word, finds the digits that spell it and the first available number ending in
+  them.
+- numbers: for each phone number, finds the words it spells. --workers spreads this over several processes,
+  in which case rows come out in the order they finish rather than the order they went in. Words mode
+  searches the inventory for a whole batch of words at once in one process, so it takes no --workers.
+
+Input and output are read and written one line at a time, so files of any length use the same memory. Input
+can be plain lines, CSV (the first column, or the one named with --field) or JSON lines (a string per line, or
+an object with the --field key). Formats are guessed from the file extensions, and "-" means stdin or stdout.
+Input that cannot be used (a number with letters in it, or a JSON line without the field) gets a row with an
+error instead of stopping the run.
+
+    python batch_cli.py words candidates.txt --inventory numbers.txt --output results.csv
+    python batch_cli.py numbers numbers.jsonl --workers 4 --output words.jsonl
+
+The same lookups can be used from other code through lookup_words() and lookup_numbers().
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from itertools import islice
+
+import available_num_finder as anf
+import word_checker as wc
+
+FORMATS = ["lines", "csv", "jsonl"]
+# Words are looked up in batches of this many, so that the batch search can be used without reading the whole input
+WORD_BATCH_SIZE = 1000
+# The columns written in each mode
+WORD_FIELDS = ["word", "digits", "number", "error"]
+NUMBER_FIELDS = ["number", "words", "error"]
+DEFAULT_FIELDS = {"words": "word", "numbers": "number"}
+
+def guess_format(path:str, default:str) -> str:
+    # Picks a format from a file's extension.
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".txt":
+        return "lines"
+    return default
+
+"""This class stands in for a line of input that holds no usable value, so that it can be reported in the
+output instead of stopping the run."""
+class InvalidRecord():
+    def __init__(self, message:str):
+        self.message = message
+
+    def __eq__(self, other):
+        return isinstance(other, InvalidRecord) and other.message == self.message
+
+    def __repr__(self):
+        return f"InvalidRecord({self.message!r})"
+
+def read_values(lines, input_format:str, field:str|None = None):
+    # Yields one value (a word or a phone number) from each line of input. Blank lines are skipped, and a 
+    # JSON line that is not valid JSON or lacks the field is yielded as an InvalidRecord.
+    if input_format == "csv":
+        rows = csv.reader(lines)
+        column = 0
+        if field is not None:       # the first row is a header naming the columns
+            header = next(rows, [])
+            if field not in header:
+                raise ValueError(f"The CSV input has no {field!r} column")
+            column = header.index(field)
+        for row in rows:
+            if len(row) > column and row[column].strip():
+                yield row[column].strip()
+    elif input_format == "jsonl":
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                yield InvalidRecord("The line is not valid JSON")
+                continue
+            if isinstance(record, dict) and field not in record:
+                yield InvalidRecord(f"The record has no {field!r} field")
+            else:
+                yield str(record[field] if isinstance(record, dict) else record).strip()
+    else:
+        for line in lines:
+            if line.strip():
+                yield line.strip()
+
+"""This class writes result rows as CSV or JSON lines."""
+class RowWriter():
+    def __init__(self, stream, output_format:str, fields:list[str]):
+        self.stream = stream
+        self.output_format = output_format
+        self.fields = fields
+        self.count = 0
+        if output_format == "csv":
+            self.csv_writer = csv.writer(stream)
+            self.csv_writer.writerow(fields)
+
+    def write(self, row:dict):
+        if self.output_format == "csv":
+            self.csv_writer.writerow([" ".join(value) if isinstance(value, list) else ("" if value is None else value) for value in (row.get(field) for field in self.fields)])
+        else:
+            self.stream.write(json.dumps(row) + "\n")
+        self.count += 1
+
+def lookup_words(words, available_nums, batch_size:int = WORD_BATCH_SIZE):
+    # Takes an iterable of words and yields {"word", "digits", "number"} for each one, in order. number is
+    # the first available number that spells the word, or None. An InvalidRecord gets {"word", "error"}.
+    words = iter(words)
+    while batch := list(islice(words, batch_size)):
+        found_nums = wc.search_available_nums_for_words([word for word in batch if not isinstance(word, InvalidRecord)], available_nums)
+        for word in batch:
+            if isinstance(word, InvalidRecord):
+                yield {"word": None, "error": word.message}
+            else:
+                yield {"word": word, "digits": wc.find_num_for_word(word), "number": found_nums[word]}
+
+def prepare_number(phone_num) -> list[str]:
+    # Checks a phone number from the input, as word_checker.prepare_phone_number does. A record with no 
+    # number is reported with its own message.
+    if isinstance(phone_num, InvalidRecord):
+        raise wc.InvalidPhoneNumberError(phone_num.message)
+    return wc.prepare_phone_number(phone_num)
+
+def error_row(phone_num, error:wc.InvalidPhoneNumberError) -> dict:
+    # Returns the row for a phone number that could not be looked up.
+    if isinstance(phone_num, InvalidRecord):
+        return {"number": None, "error": phone_num.message}
+    return {"number": phone_num, "error": error.message}
+
+def lookup_numbers(phone_nums, workers:int|None = 1, chunk_size:int = 2000):
+    # Takes an iterable of 1-800 phone number strings and yields {"number", "words"} for each one (or
+    # {"number", "error"} if it is not a valid number). With more than one worker, rows come out in the
+    # order they finish. Invalid numbers go to the workers with the rest, so they are reported when they
+    # are reached, and never pile up waiting for a valid number to come back.
+    if workers == 1:
+        for phone_num in phone_nums:
+            try:
+                yield {"number": phone_num, "words": wc.find_words_for_num(prepare_number(phone_num))}
+            except wc.InvalidPhoneNumberError as error:
+                yield error_row(phone_num, error)
+        return
+
+    for phone_num, words in wc.find_words_for_many(phone_nums, workers=workers, chunk_size=chunk_size, keep_invalid=True):
+        if isinstance(words, wc.InvalidPhoneNumberError):
+            yield error_row(phone_num, words)
+        else:
+            yield {"number": phone_num, "words": words}
+
+def load_inventory(path:str|None, seed:int|None) -> anf.AvailabilityIndex:
+    # Reads the available numbers from a file (one per line, or the first CSV column), or makes them up the
+    # way the app does. Lines that are not 1-800 numbers are skipped and counted on stderr.
+    number_retrieval = anf.NumberRetrieval(seed)
+    if path is None:
+        return number_retrieval.index_available_phone_nums(number_retrieval.generate_inventory())
+    if guess_format(path, "lines") == "lines":
+        inventory, load_stats = anf.load_inventory_file(path)
+        if load_stats["invalid"]:
+            print(f"Skipped {load_stats['invalid']} lines of {path} that are not 1-800 numbers", file=sys.stderr)
+        return anf.AvailabilityIndex(inventory)
+    inventory = anf.AvailabilityIndex()
+    skipped = 0
+    with open(path, newline="") as inventory_file:
+        for phone_num in read_values(inventory_file, guess_format(path, "lines")):
+            try:
+                inventory.add(phone_num)
+            except anf.InvalidInventoryNumberError:
+                skipped += 1
+    if skipped:
+        print(f"Skipped {skipped} lines of {path} that are not 1-800 numbers", file=sys.stderr)
+    return inventory
+
+def open_input(path:str):
+    return sys.stdin if path == "-" else open(path, newline="")
+
+def open_output(path:str):
+    return sys.stdout if path == "-" else open(path, "w", newline="")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Look up vanity words or numbers for a whole file, without the window.")
+    parser.add_argument("mode", choices=["words", "numbers"], help="words: find an available number for each word; numbers: find the words each number spells")
+    parser.add_argument("input", help="input file, or - for stdin")
+    parser.add_argument("--output", default="-", help="output file, or - for stdout (the default)")
+    parser.add_argument("--input-format", choices=FORMATS, help="guessed from the input file's extension")
+    parser.add_argument("--output-format", choices=FORMATS[1:], help="guessed from the output file's extension")
+    parser.add_argument("--field", help="CSV column or JSON key holding the values (default: the first column, or word/number)")
+    parser.add_argument("--inventory", help="file of available numbers for words mode (default: made up, as in the app)")
+    parser.add_argument("--seed", type=int, help="seed for the made-up inventory")
+    parser.add_argument("--workers", type=int, help="processes for numbers mode (default 1, 0 for one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="numbers handed to a worker at a time")
+    args = parser.parse_args(argv)
+    if args.mode == "words" and args.workers is not None:
+        parser.error("--workers only applies to numbers mode")
+
+    input_format = args.input_format or guess_format(args.input, "lines")
+    output_format = args.output_format or guess_format(args.output, "jsonl")
+    if output_format == "lines":
+        output_format = "jsonl"
+    field = args.field
+    if field is None and input_format == "jsonl":
+        field = DEFAULT_FIELDS[args.mode]
+
+    input_stream = open_input(args.input)
+    output_stream = open_output(args.output)
+    try:
+        values = read_values(input_stream, input_format, field)
+        if args.mode == "words":
+            writer = RowWriter(output_stream, output_format, WORD_FIELDS)
+            rows = lookup_words(values, load_inventory(args.inventory, args.seed))
+        else:
+            writer = RowWriter(output_stream, output_format, NUMBER_FIELDS)
+            rows = lookup_numbers(values, workers=1 if args.workers is None else args.workers or None, chunk_size=args.chunk_size)
+        for row in rows:
+            writer.write(row)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+        else:
+            output_stream.flush()
+    print(f"Wrote {writer.count} rows", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""This program times the lookups that the 1-800 Helper relies on, so that changes to them can be compared.
+
+It builds seeded, synthetic inventories of available numbers (20 thousand to 10 million numbers) and times:
+
+- find_words_for_num on easy and worst-case digit patterns (all 7s and 9s have four letters a digit;
+  numbers with a 0 or 1 spell nothing)
+- find_num_for_word
+- search_available_nums_for_word against a plain list, a PhoneInventory and an AvailabilityIndex
+- search_available_nums_for_words for a batch of words
+- alternatives.find_alternatives for a word no number has anywhere, the slowest case, and for random words
+- NumberRetrieval.get_available_phone_nums_long, generate_inventory and get_available_phone_nums_short
+
+For each case it reports latency percentiles, throughput and peak memory, and it can write the results as
+JSON and compare them with an earlier run to catch regressions. Lookup caches are cleared before every
+timed call, so the numbers show the uncached cost.
+
+    python benchmark.py --sizes 20000,1000000 --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+import alternatives as al
+import available_num_finder as anf
+import word_checker as wc
+
+DEFAULT_SIZES = [20000, 200000, 1000000]
+# Digit patterns for find_words_for_num, from the most letter combinations to none at all
+DIGIT_PATTERNS = {
+    "all_7s": "7777777",
+    "all_9s": "9999999",
+    "mixed": "2668294",
+    "random": None,         # a different random number (digits 2-9) for every call
+    "with_0_and_1": "2061183",
+}
+SEARCH_WORDS = ["taxi", "move", "puppy", "flowers", "cab", "hair", "fastest", "wander", "travel", "lost",
+                "go", "zzzzzzz", "help", "plumber", "dentist", "pizza", "lawyer", "roofer", "movers", "cars"]
+
+def make_inventory(size:int, seed:int) -> list[str]:
+    # Returns `size` different 1-800 numbers picked with a seeded generator, so every run uses the same ones.
+    generator = random.Random(seed)
+    return [anf.format_local_number(local_num) for local_num in generator.sample(range(anf.LOCAL_RANGE), size)]
+
+def without_spelling(inventory:anf.PhoneInventory, digits:str) -> anf.PhoneInventory:
+    # Returns a copy of the inventory without the numbers that have the digits anywhere in their last seven,
+    # so a search for them has to check every place all the way through.
+    return anf.PhoneInventory(phone_num for phone_num in inventory if digits not in phone_num[len(anf.PREFIX):])
+
+def time_calls(operation, make_arguments, repeat:int, budget:float) -> list[float]:
+    # Calls operation(*make_arguments()) up to `repeat` times, or until `budget` seconds have gone by, and
+    # returns each call's time in seconds. Making the arguments and clearing the caches are not timed.
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeat and (not samples or time.perf_counter() < deadline):
+        arguments = make_arguments()
+        wc.clear_caches()
+        start = time.perf_counter()
+        operation(*arguments)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def peak_memory(operation, arguments) -> int:
+    # Returns the most memory (in bytes) allocated at once during one call.
+    wc.clear_caches()
+    tracemalloc.start()
+    try:
+        operation(*arguments)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def percentile(sorted_samples:list[float], fraction:float) -> float:
+    position = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[position]
+
+def summarize(samples:list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "calls": len(ordered),
+        "mean_ms": 1000 * total / len(ordered),
+        "p50_ms": 1000 * percentile(ordered, 0.50),
+        "p90_ms": 1000 * percentile(ordered, 0.90),
+        "p99_ms": 1000 * percentile(ordered, 0.99),
+        "max_ms": 1000 * ordered[-1],
+        "ops_per_sec": len(ordered) / total if total else float("inf"),
+    }
+
+def run_case(results:list, name:str, size:int|None, operation, make_arguments, repeat:int, budget:float):
+    # Times one case, measures its peak memory and adds a row to the results.
+    row = {"operation": name, "inventory_size": size}
+    row.update(summarize(time_calls(operation, make_arguments, repeat, budget)))
+    row["peak_kib"] = peak_memory(operation, make_arguments()) / 1024
+    results.append(row)
+    print(f"{name:<45} {size if size is not None else '-':>10} p50 {row['p50_ms']:10.4f} ms   p99 {row['p99_ms']:10.4f} ms   "
+          f"{row['ops_per_sec']:12.1f} ops/s   peak {row['peak_kib']:10.1f} KiB", flush=True)
+
+def use_word_list(path:str) -> wc.TemporaryWordIndex:
+    # Returns an index built from a plain word list without spell checking, for word_checker to use while the
+    # benchmarks run, so the word lookups can be benchmarked on machines that do not have enchant.
+    with open(path, encoding="utf-8", errors="ignore") as word_file:
+        words = [line.strip().lower() for line in word_file]
+    return wc.TemporaryWordIndex(word for word in words if wc.MIN_WORD_LENGTH <= len(word) <= wc.MAX_WORD_LENGTH and word.isascii() and word.isalpha())
+
+def run_benchmarks(sizes:list[int], seed:int, repeat:int, budget:float, include_scan_limit:int) -> list[dict]:
+    results = []
+    generator = random.Random(seed)
+
+    try:
+        wc.get_keypad_trie()        # load the index, trie and tree up front, so their one-time cost is not timed
+        al.get_digit_tree()
+        have_words = True
+    except (OSError, ImportError) as error:
+        print(f"Skipping word lookups, the word index is not available: {error}", file=sys.stderr)
+        have_words = False
+
+    if have_words:
+        for pattern, digits in DIGIT_PATTERNS.items():
+            if digits is None:
+                make_arguments = lambda: ([generator.choice("23456789") for _ in range(7)],)
+            else:
+                make_arguments = lambda digits=digits: (list(digits),)
+            run_case(results, f"find_words_for_num[{pattern}]", None, wc.find_words_for_num, make_arguments, repeat, budget)
+        run_case(results, "find_words_for_num[anywhere,max_words=2]", None, wc.find_words_for_num,
+                 lambda: ([generator.choice("23456789") for _ in range(7)], "anywhere", 2), repeat, budget)
+    run_case(results, "find_num_for_word", None, wc.find_num_for_word, lambda: (generator.choice(SEARCH_WORDS),), repeat, budget)
+
+    for size in sizes:
+        available_nums = make_inventory(size, seed)
+        inventory = anf.PhoneInventory(available_nums)
+        availability_index = anf.AvailabilityIndex(inventory)
+        make_word = lambda: (generator.choice(SEARCH_WORDS),)
+        if size <= include_scan_limit:
+            run_case(results, "search_available_nums_for_word[list]", size,
+                     lambda word: wc.search_available_nums_for_word(word, available_nums), make_word, repeat, budget)
+        run_case(results, "search_available_nums_for_word[inventory]", size,
+                 lambda word: wc.search_available_nums_for_word(word, inventory), make_word, repeat, budget)
+        run_case(results, "search_available_nums_for_word[index]", size,
+                 lambda word: wc.search_available_nums_for_word(word, availability_index), make_word, repeat, budget)
+        run_case(results, "search_available_nums_for_words[inventory,20 words]", size,
+                 lambda words: wc.search_available_nums_for_words(words, inventory), lambda: (SEARCH_WORDS,), repeat, budget)
+        if have_words:
+            run_case(results, "find_alternatives[inventory]", size,
+                     lambda word: al.find_alternatives(word, inventory), make_word, repeat, budget)
+            inventory_without_taxi = without_spelling(inventory, "8294")
+            run_case(results, "find_alternatives[inventory,taxi nowhere]", size,
+                     lambda: al.find_alternatives("taxi", inventory_without_taxi), lambda: (), repeat, budget)
+            del inventory_without_taxi
+        run_case(results, "AvailabilityIndex build", size, lambda inventory: anf.AvailabilityIndex(inventory).close(), lambda: (inventory,), 3, budget)
+
+        number_retrieval = anf.NumberRetrieval(seed)
+        number_retrieval.LONG_RUN = size
+        run_case(results, "get_available_phone_nums_long", size, number_retrieval.get_available_phone_nums_long, lambda: (), 3, budget)
+        run_case(results, "NumberRetrieval.generate_inventory", size, number_retrieval.generate_inventory, lambda: (), 3, budget)
+        run_case(results, "get_available_phone_nums_short", size, number_retrieval.get_available_phone_nums_short, lambda: (inventory,), repeat, budget)
+        availability_index.close()
+        del available_nums, inventory, availability_index
+    return results
+
+def compare(results:list[dict], baseline:list[dict], threshold:float) -> list[str]:
+    # Returns a line for every case whose median latency grew by more than `threshold` times.
+    baseline_rows = {(row["operation"], row["inventory_size"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        old_row = baseline_rows.get((row["operation"], row["inventory_size"]))
+        if old_row and old_row["p50_ms"] > 0 and row["p50_ms"] / old_row["p50_ms"] > threshold:
+            regressions.append(f"{row['operation']} ({row['inventory_size']}): p50 {old_row['p50_ms']:.4f} ms -> {row['p50_ms']:.4f} ms")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the 1-800 Helper lookups.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma separated inventory sizes, up to 10000000")
+    parser.add_argument("--seed", type=int, default=1800)
+    parser.add_argument("--repeat", type=int, default=200, help="most timed calls per case")
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds to spend timing each case")
+    parser.add_argument("--scan-limit", type=int, default=1000000, help="largest inventory to scan as a plain list")
+    parser.add_argument("--word-list", help="plain word list to index without spell checking")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slow-down factor that counts as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    with use_word_list(args.word_list) if args.word_list else nullcontext():
+        results = run_benchmarks(sizes, args.seed, args.repeat, args.budget, args.scan_limit)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": anf.np is not None,
+            "seed": args.seed,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file)["results"], args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
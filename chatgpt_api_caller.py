@@ -1,56 +1,305 @@
 """This program will make calls to the chatgpt api. It will pass gpt a user input that briefly describes 
 the user's organization and selling points. It will then ask gpt to suggest some words that the user 
 might want to spell using the last 4-7 digits of their 1-800 number.
+
+Calls go through a shared client that keeps a pool of open connections (so each call does not pay for a
+new TLS handshake), limits how many requests are in flight at once, and retries with jittered backoff
+when the API is rate limited (429) or having trouble (5xx). It can be used from asyncio code to send many
+requests at once, or through APICall from ordinary code. Either way, the caller gets a SuggestionResult
+rather than a bare list or an error string. APICall also checks the suggestion cache (see suggestion_cache.py)
+before calling the API.
+
+The client can also stream a completion. APICall.stream_suggestions() yields each suggested word as soon as
+its closing quote and comma arrive, instead of waiting for the whole answer.
 """
 
-import requests
+import asyncio
 import json
+import random
 import re
-from confidential import chatgpt_api_key
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+import instrumentation
+from suggestion_cache import SuggestionCache, make_cache_key
+
+DEFAULT_URL = "https://api.openai.com/v1/chat/completions"
+DEFAULT_MODEL = "gpt-3.5-turbo"
+DEFAULT_TEMPERATURE = 0.7
+# Status codes that are worth trying again
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def load_api_key() -> str:
+    # The key is kept out of the repository, in confidential.py. It is only imported when a call is made.
+    from confidential import chatgpt_api_key
+    return chatgpt_api_key
+
+def build_prompt(user_message : str) -> str:
+    # The message wraps the user's description of their organization. It is designed to solicit
+    # a list of suggestions in the format of a python list. This format, in turn, allows the
+    # regex pattern to recognize the suggestions because they are between quotes.
+    return f"A colleague of mine is thinking about getting a 1-800 number. Here is their description of their organization: '{user_message}' My colleague wants help coming up with words or phrases that they can spell using the last 4-7 digits of their 1-800 number. Will you please help me by coming up with 20 words that they could use? It would be helpful if you wrote the words in the form of a python list of strings."
+
+def build_request_data(user_message : str, model : str = DEFAULT_MODEL, temperature : float = DEFAULT_TEMPERATURE) -> dict:
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": build_prompt(user_message)}],
+        "temperature": temperature
+    }
+
+def match_list(text : str) -> list[str]:
+    # Recognizes suggested words inside of the response content by seeking words in quotation marks
+    list_regex = re.compile(r"""["'](\w*)["'],""")
+    return list_regex.findall(text, 1)
+
+"""This class finds suggested words in a completion that arrives a piece at a time. It finds the same words as
+match_list would on the whole text, but hands each one over as soon as it is complete."""
+class SuggestionStreamParser():
+    def __init__(self):
+        self.text = ""
+        self.position = 1       # match_list starts looking at the second character, so this does too
+        self.list_regex = re.compile(r"""["'](\w*)["'],""")
+
+    def feed(self, text_piece : str) -> list[str]:
+        # Adds the next piece of the completion and returns the words it completed. A match needs its trailing
+        # comma, so a match found here can never turn into a different one when more text arrives.
+        self.text += text_piece
+        words = []
+        for match in self.list_regex.finditer(self.text, self.position):
+            words.append(match.group(1))
+            self.position = match.end()
+        return words
+
+"""This class is what a request for suggestions comes back as. When the request worked, `suggestions` holds
+the suggested words and `error` is None. Otherwise `suggestions` is empty, `error` describes what went wrong
+and `error_type` is one of "http" (the API said no), "network" (it could not be reached) or "response" (its
+answer could not be read). `cached` is True when the suggestions came from the suggestion cache instead of
+the API. Iterating over a result goes over its suggestions."""
+class SuggestionResult():
+    def __init__(self, suggestions=None, error=None, error_type=None, status_code=None, attempts=1, cached=False):
+        self.suggestions = suggestions or []
+        self.error = error
+        self.error_type = error_type
+        self.status_code = status_code
+        self.attempts = attempts
+        self.cached = cached
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __iter__(self):
+        return iter(self.suggestions)
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def __repr__(self):
+        if self.ok:
+            return f"SuggestionResult(suggestions={self.suggestions!r}, attempts={self.attempts}, cached={self.cached})"
+        return f"SuggestionResult(error_type={self.error_type!r}, status_code={self.status_code!r}, error={self.error!r}, attempts={self.attempts})"
+
+# Throws an exception when a streamed request fails. The failure is described by the SuggestionResult it carries.
+class SuggestionError(Exception):
+    def __init__(self, result):
+        self.result = result
+        super().__init__(result.error)
+
+"""This class sends requests to the chat completions API. Requests share one requests.Session, whose connection
+pool is as large as the number of requests allowed in flight at once. Blocking sends run on the client's own
+threads, so any number of coroutines (in any event loop) can await suggest() and only max_concurrency of
+them talk to the API at a time."""
+class AsyncChatClient():
+    def __init__(self, api_key=None, url=DEFAULT_URL, max_concurrency=8, max_retries=4, timeout=30, backoff_base=0.5, backoff_cap=8.0):
+        self.api_key = api_key
+        self.url = url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="chatgpt")
+
+    def _headers(self) -> dict:
+        if self.api_key is None:
+            self.api_key = load_api_key()
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    @instrumentation.timed("chatgpt.http_request")
+    def _send(self, data : dict) -> requests.Response:
+        return self.session.post(self.url, headers=self._headers(), data=json.dumps(data), timeout=self.timeout)
+
+    def _backoff(self, attempt : int, response=None) -> float:
+        # Seconds to wait before trying again: a server's Retry-After if it gave one, otherwise a random
+        # wait of up to base * 2**attempt ("full jitter"), so that many clients do not retry in step.
+        if response is not None:
+            try:
+                return min(self.backoff_cap, float(response.headers.get("Retry-After", "")))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def request(self, data : dict) -> SuggestionResult:
+        # Sends one request body, retrying when it is worth it, and reads the suggestions out of the answer.
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            last_try = attempt == self.max_retries
+            try:
+                response = await loop.run_in_executor(self.executor, self._send, data)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if last_try:
+                    return SuggestionResult(error=f"Could not reach the API: {error}", error_type="network", attempts=attempt + 1)
+                instrumentation.count("chatgpt.retries")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if response.status_code == 200:
+                try:
+                    generated_text = response.json()['choices'][0]['message']['content']    # select the content of the response (instead of the metadata)
+                except (ValueError, KeyError, IndexError, TypeError) as error:
+                    return SuggestionResult(error=f"Could not read the API's answer: {error!r}", error_type="response", status_code=200, attempts=attempt + 1)
+                return SuggestionResult(match_list(generated_text), attempts=attempt + 1)
+            if response.status_code not in RETRY_STATUS_CODES or last_try:
+                return SuggestionResult(error=f"Error: {response.status_code}\n{response.text}", error_type="http", status_code=response.status_code, attempts=attempt + 1)
+            instrumentation.count("chatgpt.retries")
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    def stream_text(self, data : dict):
+        # Asks for the completion as a stream of server-sent events and yields each piece of its text as it
+        # arrives. This blocks between pieces, so it belongs on a worker thread. A rate limit or server error
+        # before the stream starts is retried like request() does; any other failure raises SuggestionError.
+        stream_data = dict(data, stream=True)
+        for attempt in range(self.max_retries + 1):
+            last_try = attempt == self.max_retries
+            try:
+                response = self.session.post(self.url, headers=self._headers(), data=json.dumps(stream_data), timeout=self.timeout, stream=True)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if last_try:
+                    raise SuggestionError(SuggestionResult(error=f"Could not reach the API: {error}", error_type="network", attempts=attempt + 1))
+                time.sleep(self._backoff(attempt))
+                continue
+            if response.status_code == 200:
+                break
+            if response.status_code not in RETRY_STATUS_CODES or last_try:
+                raise SuggestionError(SuggestionResult(error=f"Error: {response.status_code}\n{response.text}", error_type="http", status_code=response.status_code, attempts=attempt + 1))
+            response.close()
+            time.sleep(self._backoff(attempt, response))
+
+        with response:
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    event = line[len("data:"):].strip()
+                    if event == "[DONE]":
+                        break
+                    text_piece = json.loads(event)['choices'][0]['delta'].get('content')
+                    if text_piece:
+                        yield text_piece
+            except (requests.RequestException, ValueError, KeyError, IndexError, TypeError, AttributeError) as error:
+                raise SuggestionError(SuggestionResult(error=f"The API's stream broke off: {error!r}", error_type="response", status_code=200, attempts=attempt + 1))
+
+    async def suggest(self, user_message : str, model : str = DEFAULT_MODEL, temperature : float = DEFAULT_TEMPERATURE) -> SuggestionResult:
+        return await self.request(build_request_data(user_message, model, temperature))
+
+    async def suggest_many(self, user_messages, model : str = DEFAULT_MODEL, temperature : float = DEFAULT_TEMPERATURE) -> list[SuggestionResult]:
+        # Sends a request for each message at once and returns the results in the same order.
+        return await asyncio.gather(*(self.suggest(user_message, model, temperature) for user_message in user_messages))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+# One client is shared by every APICall in the program, so they all use the same connection pool.
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client() -> AsyncChatClient:
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = AsyncChatClient()
+        return _shared_client
+
+# Likewise, one suggestion cache is shared. It is opened the first time it is needed.
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache() -> SuggestionCache:
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SuggestionCache()
+        return _shared_cache
 
 """This class calls the OpenAI API for ChatGPT."""
 class APICall():
     # default user message is provided for ease of testing.
-    def __init__(self, user_message="Faxi is the fastest taxi operation in town. We'll get you there with your hair blown back!"):
-        self.API_KEY = chatgpt_api_key
+    def __init__(self, user_message="Faxi is the fastest taxi operation in town. We'll get you there with your hair blown back!", client=None, cache=None):
         self.user_message = user_message
-        self.url = "https://api.openai.com/v1/chat/completions"
+        self.client = client
+        self.cache = cache
+        self.data = build_request_data(self.user_message)
+        self.cache_key = make_cache_key(self.user_message, self.data["model"], self.data["temperature"])
 
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.API_KEY}"
-        }
+    @instrumentation.timed("chatgpt.prepare_suggestions")
+    def prepare_suggestions(self) -> SuggestionResult:
 
-        self.data = {
-            "model": "gpt-3.5-turbo",
-            # The message wraps the user's description of their organization. It is designed to solicit 
-            # a list of suggestions in the format of a python list. This format, in turn, allows the 
-            # regex pattern to recognize the suggestions because they are between quotes.
-            "messages": [{"role": "user", "content": f"A colleague of mine is thinking about getting a 1-800 number. Here is their description of their organization: '{self.user_message}' My colleague wants help coming up with words or phrases that they can spell using the last 4-7 digits of their 1-800 number. Will you please help me by coming up with 20 words that they could use? It would be helpful if you wrote the words in the form of a python list of strings."}],
-            "temperature": 0.7
-        }
+        # Returns a SuggestionResult with the list of suggestion strings for the user's message. They come
+        # from the suggestion cache when this message has been asked about before; otherwise the API is
+        # called, which blocks until the answer (or the last retry) comes back, so this should not be
+        # called on the Tk thread. Only successful, non-empty answers are cached.
 
-    def prepare_suggestions(self):
+        cache = self.cache or get_shared_cache()
+        cached_suggestions = cache.get(self.cache_key)
+        if cached_suggestions is not None:
+            instrumentation.count("chatgpt.cache_hits")
+            return SuggestionResult(cached_suggestions, attempts=0, cached=True)
+        instrumentation.count("chatgpt.cache_misses")
+        client = self.client or get_shared_client()
+        result = asyncio.run(client.request(self.data))
+        if result.ok and result.suggestions:
+            cache.put(self.cache_key, result.suggestions)
+        return result
 
-        # Makes the call to the API and returns the list of suggestion strings from the response
+    def stream_suggestions(self):
 
-        self.response = requests.post(self.url, headers=self.headers, data=json.dumps(self.data), timeout=30)
+        # Yields the suggested words one at a time, each as soon as it has arrived. Cached suggestions are
+        # yielded straight away; otherwise the completion is streamed from the API and, once it is complete,
+        # cached. Raises SuggestionError if the API call fails. Blocks between words, so it belongs on a
+        # worker thread.
 
-        if self.response.status_code == 200:
-            self.response_data = self.response.json()
-            self.generated_text = self.response_data['choices'][0]['message']['content']    # select the content of the response (instead of the metadata)
-            suggestion_list = self.match_list(self.generated_text)      # make a list of the suggested words that are in quotation marks
-            return suggestion_list
-        else:
-            return f"Error: {self.response.status_code}\n{self.response.text}"
+        cache = self.cache or get_shared_cache()
+        cached_suggestions = cache.get(self.cache_key)
+        if cached_suggestions is not None:
+            instrumentation.count("chatgpt.cache_hits")
+            yield from cached_suggestions
+            return
+        instrumentation.count("chatgpt.cache_misses")
+        client = self.client or get_shared_client()
+        parser = SuggestionStreamParser()
+        suggestions = []
+        with instrumentation.measure("chatgpt.stream_suggestions"):
+            for text_piece in client.stream_text(self.data):
+                for word in parser.feed(text_piece):
+                    suggestions.append(word)
+                    yield word
+        if suggestions:
+            cache.put(self.cache_key, suggestions)
 
     def match_list(self, text):
 
         # Recognizes suggested words inside of the response content by seeking words in quotation marks
-        
-        list_regex = re.compile(r"""["'](\w*)["'],""")
-        mo = list_regex.findall(text, 1)
-        return mo
+
+        return match_list(text)
 
 if __name__ == "__main__":
-    main_instance = APICall()
\ No newline at end of file
+    main_instance = APICall()
@@ -0,0 +1,295 @@
+"""This module times and counts the 1-800 Helper's slow operations (word lookups, ChatGPT calls, number
+generation and drawing results in the window), so that a slow click can be traced to the step that made it
+slow.
+
+It is switched on with environment variables, which must be set before the program starts:
+
+    HELPER_INSTRUMENT=1                  time and count every instrumented operation
+    HELPER_PROFILE=cprofile,tracemalloc  also run cProfile and/or tracemalloc while instrumented operations run
+                                         (either one switches timing on as well)
+    HELPER_INSTRUMENT_OUTPUT=stats.json  write everything to this JSON file when the program exits (with
+                                         cProfile, the raw profile goes next to it as stats.json.pstats)
+
+When it is off, @timed returns the function it is given unchanged, and measure() and count() return at once,
+so the instrumented code runs as fast as it did before. When it is on, each operation keeps a call count,
+total, minimum and maximum time and a histogram of latencies, from which percentiles are estimated. The stats
+can be read in the program with stats(), or printed from a dump:
+
+    python instrumentation.py stats.json
+"""
+
+import atexit
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# The upper edges of the latency histogram's buckets, in milliseconds. The last bucket has no upper edge.
+HISTOGRAM_BOUNDS_MS = [0.01, 0.03, 0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000, 10000]
+# How many functions and allocation sites a dump lists
+TOP_ENTRIES = 25
+
+PROFILE_MODES = {"cprofile", "tracemalloc"}
+
+"""This class holds the numbers for one named operation."""
+class OperationStats():
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.peak_bytes = 0
+
+    def record(self, seconds:float, failed:bool = False):
+        self.calls += 1
+        self.errors += failed
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+    def percentile_ms(self, fraction:float) -> float:
+        # Estimates a percentile as the upper edge of the bucket it falls in (or the slowest call, for the last bucket).
+        wanted = fraction * self.calls
+        seen = 0
+        for bound, bucket_count in zip(HISTOGRAM_BOUNDS_MS + [float("inf")], self.buckets):
+            seen += bucket_count
+            if seen >= wanted:
+                return min(bound, self.maximum * 1000)
+        return self.maximum * 1000
+
+    def as_dict(self) -> dict:
+        if not self.calls:
+            return {"calls": 0}
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": 1000 * self.total,
+            "mean_ms": 1000 * self.total / self.calls,
+            "min_ms": 1000 * self.minimum,
+            "max_ms": 1000 * self.maximum,
+            "p50_ms": self.percentile_ms(0.50),
+            "p90_ms": self.percentile_ms(0.90),
+            "p99_ms": self.percentile_ms(0.99),
+            "histogram_ms": {f"<={bound}": count for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.buckets)} | {f">{HISTOGRAM_BOUNDS_MS[-1]}": self.buckets[-1]},
+            "peak_kib": self.peak_bytes / 1024,
+        }
+
+"""This class collects the stats of every operation while instrumentation is on. It is safe to use from
+several threads. In a profile mode, the outermost instrumented operation on each thread runs under that
+thread's own cProfile profiler, and the results are merged when it ends."""
+class Recorder():
+    def __init__(self, profile_modes=()):
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.counters = {}
+        self.sources = {}           # name -> function returning extra stats, such as cache hit rates
+        self.profile_modes = set(profile_modes)
+        self.profile_stats = None
+        self.local = threading.local()
+        if "tracemalloc" in self.profile_modes:
+            import tracemalloc
+            tracemalloc.start()
+
+    def _operation(self, name:str) -> OperationStats:
+        operation = self.operations.get(name)
+        if operation is None:
+            with self.lock:
+                operation = self.operations.setdefault(name, OperationStats())
+        return operation
+
+    def count(self, name:str, amount:int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def measure(self, name:str):
+        # Times the body of a with block under `name`.
+        outermost = not getattr(self.local, "depth", 0)
+        self.local.depth = getattr(self.local, "depth", 0) + 1
+        profiler = self._start_capture() if outermost and self.profile_modes else None
+        failed = True
+        start = time.perf_counter()
+        try:
+            yield
+            failed = False
+        finally:
+            seconds = time.perf_counter() - start
+            self.local.depth -= 1
+            peak_bytes = self._stop_capture(profiler) if outermost and self.profile_modes else 0
+            operation = self._operation(name)
+            with self.lock:
+                operation.record(seconds, failed)
+                operation.peak_bytes = max(operation.peak_bytes, peak_bytes)
+
+    def _start_capture(self):
+        if "tracemalloc" in self.profile_modes:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            self.local.start_bytes = tracemalloc.get_traced_memory()[0]
+        if "cprofile" in self.profile_modes:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:      # another profiler is already running on this thread
+                return None
+            return profiler
+        return None
+
+    def _stop_capture(self, profiler) -> int:
+        # Merges a finished profile and returns the most memory allocated at once since _start_capture (as
+        # seen by tracemalloc, which counts every thread).
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            with self.lock:
+                if self.profile_stats is None:
+                    self.profile_stats = pstats.Stats(profiler)
+                else:
+                    self.profile_stats.add(profiler)
+        if "tracemalloc" in self.profile_modes:
+            import tracemalloc
+            return max(0, tracemalloc.get_traced_memory()[1] - self.local.start_bytes)
+        return 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            result = {
+                "operations": {name: operation.as_dict() for name, operation in sorted(self.operations.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+            sources = dict(self.sources)
+        for name, source in sources.items():
+            result[name] = source()
+        if self.profile_stats is not None:
+            result["cprofile_top"] = self._top_functions()
+        if "tracemalloc" in self.profile_modes:
+            result["tracemalloc_top"] = self._top_allocations()
+        return result
+
+    def _top_functions(self) -> list[dict]:
+        with self.lock:
+            rows = sorted(self.profile_stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_ENTRIES]
+        return [{"function": f"{filename}:{line}({function})", "calls": total_calls, "own_ms": 1000 * own_time, "cumulative_ms": 1000 * cumulative_time}
+                for (filename, line, function), (primitive_calls, total_calls, own_time, cumulative_time, callers) in rows]
+
+    def _top_allocations(self) -> list[dict]:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return []
+        return [{"location": str(statistic.traceback[0]), "kib": statistic.size / 1024, "blocks": statistic.count}
+                for statistic in tracemalloc.take_snapshot().statistics("lineno")[:TOP_ENTRIES]]
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+            self.counters.clear()
+            self.profile_stats = None
+
+# The active recorder, or None when instrumentation is off
+_recorder = None
+
+def enable(profile_modes=()) -> Recorder:
+    # Switches instrumentation on. Functions decorated with @timed before this are not timed, so it is
+    # normally done at import through the environment variables.
+    global _recorder
+    unknown_modes = set(profile_modes) - PROFILE_MODES
+    if unknown_modes:
+        raise ValueError(f"Unknown profile modes: {sorted(unknown_modes)}")
+    if _recorder is None:
+        _recorder = Recorder(profile_modes)
+    return _recorder
+
+def disable():
+    global _recorder
+    _recorder = None
+
+def is_enabled() -> bool:
+    return _recorder is not None
+
+def timed(name:str):
+    # Decorator that times every call of a function under `name`. Returns the function itself when
+    # instrumentation is off.
+    def decorate(function):
+        if _recorder is None:
+            return function
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return function(*args, **kwargs)
+            with recorder.measure(name):
+                return function(*args, **kwargs)
+        return timed_function
+    return decorate
+
+def measure(name:str):
+    # Context manager that times its with block under `name`.
+    if _recorder is None:
+        return nullcontext()
+    return _recorder.measure(name)
+
+def count(name:str, amount:int = 1):
+    # Adds to a counter, such as cache hits or retries.
+    if _recorder is not None:
+        _recorder.count(name, amount)
+
+def add_source(name:str, source):
+    # Adds the result of source() to the stats under `name`, for numbers that are already counted elsewhere.
+    if _recorder is not None:
+        with _recorder.lock:
+            _recorder.sources[name] = source
+
+def stats() -> dict:
+    # Returns every operation's stats and every counter, or an empty dict when instrumentation is off.
+    return _recorder.stats() if _recorder is not None else {}
+
+def dump_json(path:str):
+    # Writes stats() to a JSON file, along with the raw cProfile data (to path + ".pstats") if there is any.
+    if _recorder is None:
+        return
+    with open(path, "w") as output_file:
+        json.dump(stats(), output_file, indent=2)
+    if _recorder.profile_stats is not None:
+        _recorder.profile_stats.dump_stats(path + ".pstats")
+
+def format_report(stats_dict:dict) -> str:
+    # Lays out the operations from stats() as a table, slowest in total first.
+    lines = [f"{'operation':<45} {'calls':>8} {'total ms':>12} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}"]
+    operations = sorted(stats_dict.get("operations", {}).items(), key=lambda item: item[1].get("total_ms", 0), reverse=True)
+    for name, operation in operations:
+        if operation["calls"]:
+            lines.append(f"{name:<45} {operation['calls']:>8} {operation['total_ms']:>12.2f} {operation['mean_ms']:>10.3f} {operation['p50_ms']:>10.3f} {operation['p99_ms']:>10.3f} {operation['max_ms']:>10.3f}")
+    for name, value in stats_dict.get("counters", {}).items():
+        lines.append(f"{name:<45} {value:>8}")
+    return "\n".join(lines)
+
+def _enable_from_environment():
+    profile_modes = {mode.strip().lower() for mode in os.environ.get("HELPER_PROFILE", "").split(",") if mode.strip()}
+    if os.environ.get("HELPER_INSTRUMENT", "").lower() not in ("", "0", "false", "no") or profile_modes:
+        enable(profile_modes)
+        output_path = os.environ.get("HELPER_INSTRUMENT_OUTPUT")
+        if output_path:
+            atexit.register(dump_json, output_path)
+
+_enable_from_environment()
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python instrumentation.py STATS_JSON", file=sys.stderr)
+        return 2
+    with open(argv[0]) as stats_file:
+        print(format_report(json.load(stats_file)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
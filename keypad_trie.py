@@ -0,0 +1,76 @@
+"""This module holds a trie of the digit strings that spell dictionary words. Walking a phone number through
+the trie digit by digit finds every word that starts at a given digit, and the walk stops as soon as no word
+continues with the next digit. That makes it cheap to look for words anywhere in a number, or for phrases of
+several words (like GO-TAXI), without building every combination of letters.
+
+The trie only holds digit strings. The words for a digit string come from the word index.
+"""
+
+# Marks a trie node where a digit string ends. Digits are single characters, so this can never clash.
+END = ""
+
+"""This class is a trie over digit strings, stored as nested dicts keyed by digit."""
+class KeypadTrie():
+    def __init__(self, digit_keys=()):
+        self.root = {}
+        self.key_count = 0
+        for digits in digit_keys:
+            self.add(digits)
+
+    @classmethod
+    def from_word_index(cls, word_index) -> "KeypadTrie":
+        # Builds the trie from a word index (an in-memory dict or a word_index.WordIndex).
+        return cls(digits for digits, _ in word_index.items())
+
+    def add(self, digits:str):
+        node = self.root
+        for digit in digits:
+            node = node.setdefault(digit, {})
+        if END not in node:
+            node[END] = digits
+            self.key_count += 1
+
+    def __len__(self):
+        return self.key_count
+
+    def __contains__(self, digits):
+        node = self.root
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                return False
+        return END in node
+
+    def match_from(self, phone_num, start:int=0, stop:int|None=None) -> list[int]:
+        # Returns the positions where a digit string that starts at `start` can end, shortest first. The walk
+        # ends at the first digit that no word continues with.
+        stop = len(phone_num) if stop is None else stop
+        ends = []
+        node = self.root
+        for position in range(start, stop):
+            node = node.get(phone_num[position])
+            if node is None:
+                break
+            if END in node:
+                ends.append(position + 1)
+        return ends
+
+    def segmentations(self, phone_num, start:int, stop:int, max_parts:int) -> list[list[str]]:
+        # Returns every way to split phone_num[start:stop] into at most max_parts digit strings from the trie.
+        memo = {}
+
+        def split_from(position, parts_left):
+            if position == stop:
+                return [[]]
+            if parts_left == 0:
+                return []
+            if (position, parts_left) not in memo:
+                splits = []
+                for end in self.match_from(phone_num, position, stop):
+                    head = ''.join(phone_num[position:end])
+                    for tail in split_from(end, parts_left - 1):
+                        splits.append([head] + tail)
+                memo[(position, parts_left)] = splits
+            return memo[(position, parts_left)]
+
+        return split_from(start, max_parts)
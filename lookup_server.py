@@ -0,0 +1,669 @@
+"""This module runs the 1-800 Helper's lookups as a local service, so that several windows and batch jobs on one
+machine can share one inventory and one word index, instead of each making up its own inventory and loading
+its own copy of the words.
+
+    python lookup_server.py serve                                 listen on the default Unix socket
+    python lookup_server.py serve --address 127.0.0.1:8790 --workers 4 --inventory numbers.txt
+    python lookup_server.py loadtest --clients 16 --requests 2000 --start-server
+
+Set HELPER_LOOKUP_ADDRESS to the server's address (a socket path, or host:port) and the window will use the
+server through a LookupClient instead of making its own inventory. The words a number spells and the
+alternatives to an unavailable word are then looked up by the server too, so the window never loads the word
+index or builds the tree of similar words. If the server cannot be reached when the window starts, the window
+makes its own inventory after all.
+
+The inventory is kept in a block of shared memory (SharedInventory): the bitmap of available numbers and the
+array of their ints, laid out as in available_num_finder.PhoneInventory. The server owns the real inventory,
+where numbers are sold, and copies each change into the block. Its worker processes attach to the block by
+name, so the numbers are stored once however many workers there are. The word index is the memory-mapped
+index file, which the operating system already shares between every process that opens it.
+
+Requests and answers are JSON, one object a line. {"id": 1, "op": "find_first", "value": "6683"} is answered
+with {"id": 1, "result": "18002226683"}, or {"id": 1, "error": "...", "type": "InvalidPhoneNumberError"}. A
+client may send many requests before reading the answers, which can come back in any order.
+
+Numbers are added through the server ("add"), which checks that the shared block has room before it changes
+the inventory. A full block is reported as SharedInventoryFullError and leaves both as they were.
+
+Lookups that need the word index or a scan of the inventory are held for a moment (BATCH_WAIT_SECONDS, or
+until MAX_BATCH_SIZE of them have arrived, from any number of connections) and handed to a worker as one
+batch. A batch of endings is matched against the whole inventory in one vectorized pass per ending length
+(see word_checker.search_available_nums_for_words). Membership, sales and samples are answered by the server
+at once.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import alternatives
+import available_num_finder as anf
+import instrumentation
+import word_checker as wc
+
+# Where the window looks for a running server. Unset means the window does its own lookups.
+LOOKUP_ADDRESS = os.environ.get("HELPER_LOOKUP_ADDRESS")
+# Where the server listens when no address is given
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "helper_lookup.sock")
+# How long a lookup waits for others to batch with, and the most that go to a worker at once
+BATCH_WAIT_SECONDS = 0.002
+MAX_BATCH_SIZE = 512
+# Room left in the shared block for numbers added after the server starts
+SPARE_CAPACITY = 4096
+CLIENT_TIMEOUT_SECONDS = 30
+
+# Lookups that are batched and run on the workers, and requests the server answers itself
+BATCHED_OPERATIONS = ("find_first", "find_first_at", "find_words", "words_for_num", "find_alternatives")
+SERVER_OPERATIONS = ("contains", "add", "mark_sold", "sample", "len", "stats")
+
+# Throws an exception when a number is added to a shared inventory that has no room left.
+class SharedInventoryFullError(Exception):
+    def __init__(self, message="The shared inventory has no room for more numbers"):
+        self.message = message
+        super().__init__(self.message)
+
+# Throws an exception when the server cannot answer a request. error_type names the exception it raised.
+class LookupRequestError(Exception):
+    def __init__(self, message="The lookup server could not answer the request", error_type="LookupRequestError"):
+        self.message = message
+        self.error_type = error_type
+        super().__init__(self.message)
+
+# The exceptions a client raises again when the server reports them, so callers can catch the usual ones
+CLIENT_ERRORS = {
+    "InvalidPhoneNumberError": wc.InvalidPhoneNumberError,
+    "InvalidInventoryNumberError": anf.InvalidInventoryNumberError,
+    "SharedInventoryFullError": SharedInventoryFullError,
+}
+
+def parse_address(address:str) -> tuple[int, object]:
+    # Turns "host:port" into (AF_INET, (host, port)), and anything else into (AF_UNIX, path).
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+"""This class is an inventory of available numbers in a block of shared memory, which any process on the
+machine can attach to by name. The block holds a header (capacity and count), the bitmap over all ten million
+numbers and the array of stored ints. It answers the read-only questions a PhoneInventory answers. Only the
+process that created it changes it, by following a PhoneInventory: each number is written before it is
+counted and its bit set, and a sold number's bit is cleared before its slot is reused, so a lookup that runs
+during a change sees the number either before or after it changed."""
+class SharedInventory():
+    HEADER_ITEMS = 2            # capacity, count, as 8 byte ints
+    BITMAP_SIZE = anf.LOCAL_RANGE // 8
+
+    def __init__(self, memory:shared_memory.SharedMemory, owner:bool):
+        self.memory = memory
+        self.owner = owner
+        self.header = memory.buf[:8 * self.HEADER_ITEMS].cast("q")
+        self.capacity = self.header[0]
+        self.numbers_offset = 8 * self.HEADER_ITEMS + self.BITMAP_SIZE
+        self.bitmap = memory.buf[8 * self.HEADER_ITEMS:self.numbers_offset]
+        self.numbers = memory.buf[self.numbers_offset:self.numbers_offset + 4 * self.capacity].cast("i")
+        self.positions = None   # local_num -> slot in numbers, kept by the creator from its first removal on
+
+    @classmethod
+    def create(cls, inventory:anf.PhoneInventory, capacity:int|None = None) -> "SharedInventory":
+        # Copies an inventory into a new block of shared memory.
+        capacity = len(inventory) + SPARE_CAPACITY if capacity is None else max(capacity, len(inventory))
+        memory = shared_memory.SharedMemory(create=True, size=8 * cls.HEADER_ITEMS + cls.BITMAP_SIZE + 4 * max(capacity, 1))
+        memory.buf[:8 * cls.HEADER_ITEMS].cast("q")[0] = capacity
+        shared = cls(memory, owner=True)
+        shared.bitmap[:] = inventory.bitmap
+        shared.numbers[:len(inventory)] = inventory.local_numbers
+        shared.header[1] = len(inventory)
+        return shared
+
+    @classmethod
+    def attach(cls, name:str) -> "SharedInventory":
+        # Opens a block made by create() in another process.
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def __len__(self):
+        return self.header[1]
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield anf.format_local_number(self.numbers[position])
+
+    def __getitem__(self, position):
+        return anf.format_local_number(self.numbers[:len(self)][position])
+
+    def __contains__(self, phone_num):
+        try:
+            local_num = anf.to_local_number(phone_num)
+        except anf.InvalidInventoryNumberError:
+            return False
+        return self._has(local_num)
+
+    def _has(self, local_num:int) -> bool:
+        return bool(self.bitmap[local_num >> 3] & (1 << (local_num & 7)))
+
+    def as_numpy(self):
+        # Returns the stored ints as a numpy array over the shared memory, or None without numpy.
+        if anf.np is None:
+            return None
+        return anf.np.frombuffer(self.memory.buf, dtype=anf.np.int32, count=len(self), offset=self.numbers_offset)
+
+    def _scannable(self):
+        local_array = self.as_numpy()
+        return self.numbers[:len(self)] if local_array is None else local_array
+
+    def local_suffix(self, suffix:str) -> tuple[int, int]|None:
+        return anf.local_suffix(suffix)
+
+    def find_first(self, suffix:str) -> str|None:
+        # Returns the first number that ends with the suffix, or None if there isn't one.
+        local_suffix = anf.local_suffix(suffix)
+        if local_suffix is None:
+            return None
+        modulus, remainder = local_suffix
+        if modulus == anf.LOCAL_RANGE:
+            return anf.format_local_number(remainder) if self._has(remainder) else None
+        local_num = anf.scan_first_at(self._scannable(), suffix[-anf.LOCAL_DIGITS:], anf.LOCAL_DIGITS) if suffix else None
+        return None if local_num is None else anf.format_local_number(local_num)
+
+    def find_first_at(self, digits:str, stop:int) -> str|None:
+        # See PhoneInventory.find_first_at.
+        local_num = anf.scan_first_at(self._scannable(), digits, stop)
+        return None if local_num is None else anf.format_local_number(local_num)
+
+    def find_first_at_each(self, digits:str, stops) -> dict[int, str]:
+        # See PhoneInventory.find_first_at_each.
+        return {stop: anf.format_local_number(local_num) for stop, local_num in anf.scan_first_at_each(self._scannable(), digits, stops).items()}
+
+    def sample(self, count:int, generator=random) -> list[str]:
+        positions = generator.sample(range(len(self)), min(count, len(self)))
+        return [anf.format_local_number(self.numbers[position]) for position in positions]
+
+    def follow(self, inventory:anf.PhoneInventory):
+        # Copies every later change to the inventory into the block.
+        inventory.subscribe(self._on_change)
+
+    def has_room(self) -> bool:
+        # True if another number fits in the block. Check this before adding to the inventory being followed: 
+        # by the time the block hears of an addition, the inventory has already made it.
+        return len(self) < self.capacity
+
+    def _on_change(self, event:str, phone_num:str):
+        local_num = anf.to_local_number(phone_num)
+        count = len(self)
+        if event == "added":
+            if count == self.capacity:      # the inventory was added to without checking has_room()
+                raise SharedInventoryFullError(f"The shared inventory is full at {count} numbers")
+            self.numbers[count] = local_num
+            if self.positions is not None:
+                self.positions[local_num] = count
+            self.header[1] = count + 1
+            self.bitmap[local_num >> 3] |= 1 << (local_num & 7)
+            return
+        self.bitmap[local_num >> 3] &= ~(1 << (local_num & 7)) & 0xFF
+        if self.positions is None:      # as in PhoneInventory, removals are O(1) once the slots are mapped
+            self.positions = {stored_num: position for position, stored_num in enumerate(self.numbers[:count].tolist())}
+        position = self.positions.pop(local_num)
+        last_num = self.numbers[count - 1]
+        if last_num != local_num:       # fill the freed slot with the last number
+            self.numbers[position] = last_num
+            self.positions[last_num] = position
+        self.header[1] = count - 1
+
+    def close(self):
+        # Detaches from the block. The process that created it also destroys it.
+        for view in (self.header, self.bitmap, self.numbers):
+            view.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+# The worker processes' view of the server's inventory. Set by _start_worker.
+_shared_inventory = None
+
+def _start_worker(inventory_name:str, index_path:str, source_path:str):
+    # Runs once in each worker process: attaches to the inventory and opens the word index.
+    global _shared_inventory
+    wc._load_worker_word_index(index_path, source_path)
+    _shared_inventory = SharedInventory.attach(inventory_name)
+
+def _run_batch(operation:str, values:list) -> list[tuple]:
+    # Runs in a worker. Returns ("ok", result) or ("error", exception name, message) for each value, in order.
+    answers = [None] * len(values)
+    if operation == "find_first":
+        suffixes = {value for value in values if isinstance(value, str) and (value.isdigit() or value == "")}
+        found = wc.search_available_nums_for_words(suffixes, _shared_inventory)
+        for suffix, phone_num in found.items():
+            if phone_num is not None and phone_num not in _shared_inventory:      # sold while the batch was matched
+                found[suffix] = _shared_inventory.find_first(suffix)
+        for position, value in enumerate(values):
+            answers[position] = ("ok", found[value]) if value in suffixes else ("error", "ValueError", f"{value!r} is not a string of digits")
+        return answers
+    for position, value in enumerate(values):
+        try:
+            if operation == "find_first_at":
+                digits, stop = value
+                result = _shared_inventory.find_first_at(digits, int(stop))
+            elif operation == "words_for_num":
+                phone_num, order, limit, word_position, max_words = value
+                result = list(wc.iter_words_for_num(wc.prepare_phone_number(phone_num), order, limit, word_position, max_words))
+            elif operation == "find_alternatives":
+                word, limit = value
+                result = [alternative.as_list() for alternative in alternatives.find_alternatives(word, _shared_inventory, limit)]
+            else:
+                result = wc.find_words_for_num(wc.prepare_phone_number(value))
+            answers[position] = ("ok", result)
+        except Exception as error:
+            answers[position] = ("error", type(error).__name__, str(error))
+    return answers
+
+"""This class is the lookup server. It owns the inventory, its shared copy and the pool of worker processes,
+and answers requests from any number of connections on one asyncio event loop."""
+class LookupServer():
+    def __init__(self, inventory, workers:int|None = None, batch_wait:float = BATCH_WAIT_SECONDS, max_batch_size:int = MAX_BATCH_SIZE, spare_capacity:int = SPARE_CAPACITY):
+        self.inventory = inventory.inventory if isinstance(inventory, anf.AvailabilityIndex) else inventory
+        self.shared_inventory = SharedInventory.create(self.inventory, len(self.inventory) + spare_capacity)
+        self.shared_inventory.follow(self.inventory)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_wait = batch_wait
+        self.max_batch_size = max_batch_size
+        self.executor = None
+        self.server = None
+        self.socket_path = None
+        self.stopped = None
+        self.pending = {}       # operation -> [(value, future)] waiting to be sent to a worker
+        self.connections = {}   # the task handling each open connection -> its writer
+        self.counts = {"connections": 0, "requests": 0, "batches": 0, "batched_requests": 0}
+
+    async def start(self, address:str):
+        # Starts the workers and begins listening.
+        wc.get_word_index()     # make sure the index file exists before the workers go looking for it
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_start_worker, initargs=(self.shared_inventory.name, wc.WORD_INDEX_PATH, wc.WORD_SOURCE_PATH))
+        self.stopped = asyncio.Event()
+        family, target = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(target):
+                os.unlink(target)       # left behind by a server that did not shut down
+            self.socket_path = target
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=target)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, *target)
+
+    async def serve(self, address:str, on_ready=None):
+        # Serves until stop() is called, or the process is interrupted or terminated.
+        await self.start(address)
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, self.stopped.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass        # not on the main thread, or not supported here
+        if on_ready is not None:
+            on_ready()
+        try:
+            await self.stopped.wait()
+        finally:
+            # Hang up on the clients, so that their connections end instead of being cancelled.
+            self.server.close()
+            for writer in list(self.connections.values()):
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+
+    def stop(self):
+        # Asks serve() to return. Safe to call from another thread.
+        if self.stopped is not None:
+            self.server.get_loop().call_soon_threadsafe(self.stopped.set)
+
+    def close(self):
+        # Shuts down the workers and frees the shared inventory. Call after serve() has returned.
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        self.inventory.unsubscribe(self.shared_inventory._on_change)
+        self.shared_inventory.close()
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def handle_connection(self, reader, writer):
+        # Answers each request line as soon as its answer is ready, without waiting for the ones before it.
+        self.counts["connections"] += 1
+        self.connections[asyncio.current_task()] = writer
+        answers = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    answer = asyncio.ensure_future(self.answer(line, writer))
+                    answers.add(answer)
+                    answer.add_done_callback(answers.discard)
+            if answers:
+                await asyncio.gather(*answers)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    async def answer(self, line:bytes, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            response = {"id": request_id, "result": await self.run(request["op"], request.get("value"))}
+        except LookupRequestError as error:
+            response = {"id": request_id, "error": error.message, "type": error.error_type}
+        except Exception as error:
+            response = {"id": request_id, "error": str(error), "type": type(error).__name__}
+        if not writer.is_closing():
+            writer.write(json.dumps(response).encode() + b"\n")
+
+    async def run(self, operation:str, value):
+        # Answers one request.
+        self.counts["requests"] += 1
+        if operation in BATCHED_OPERATIONS:
+            return await self.run_batched(operation, value)
+        if operation not in SERVER_OPERATIONS:
+            raise LookupRequestError(f"Unknown operation {operation!r}")
+        if operation == "contains":
+            return value in self.inventory
+        if operation == "add":
+            return self.add(value)
+        if operation == "mark_sold":
+            return self.inventory.mark_sold(value)
+        if operation == "sample":
+            return self.inventory.sample(int(value))
+        if operation == "len":
+            return len(self.inventory)
+        return dict(self.counts, numbers=len(self.inventory), workers=self.workers)      # stats
+
+    def add(self, phone_num) -> bool:
+        # Adds a number to the inventory, and so to its shared copy. Returns False if it was already there. 
+        # Raises SharedInventoryFullError, and changes nothing, if the shared copy has no room left.
+        local_num = anf.to_local_number(phone_num)
+        if local_num in self.inventory:
+            return False
+        if not self.shared_inventory.has_room():
+            raise SharedInventoryFullError(f"The shared inventory is full at {len(self.shared_inventory)} numbers")
+        return self.inventory.add(local_num)
+
+    async def run_batched(self, operation:str, value):
+        # Adds a lookup to its operation's batch, which is sent to a worker when it is full or has waited long enough.
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.setdefault(operation, [])
+        batch.append((value, future))
+        if len(batch) >= self.max_batch_size:
+            self.flush(operation)
+        elif len(batch) == 1:
+            loop.call_later(self.batch_wait, self.flush, operation)
+        answer = await future
+        if answer[0] == "error":
+            raise LookupRequestError(answer[2], answer[1])
+        return answer[1]
+
+    def flush(self, operation:str):
+        batch = self.pending.pop(operation, None)
+        if not batch:
+            return
+        self.counts["batches"] += 1
+        self.counts["batched_requests"] += len(batch)
+        instrumentation.count("lookup_server.batches")
+        job = asyncio.get_running_loop().run_in_executor(self.executor, _run_batch, operation, [value for value, _ in batch])
+        job.add_done_callback(lambda job: self.deliver(batch, job))
+
+    def deliver(self, batch:list, job):
+        # Hands each lookup in a finished batch its answer.
+        if job.cancelled() or job.exception() is not None:
+            error = job.exception() if not job.cancelled() else LookupRequestError("The lookup was cancelled")
+            answers = [("error", type(error).__name__, str(error))] * len(batch)
+        else:
+            answers = job.result()
+        for (_, future), answer in zip(batch, answers):
+            if not future.done():
+                future.set_result(answer)
+
+"""This class is a connection to a lookup server. It can stand in for an inventory where the window uses one:
+it finds numbers by their endings, tells whether a number is available, samples numbers and sells them. It is
+safe to share between threads; each call holds the connection until its answers are in. If a call fails part
+way (the server goes away, or does not answer in time), the connection is dropped and the next call opens a
+new one, so answers left unread on the old connection are never taken for the answers to a later call."""
+class LookupClient():
+    def __init__(self, address:str|None = None, timeout:float = CLIENT_TIMEOUT_SECONDS):
+        self.address = address or LOOKUP_ADDRESS or DEFAULT_SOCKET_PATH
+        self.timeout = timeout
+        self.socket = None
+        self.replies = None
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count(1)
+        self._connect()         # raises OSError if the server cannot be reached
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        family, target = parse_address(self.address)
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            connection.connect(target)
+        except OSError:
+            connection.close()
+            raise
+        self.socket, self.replies = connection, connection.makefile("rb")
+
+    def close(self):
+        if self.socket is not None:
+            self.replies.close()
+            self.socket.close()
+            self.socket = self.replies = None
+
+    def call_many(self, operation:str, values) -> list:
+        # Sends one request for each value before reading any answer, so the server can batch them, and returns
+        # the results in order. Raises the first error the server reports, or OSError if the connection fails.
+        values = list(values)
+        with self.lock:
+            if self.socket is None:
+                self._connect()
+            request_ids = [next(self.request_ids) for _ in values]
+            lines = [json.dumps({"id": request_id, "op": operation, "value": value}) for request_id, value in zip(request_ids, values)]
+            wanted_ids = set(request_ids)
+            responses = {}
+            try:
+                if lines:
+                    self.socket.sendall(("\n".join(lines) + "\n").encode())
+                while len(responses) < len(request_ids):
+                    line = self.replies.readline()
+                    if not line:
+                        raise ConnectionError("The lookup server closed the connection")
+                    response = json.loads(line)
+                    if response.get("id") in wanted_ids:        # anything else is not an answer to this call
+                        responses[response["id"]] = response
+            except (OSError, ValueError):
+                self.close()
+                raise
+        return [self._result(responses[request_id]) for request_id in request_ids]
+
+    def call(self, operation:str, value=None):
+        return self.call_many(operation, [value])[0]
+
+    def _result(self, response:dict):
+        if "error" in response:
+            error_class = CLIENT_ERRORS.get(response["type"])
+            if error_class is not None:
+                raise error_class(response["error"])
+            raise LookupRequestError(response["error"], response["type"])
+        return response["result"]
+
+    def find_first(self, suffix:str) -> str|None:
+        return self.call("find_first", suffix)
+
+    def find_first_at(self, digits:str, stop:int) -> str|None:
+        return self.call("find_first_at", [digits, stop])
+
+    def find_first_at_each(self, digits:str, stops) -> dict[int, str]:
+        # The server checks every stop in one round trip.
+        stops = list(stops)
+        found = self.call_many("find_first_at", [[digits, stop] for stop in stops])
+        return {stop: phone_num for stop, phone_num in zip(stops, found) if phone_num is not None}
+
+    def find_numbers_for_words(self, words) -> dict[str, str|None]:
+        # The first available number for each word, or None, in one round trip.
+        words = list(words)
+        return dict(zip(words, self.call_many("find_first", [wc.find_num_for_word(word) for word in words])))
+
+    def find_words(self, phone_num:str) -> list[str]:
+        # The words a 1-800 number spells, as word_checker.find_words_for_num finds them.
+        return self.call("find_words", phone_num)
+
+    def words_for_num(self, phone_num:str, order:str = "longest", limit:int|None = None, position:str = "end", max_words:int = 1) -> list[str]:
+        # The words a 1-800 number spells, as word_checker.iter_words_for_num finds them.
+        return self.words_for_many([phone_num], order, limit, position, max_words)[0]
+
+    def words_for_many(self, phone_nums, order:str = "longest", limit:int|None = None, position:str = "end", max_words:int = 1) -> list[list[str]]:
+        # Does words_for_num for many numbers in one round trip.
+        return self.call_many("words_for_num", [[phone_num, order, limit, position, max_words] for phone_num in phone_nums])
+
+    def find_alternatives(self, word:str, limit:int = alternatives.DEFAULT_LIMIT) -> list[alternatives.Alternative]:
+        # The available alternatives to a word, as alternatives.find_alternatives finds them. The server keeps 
+        # the word index and the tree of similar words, so the window does not have to.
+        return [alternatives.Alternative(*fields) for fields in self.call("find_alternatives", [word, limit])]
+
+    def __contains__(self, phone_num):
+        return self.call("contains", phone_num)
+
+    def __len__(self):
+        return self.call("len")
+
+    def add(self, phone_num) -> bool:
+        # Makes a number available. Raises SharedInventoryFullError if the server has no room for it.
+        return self.call("add", phone_num)
+
+    def mark_sold(self, phone_num) -> bool:
+        return self.call("mark_sold", phone_num)
+
+    def sample(self, count:int, generator=None) -> list[str]:
+        # The server picks the numbers, so a generator passed here is not used.
+        return self.call("sample", count)
+
+    def stats(self) -> dict:
+        return self.call("stats")
+
+def run_load_test(address:str, clients:int = 8, requests_per_client:int = 1000, pipeline:int = 16, seed:int = 0) -> dict:
+    # Has `clients` threads, each with its own connection, send a mix of lookups (mostly endings, some
+    # numbers to spell out and some availability checks), `pipeline` requests at a time. Returns the
+    # throughput, the latency of each round trip and the server's batch counts.
+    round_trips = instrumentation.OperationStats()
+    round_trips_lock = threading.Lock()
+    failures = []
+
+    def run_client(client_number):
+        generator = random.Random(seed * 1000 + client_number)
+        latencies = []
+        try:
+            with LookupClient(address) as client:
+                for first in range(0, requests_per_client, pipeline):
+                    count = min(pipeline, requests_per_client - first)
+                    kind = generator.random()
+                    if kind < 0.7:
+                        operation, values = "find_first", [str(generator.randrange(10 ** 4)).zfill(4) for _ in range(count)]
+                    elif kind < 0.9:
+                        operation, values = "find_words", [anf.format_local_number(generator.randrange(anf.LOCAL_RANGE)) for _ in range(count)]
+                    else:
+                        operation, values = "contains", [anf.format_local_number(generator.randrange(anf.LOCAL_RANGE)) for _ in range(count)]
+                    start = time.perf_counter()
+                    client.call_many(operation, values)
+                    latencies.append(time.perf_counter() - start)
+        except Exception as error:
+            failures.append(f"client {client_number}: {error}")
+        with round_trips_lock:
+            for seconds in latencies:
+                round_trips.record(seconds)
+
+    threads = [threading.Thread(target=run_client, args=(client_number,)) for client_number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    with LookupClient(address) as client:
+        server_stats = client.stats()
+    requests = clients * requests_per_client
+    return {
+        "clients": clients,
+        "requests": requests,
+        "seconds": seconds,
+        "requests_per_second": requests / seconds if seconds else 0.0,
+        "round_trips": round_trips.as_dict(),
+        "failures": failures,
+        "server": server_stats,
+        "mean_batch_size": server_stats["batched_requests"] / server_stats["batches"] if server_stats["batches"] else 0.0,
+    }
+
+def wait_for_server(address:str, timeout:float = 30.0):
+    # Waits until a server is accepting connections at the address.
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            LookupClient(address, timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve word and number lookups to local clients, or load test a server.")
+    parser.add_argument("mode", choices=["serve", "loadtest"])
+    parser.add_argument("--address", default=LOOKUP_ADDRESS or DEFAULT_SOCKET_PATH, help="Unix socket path, or host:port")
+    parser.add_argument("--inventory", help="serve: file of available numbers (default: as the app finds them)")
+    parser.add_argument("--seed", type=int, help="serve: seed for the made-up inventory")
+    parser.add_argument("--workers", type=int, default=0, help="serve: worker processes (default: one per CPU)")
+    parser.add_argument("--clients", type=int, default=8, help="loadtest: connections sending requests at once")
+    parser.add_argument("--requests", type=int, default=1000, help="loadtest: requests sent by each client")
+    parser.add_argument("--pipeline", type=int, default=16, help="loadtest: requests a client sends before reading the answers")
+    parser.add_argument("--start-server", action="store_true", help="loadtest: start a server for the test, and stop it after")
+    args = parser.parse_args(argv)
+
+    if args.mode == "serve":
+        number_retrieval = anf.NumberRetrieval(args.seed)
+        inventory = number_retrieval.load_available_phone_nums(args.inventory) if args.inventory else number_retrieval.get_inventory()
+        server = LookupServer(inventory, workers=args.workers or None)
+        try:
+            asyncio.run(server.serve(args.address, on_ready=lambda: print(f"Serving {len(inventory)} numbers on {args.address} with {server.workers} workers", file=sys.stderr)))
+        finally:
+            server.close()
+        return 0
+
+    server_process = None
+    if args.start_server:
+        server_process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--address", args.address])
+    try:
+        wait_for_server(args.address)
+        results = run_load_test(args.address, args.clients, args.requests, args.pipeline)
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+    print(json.dumps(results, indent=2))
+    return 1 if results["failures"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,9 +14,15 @@ the number, it will simulate them purchasing the number."""
 import sys
 import tkinter as tk
 from tkinter import messagebox
+import alternatives
 import available_num_finder as anf
+import instrumentation
+import lookup_server
 import word_checker as wc
 from chatgpt_api_caller import APICall
+from results_view import ResultRow, VirtualResultsView
+from task_runner import TaskRunner
+from vanity_ranking import VanityRanking
 
 """This window appears in the display frame. It congratulates the user on having purchased a number and 
 instructs them to either click exit or return to look for more numbers by clicking a button in the menu 
@@ -49,6 +55,7 @@ class Search():
         overlong_word_label = tk.Label(self.display_location, text="1-800 numbers only accommodate words up to seven letters long.\nPlease try a shorter word.")
         overlong_word_label.pack()
 
+    @instrumentation.timed("search.find_number_for_search_term")
     def find_number_for_search_term(self):
         # Checks if there are any available numbers that match the user's word.
         if len(self.search_term) > 7:       # check that the number is short enough to be the end of a 1-800 number
@@ -59,14 +66,15 @@ class Search():
             blank_input_message.pack()
         else:                                                       # the user gave some input
             self.search_frame.display_desired_num(desired_num)       # tell the user what numerical ending they are looking for
-            for phone_number in self.available_numbers:     # check all the available numbers for the ending
-                number_found = False
-                if phone_number.endswith(desired_num):
-                    number_found = True
-                    self.search_frame.display_search_results(phone_number)       # show the user the available number
-                    break
-            if number_found == False:
-                self.search_frame.display_search_results(None)       # tell the user that their number is not available
+            # look the ending up in the index of available numbers, off of the event loop, since the numbers may 
+            # be kept by a lookup server. The result is None when the number is not available.
+            app.task_runner.submit(self.available_numbers.find_first, desired_num, on_done=self.show_number_found, on_error=self.search_frame.display_search_error)
+
+    def show_number_found(self, phone_number:str|None):
+        # Called on the Tk thread with the result of the lookup.
+        self.search_frame.display_search_results(phone_number)
+        if phone_number is None:        # look for the closest numbers that are available, off of the event loop
+            app.task_runner.submit(alternatives.find_alternatives, self.search_term, self.available_numbers, on_done=self.search_frame.display_alternatives)
 
 """This class displays the search window before and after the search, and instantiates the search class 
 when the user submits a search term in the entry box."""
@@ -88,6 +96,7 @@ class SearchWindow():
 
     def instantiate_search(self, event=None):
         # Instantiates a search class and runs the search when the user submits a search term in the entry box
+        app.task_runner.cancel_all()        # alternatives still being found for the last search are not wanted
         self.clear_search_results()
         self.search = Search(self.search_box.get(), self.master, self.available_numbers, self)
         self.search.find_number_for_search_term()
@@ -98,6 +107,7 @@ class SearchWindow():
         self.desired_num_label = tk.Label(self.master, text=f"You are looking for a number ending with {desired_num}.")
         self.desired_num_label.pack()
     
+    @instrumentation.timed("search.display_search_results")
     def display_search_results(self, number_results:str|None):
         # Displays the results of the search to the user. If the results are a phone number string, then it 
         # offers that phone number to the user. If the results are None, it informs the user that the number 
@@ -111,16 +121,31 @@ class SearchWindow():
             sorry_message = tk.Label(self.master, text="Sorry. That number is not available.\nTry another word, OR\nPress the button on the left to see words that are available.")
             sorry_message.pack()
 
+    def display_search_error(self, error:Exception):
+        # Lets the user know that the lookup failed, for instance because the lookup server went away.
+        error_message = tk.Label(self.master, text="Sorry! Something went wrong. Please try again.")
+        error_message.pack()
+
+    def display_alternatives(self, alternative_list:list):
+        # Shows the closest available numbers to an unavailable word, best first. Each is clickable and offers 
+        # its number for purchase.
+        if not alternative_list:
+            return
+        alternatives_label = tk.Label(self.master, text="\nThese numbers are close, and available:")
+        alternatives_label.pack()
+        alternatives_view = VirtualResultsView(self.master, on_click=self.master.ask_user_to_purchase)
+        alternatives_view.pack(fill=tk.BOTH, expand=True)
+        alternatives_view.set_rows(ResultRow(alternative.describe(), alternative.phone_num, "blue") for alternative in alternative_list)
+
     def clear_search_results(self):
         # Clears previous messages about whether or not a number is available, so that the user can make a 
-        # new search.
-        for i in range(len(self.master.winfo_children())-1, -1, -1):
-            if i > 1:
-                self.master.winfo_children()[i].destroy()
+        # new search. The first two widgets (the directions and the search box) are kept.
+        for widget in self.master.winfo_children()[2:]:
+            widget.destroy()
 
 """This window appears in the DisplayFrame when the chat button is clicked. It shows the user directions 
 and a text box. When the user presses enter on the text box, ChatGPT is called to make suggestions, and 
-the clickable suggestions are displayed in the display frame."""
+the clickable suggestions are displayed in the display frame, in a scrolling results view."""
 class ChatWindow():
     def __init__(self, available_numbers, master):
         self.available_numbers = available_numbers
@@ -142,71 +167,124 @@ class ChatWindow():
         self.chat_box.bind('<Return>', lambda event=None: self.get_chat_results())
 
     def get_chat_results(self):
-        # Calls the API on the user's input
+        # Calls the API on the user's input. The answer is streamed on a worker thread, and each suggested 
+        # word is checked and shown as soon as it arrives, so the window stays responsive and the first 
+        # results appear before ChatGPT has finished answering.
+        app.task_runner.cancel_all()        # an answer still streaming in for an earlier press of enter is not wanted
         user_input = self.chat_box.get("1.0", "end-1c")     # Get the user's input from the text box
         api_call = APICall(user_input)      # Instantiate the APICall class
-        self.display_chat_results(api_call.prepare_suggestions())       # Calls the API and displays the results
-
-    def display_chat_results(self, suggestions:list):
-        # Displays GPT's list of suggested words, along with their corresponding phone numbers and whether 
-        # the phone numbers are available. All of this info is neatly formatted in columns and available 
-        # numbers are clickable. If GPT does not return a list, an error message is displayed.
-        self.master.clear_display()
+        self.chat_directions.config(text="Asking ChatGPT for suggestions...")
+        self.header_shown = False
+        app.task_runner.submit_stream(self.stream_chat_rows, api_call, on_item=self.display_chat_row, on_done=self.finish_chat_results, on_error=lambda error: self.display_chat_error())
+
+    def stream_chat_rows(self, api_call):
+        # Runs on a worker thread. Yields (word, digits, available number or None) for each suggested word 
+        # as it arrives from the API.
+        for word in api_call.stream_suggestions():
+            if len(word) < 8:   # prevents GPT from suggesting words that are too long
+                yield word, wc.find_num_for_word(word), wc.search_available_nums_for_word(word, self.available_numbers)
+
+    def show_chat_results_header(self):
+        # Replaces the chat box with the column headers and an empty results view. The stream that is 
+        # filling in the results is left running.
+        self.master.clear_display(cancel_tasks=False)
+        self.header_shown = True
         # Display column headers
         self.suggestions_header = tk.Label(self.master, text="ChatGPT Says:  Number:  Availability\n", font=("courier", 9))
         self.suggestions_header.pack(anchor=tk.W)
-        if suggestions:     # if a list of suggestions is successfully returned
-            for word in suggestions:
-                if len(word) < 8:   # prevents GPT from suggesting words that are too long
-                    # Check if the suggested word is available
-                    available_num = wc.search_available_nums_for_word(word, self.available_numbers)
-                    # Set the right formatting for available and unavailable words
-                    if available_num != None:                   # when the number is available
-                        availability_message = "Available!"
-                        font_color = "blue"
-                        cursor_assignment = "hand2"
-                        available_bool = True
-                    else:                                       # when the number is not available
-                        availability_message = "Not available."
-                        font_color = "grey"
-                        cursor_assignment = "arrow"
-                        available_bool = False
-                    # Display available words as clickable and unavailable words as greyed out
-                    label = tk.Label(self.master, text=f"{word}{' '*(15-len(word))}{wc.find_num_for_word(word)}{' '*(9-len(word))}{availability_message}", fg=font_color, font=("courier", 9), cursor=cursor_assignment)
-                    label.pack(anchor=tk.W)
-                    if available_bool:
-                        label.bind("<Button-1>", lambda event, phone_num=available_num: self.master.ask_user_to_purchase(phone_num))
-        else:               # if a list of suggestions is not returned
-            self.error_label = tk.Label(self.master, text="Sorry! Something went wrong. Please try again.")
-            self.error_label.pack()
-
-"""This class shows the user a subset of the available numbers, and all the words that can be spelled 
-with those numbers. This operation takes some time, so a wait message is displayed, then destroyed."""
+        self.results_view = VirtualResultsView(self.master, on_click=self.master.ask_user_to_purchase, font=("courier", 9))
+        self.results_view.pack(fill=tk.BOTH, expand=True)
+
+    @instrumentation.timed("chat.display_chat_row")
+    def display_chat_row(self, row:tuple[str, str, str|None]):
+        # Adds one suggested word, its number and whether the number is available to the results view.
+        if not self.header_shown:
+            self.show_chat_results_header()
+        self.results_view.append(self.make_chat_row(row))
+
+    def make_chat_row(self, row:tuple[str, str, str|None]) -> ResultRow:
+        # Formats a suggestion in columns. Available words are clickable and unavailable words are greyed out.
+        word, digits, available_num = row
+        if available_num != None:                   # when the number is available
+            return ResultRow(f"{word}{' '*(15-len(word))}{digits}{' '*(9-len(word))}Available!", available_num, "blue")
+        return ResultRow(f"{word}{' '*(15-len(word))}{digits}{' '*(9-len(word))}Not available.", None, "grey")
+
+    def finish_chat_results(self, row_count:int):
+        # Called when the stream ends. If nothing usable came back, an error message is displayed.
+        if not self.header_shown:
+            self.display_chat_error()
+
+    def display_chat_error(self):
+        # Displays the column headers with an error message in place of the suggestions. If some suggestions 
+        # were already shown when the stream broke off, the message is added below them instead.
+        if self.header_shown:
+            self.results_view.append(ResultRow("Sorry! ChatGPT stopped before it finished. Please try again.", None, "red"))
+            return
+        self.show_chat_results_header()
+        self.error_label = tk.Label(self.master, text="Sorry! Something went wrong. Please try again.")
+        self.error_label.pack(before=self.results_view)
+
+"""This class shows the user some of the available numbers, and all the words that can be spelled with those 
+numbers, in a scrolling results view. Once the vanity ranking has been built, the whole inventory is shown, 
+best numbers first; each number's words are only looked up when it is scrolled into sight. Until then, a 
+random subset is searched, which takes some time, so a wait message is displayed, then destroyed."""
 class ShowSomeAvailableWordsWindow():
+    # Only this many of each number's longest words are shown
+    MAX_WORDS_PER_NUMBER = 10
+
     def __init__(self, available_numbers, master):
         self.available_numbers = available_numbers
         self.master=master
 
+    @instrumentation.timed("show.show_some_available_words")
     def show_some_available_words(self):
-        # Finds available words and displays them as clickable labels that lead to a purchase offer window.
+        # Finds available words and then displays them as clickable rows that lead to a purchase offer window.
         self.master.clear_display()
+        if app.vanity_ranking is not None and len(app.vanity_ranking):
+            self.display_combo_rows(self.iter_ranked_rows(), "Here are the best available numbers, and the words they spell.\n\nClick a number to purchase, OR\nScroll down to see more.\n")
+            return
         self.display_wait_message()
+        app.task_runner.submit(self.find_available_combos, on_done=self.display_available_combos)
+
+    def iter_ranked_rows(self):
+        # Yields a row for each number in the vanity ranking, best first. It is read as the user scrolls, so 
+        # only the numbers that are shown have their words looked up.
+        for phone_num, score, best_word in app.vanity_ranking.iter_best():
+            prepared_num = wc.prepare_phone_number(phone_num)
+            temp_words = list(wc.iter_words_for_num(prepared_num, position="anywhere", limit=self.MAX_WORDS_PER_NUMBER))
+            yield ResultRow(f"{phone_num}: {temp_words or [best_word]}", phone_num, "blue")
+
+    @instrumentation.timed("show.find_available_combos")
+    def find_available_combos(self) -> dict[str, list[str]]:
+        # Runs on a worker thread, so it must not touch any widgets.
         available_combos = {}       # phone numbers will be keys and lists of words spelled from those numbers will be values
         # retrieve a subset of the available numbers. (A subset is necessary because this operation takes some time.)
-        for phone_num in app.number_retrieval.get_available_phone_nums_short(self.available_numbers):
-            prepared_num = wc.prepare_phone_number(phone_num)       # strip 1-800 from number
-            temp_words = wc.find_words_for_num(prepared_num)        
+        phone_nums = app.number_retrieval.get_available_phone_nums_short(self.available_numbers)
+        # longest words come first, so they show on the left; words past the limit are never looked for. A 
+        # lookup server finds the words for all of the numbers in one round trip.
+        if hasattr(self.available_numbers, "words_for_many"):
+            word_lists = self.available_numbers.words_for_many(phone_nums, order="longest", limit=self.MAX_WORDS_PER_NUMBER)
+        else:
+            word_lists = (list(wc.iter_words_for_num(wc.prepare_phone_number(phone_num), order="longest", limit=self.MAX_WORDS_PER_NUMBER)) for phone_num in phone_nums)
+        for phone_num, temp_words in zip(phone_nums, word_lists):
             if temp_words:                                          # only show numbers that spell words
-                temp_words.sort(key=len, reverse=True)              # show longest words on the left
                 available_combos[phone_num] = temp_words
-        self.directions_label = tk.Label(self.master, text="Here are some available numbers, and the words they spell.\n\nClick a number to purchase, OR\nClick Show_me_some_available_words again to see more.\n", pady=10)
-        self.directions_label.pack()
-        # Display all pairs of number and word list as clickable labels
-        for selected_number, word_list in available_combos.items():
-            label = tk.Label(self.master, text=f"{selected_number}: {[word for word in word_list]}", cursor="hand2", fg="blue")
-            label.pack(anchor=tk.W)
-            label.bind("<Button-1>", lambda event, offered_number=selected_number: self.master.ask_user_to_purchase(offered_number))
+        return available_combos
+
+    def display_available_combos(self, available_combos:dict[str, list[str]]):
+        # Called on the Tk thread with the results of find_available_combos.
         self.destroy_wait_message()
+        rows = (ResultRow(f"{selected_number}: {word_list}", selected_number, "blue") for selected_number, word_list in available_combos.items())
+        self.display_combo_rows(rows, "Here are some available numbers, and the words they spell.\n\nClick a number to purchase, OR\nClick Show_me_some_available_words again to see more.\n")
+
+    @instrumentation.timed("show.display_combo_rows")
+    def display_combo_rows(self, rows, directions:str):
+        # Shows the directions and a results view that reads the rows as they are scrolled into sight.
+        self.directions_label = tk.Label(self.master, text=directions, pady=10)
+        self.directions_label.pack()
+        self.results_view = VirtualResultsView(self.master, on_click=self.master.ask_user_to_purchase)
+        self.results_view.pack(fill=tk.BOTH, expand=True)
+        self.results_view.set_rows(rows)
 
     def display_wait_message(self):
         # Displays a wait message
@@ -231,8 +309,12 @@ class DisplayFrame(tk.Frame):
         self.pack_propagate(False)
         self.pack(side=tk.RIGHT)
 
-    def clear_display(self):
-        # Clears all widgets from display frame, so that a new screen can appear
+    @instrumentation.timed("display.clear_display")
+    def clear_display(self, cancel_tasks=True):
+        # Clears all widgets from display frame, so that a new screen can appear. Work still running for the 
+        # old screen is cancelled, and its results will be ignored, unless cancel_tasks is False.
+        if cancel_tasks:
+            app.task_runner.cancel_all()
         leftovers = self.winfo_children()
         for widget in leftovers:
             widget.destroy()
@@ -244,7 +326,17 @@ class DisplayFrame(tk.Frame):
         # window. If they choose no, nothing happens.
         purchase_answer = messagebox.askyesno(f"Purchase number?", f"Do you want to purchase the number {offered_number}?")
         if purchase_answer:         # If the chooser clicks yes
+            # Take the number out of the inventory, off of the event loop. Its index entries, cached searches 
+            # and ranking follow along.
+            app.task_runner.submit(app.available_numbers_long.mark_sold, offered_number, on_done=lambda sold: self.finish_purchase(offered_number, sold), on_error=lambda error: self.finish_purchase(offered_number, False))
+
+    def finish_purchase(self, offered_number:str, sold:bool):
+        # Shows the purchase complete window, or tells the user that the number could not be sold to them 
+        # (someone else may have just bought it).
+        if sold:
             app.purchase_completion_frame.show_purchase_complete_frame(offered_number)
+        else:
+            messagebox.showinfo("Number not purchased", f"Sorry, the number {offered_number} could not be purchased. It may no longer be available.")
 
 """The menu frame appears on the left side of the GUI. It always displays three buttons: one for search, 
 one for chat, and one for show. These buttons call the classes for the corresponding display windows."""
@@ -283,7 +375,25 @@ class MainApp(tk.Tk):
 
         # Retrieve available phone numbers to compare user requests against.
         self.number_retrieval = anf.NumberRetrieval()
-        self.available_numbers_long = self.number_retrieval.get_available_phone_nums_long()
+        # Runs slow work (word searches, ChatGPT calls) off of the event loop.
+        self.task_runner = TaskRunner(self)
+        self.vanity_ranking = None
+        # Share the inventory of a lookup server running on this machine, if there is one, instead of making 
+        # one up. Its client finds, samples and sells numbers like a local inventory would. The show window 
+        # uses random numbers, since only a local inventory can be ranked.
+        self.available_numbers_long = self.connect_to_lookup_server() if lookup_server.LOOKUP_ADDRESS else None
+        if self.available_numbers_long is None:
+            self.available_numbers_long = self.number_retrieval.get_inventory()
+            # Index the numbers' endings in the background. Until the index is ready, searches scan the inventory, 
+            # which finds the same numbers.
+            self.task_runner.submit(self.number_retrieval.index_available_phone_nums, self.available_numbers_long, on_done=self.set_availability_index, background=True)
+            # Score every available number by its best word in the background; until that is done, the show 
+            # window falls back to random numbers. The worker scores a snapshot, so the inventory can keep changing.
+            inventory_snapshot = self.available_numbers_long.snapshot()
+            self.task_runner.submit(VanityRanking, inventory_snapshot, on_done=lambda ranking: self.set_vanity_ranking(ranking, inventory_snapshot), background=True)
+            # Build the index of similar words now, so that the first search for an unavailable word is not slow. 
+            # A lookup server keeps its own, along with the word index, so a client loads neither.
+            self.task_runner.submit(alternatives.get_digit_tree, background=True)
 
         # Initialize necessary classes.
         self.menu_frame = MenuFrame(master=self)
@@ -293,6 +403,26 @@ class MainApp(tk.Tk):
         self.search_frame = SearchWindow(self.available_numbers_long, master=self.display_frame)
         self.purchase_completion_frame = PurchaseCompleteWindow(master=self.display_frame)
 
+    def connect_to_lookup_server(self):
+        # Returns a client of the lookup server, or None if it cannot be reached, in which case a local 
+        # inventory is used instead.
+        try:
+            return lookup_server.LookupClient(lookup_server.LOOKUP_ADDRESS)
+        except OSError as error:
+            print(f"Could not reach the lookup server at {lookup_server.LOOKUP_ADDRESS} ({error}), so a local inventory is used", file=sys.stderr)
+            return None
+
+    def set_availability_index(self, availability_index):
+        # Has every window search the index from now on. It wraps the same inventory, so nothing is lost.
+        self.available_numbers_long = availability_index
+        for window in (self.chat_frame, self.show_some_available_words_frame, self.search_frame):
+            window.available_numbers = availability_index
+
+    def set_vanity_ranking(self, vanity_ranking, inventory_snapshot):
+        # Catches the ranking up with changes made while it was being built, then keeps it up to date.
+        vanity_ranking.follow(self.available_numbers_long, inventory_snapshot)
+        self.vanity_ranking = vanity_ranking
+
 if __name__ == "__main__":
     app = MainApp()
     app.mainloop()
@@ -0,0 +1,173 @@
+"""This module shows long lists of results (available numbers, ChatGPT's suggestions) in the display frame
+without making a widget for every result. The view keeps only as many labels as fit on screen and writes
+whichever rows are scrolled into sight into them, so a list of thousands of rows costs the same to show as a
+list of twenty. The rows themselves can come from a generator, which is only asked for more, a page at a time,
+as the user scrolls towards the end of what has been pulled so far.
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+from itertools import islice
+
+import instrumentation
+
+"""This class is one row of results: its text, the value handed to the view's click callback (None for a row
+that cannot be clicked) and its text colour."""
+class ResultRow():
+    __slots__ = ("text", "value", "color")
+
+    def __init__(self, text:str, value=None, color:str|None = None):
+        self.text = text
+        self.value = value
+        self.color = color
+
+    def __eq__(self, other):
+        return isinstance(other, ResultRow) and (self.text, self.value, self.color) == (other.text, other.value, other.color)
+
+    def __repr__(self):
+        return f"ResultRow({self.text!r}, {self.value!r}, {self.color!r})"
+
+"""This class holds the rows pulled from a generator so far, and pulls more, a page at a time, when rows past
+the end are asked for. It does not touch any widgets, so it can be tested without a window."""
+class PagedRows():
+    def __init__(self, source=(), page_size=100):
+        self.rows = []
+        self.source = iter(source)
+        self.page_size = page_size
+        self.exhausted = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, position):
+        return self.rows[position]
+
+    def append(self, row:ResultRow):
+        # Adds a row that arrived on its own, such as a streamed ChatGPT suggestion.
+        self.rows.append(row)
+
+    @instrumentation.timed("results_view.page_in")
+    def ensure(self, count:int) -> int:
+        # Pulls pages from the source until there are at least `count` rows or it runs out. Returns how many
+        # rows there are.
+        while len(self.rows) < count and not self.exhausted:
+            page = list(islice(self.source, self.page_size))
+            self.rows.extend(page)
+            if len(page) < self.page_size:
+                self.exhausted = True
+        return len(self.rows)
+
+    def window(self, first:int, count:int) -> list[ResultRow]:
+        # Returns the rows from `first` on that fit in `count` lines, pulling more if needed.
+        self.ensure(first + count)
+        return self.rows[first:first + count]
+
+"""This class is the scrollable list of results. on_click(value) is called when a row with a value is clicked."""
+class VirtualResultsView(tk.Frame):
+    PAGE_SIZE = 100
+    WHEEL_ROWS = 3          # rows moved by one notch of the mouse wheel
+
+    def __init__(self, master, on_click=None, font=None, **options):
+        super().__init__(master, **options)
+        self.on_click = on_click
+        self.font = tkfont.Font(root=self, font=font) if font else tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 2
+        self.rows = PagedRows(page_size=self.PAGE_SIZE)
+        self.first_row = 0              # the row shown in the top label
+        self.visible_rows = 1
+        self.labels = []                # the pool of labels, reused as the rows scroll past
+        self.default_color = None
+
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.body = tk.Frame(self)
+        self.body.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.body.bind("<Configure>", self.on_resize)
+        for widget in (self, self.body):
+            self.bind_scroll_wheel(widget)
+
+    def bind_scroll_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self.scroll_by(-self.WHEEL_ROWS if event.delta > 0 else self.WHEEL_ROWS))
+        widget.bind("<Button-4>", lambda event: self.scroll_by(-self.WHEEL_ROWS))      # X11 reports the wheel as buttons
+        widget.bind("<Button-5>", lambda event: self.scroll_by(self.WHEEL_ROWS))
+
+    def on_resize(self, event):
+        # Makes the pool hold as many labels as fit in the view's height.
+        self.visible_rows = max(1, event.height // self.row_height)
+        while len(self.labels) < self.visible_rows:
+            slot = len(self.labels)
+            label = tk.Label(self.body, font=self.font, anchor=tk.W, bd=0, pady=1)
+            label.bind("<Button-1>", lambda event, slot=slot: self.on_label_click(slot))
+            self.bind_scroll_wheel(label)
+            if self.default_color is None:
+                self.default_color = label.cget("fg")
+            self.labels.append(label)
+        for slot, label in enumerate(self.labels):
+            if slot < self.visible_rows:
+                label.grid(row=slot, column=0, sticky=tk.W)
+            else:
+                label.grid_remove()
+        self.scroll_to(self.first_row)
+        self.render()
+
+    def set_rows(self, source):
+        # Shows the rows from an iterable (a list, or a generator that is only read as far as the user scrolls).
+        self.rows = PagedRows(source, self.PAGE_SIZE)
+        self.first_row = 0
+        self.render()
+
+    def append(self, row:ResultRow):
+        # Adds one row to the end. Only redraws if the new row is on screen.
+        self.rows.append(row)
+        if len(self.rows) - 1 < self.first_row + self.visible_rows:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def clear(self):
+        self.set_rows(())
+
+    def total_rows(self) -> int:
+        # The length the scrollbar is drawn for: the rows pulled so far, plus a screen more if the source may
+        # still have rows, so that there is always somewhere to scroll to.
+        return len(self.rows) + (0 if self.rows.exhausted else self.visible_rows)
+
+    def scroll_to(self, first_row:int):
+        self.rows.ensure(first_row + self.visible_rows)
+        first_row = min(max(0, first_row), max(0, len(self.rows) - self.visible_rows))
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.render()
+
+    def scroll_by(self, row_count:int):
+        self.scroll_to(self.first_row + row_count)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total_rows()))
+        elif action == "scroll":
+            self.scroll_by(int(amount) * (self.visible_rows if unit == "pages" else 1))
+
+    @instrumentation.timed("results_view.render")
+    def render(self):
+        # Writes the rows in sight into the pooled labels.
+        shown_rows = self.rows.window(self.first_row, self.visible_rows)
+        for slot, label in enumerate(self.labels[:self.visible_rows]):
+            if slot < len(shown_rows):
+                row = shown_rows[slot]
+                label.config(text=row.text, fg=row.color or self.default_color, cursor="hand2" if row.value is not None else "")
+            else:
+                label.config(text="", cursor="")
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total_rows = self.total_rows()
+        if total_rows == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first_row / total_rows, min(1, (self.first_row + self.visible_rows) / total_rows))
+
+    def on_label_click(self, slot:int):
+        position = self.first_row + slot
+        if position < len(self.rows) and self.rows[position].value is not None and self.on_click is not None:
+            self.on_click(self.rows[position].value)
@@ -0,0 +1,128 @@
+"""This module keeps ChatGPT's suggestions in a small SQLite database, so that a description that has already
+been sent (like the example text in the chat box) is answered in milliseconds instead of by another call
+to the API.
+
+Entries are keyed by a hash of the normalized description together with the model and temperature, so
+descriptions that differ only in case, spacing or trailing punctuation share an entry. Entries expire after
+a time to live, and the least recently used ones are dropped when the cache is full. Hits and misses are
+counted in the database, so the hit rate can be checked across runs:
+
+    python suggestion_cache.py --stats
+
+which prints the hit counts, the number of entries, the size of the database file and when the oldest and
+newest entries were made.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.environ.get("HELPER_SUGGESTION_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "suggestion_cache.sqlite3"))
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+def normalize_description(user_message : str) -> str:
+    # Lowercases the description, squeezes runs of whitespace into one space and drops trailing punctuation.
+    return re.sub(r"\s+", " ", user_message.casefold()).strip().rstrip(".!?,;: ")
+
+def make_cache_key(user_message : str, model : str, temperature : float) -> str:
+    key_source = json.dumps([normalize_description(user_message), model, temperature])
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+"""This class is the cache itself. It is safe to use from several threads."""
+class SuggestionCache():
+    def __init__(self, path=DEFAULT_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS suggestions (key TEXT PRIMARY KEY, suggestions TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS suggestions_last_used ON suggestions (last_used)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self.connection.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    def get(self, key : str) -> list[str]|None:
+        # Returns the cached suggestions for a key, or None if there are none or they have expired.
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT suggestions, created FROM suggestions WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self.connection.execute("DELETE FROM suggestions WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'misses'")
+                return None
+            self.connection.execute("UPDATE suggestions SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+            return json.loads(row[0])
+
+    def put(self, key : str, suggestions : list[str]):
+        # Stores suggestions under a key, then drops the least recently used entries beyond max_entries.
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO suggestions (key, suggestions, created, last_used) VALUES (?, ?, ?, ?)", (key, json.dumps(suggestions), now, now))
+            self.connection.execute("DELETE FROM suggestions WHERE key IN (SELECT key FROM suggestions ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def purge_expired(self) -> int:
+        # Deletes every expired entry and returns how many there were.
+        with self.lock, self.connection:
+            return self.connection.execute("DELETE FROM suggestions WHERE created < ?", (time.time() - self.ttl_seconds,)).rowcount
+
+    def clear(self):
+        # Deletes every entry and resets the counters.
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM suggestions")
+            self.connection.execute("UPDATE counters SET value = 0")
+
+    def stats(self) -> dict:
+        # Returns the hit counts and the size of the cache. The oldest and newest entries are given by when 
+        # they were made, as Unix times (None when the cache is empty).
+        with self.lock:
+            counters = dict(self.connection.execute("SELECT name, value FROM counters"))
+            entries, oldest, newest = self.connection.execute("SELECT COUNT(*), MIN(created), MAX(created) FROM suggestions").fetchone()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "oldest_entry": oldest,
+            "newest_entry": newest,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect the ChatGPT suggestion cache.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--clear", action="store_true", help="delete every entry and reset the counters")
+    parser.add_argument("--purge", action="store_true", help="delete expired entries")
+    parser.add_argument("--stats", action="store_true", help="print the hit counts, entry count, size and the oldest and newest entries (the default)")
+    args = parser.parse_args(argv)
+    cache = SuggestionCache(args.path)
+    if args.clear:
+        cache.clear()
+    if args.purge:
+        print(f"Deleted {cache.purge_expired()} expired entries")
+    if args.stats or not (args.clear or args.purge):
+        stats = cache.stats()
+        for name in ("oldest_entry", "newest_entry"):
+            if stats[name] is not None:
+                stats[name] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stats[name]))
+        print(json.dumps(stats, indent=2))
+    cache.close()
+
+if __name__ == "__main__":
+    main()
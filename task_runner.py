@@ -0,0 +1,128 @@
+"""This module runs slow jobs, like the ChatGPT call and the search for words in a run of numbers, away from
+the Tk event loop so that the window stays responsive. Jobs run in a pool of worker threads (or any other
+concurrent.futures executor). When a job finishes, its result is put on a queue, and the Tk event loop picks
+it up with after() and hands it to a callback on the main thread, which is the only thread allowed to touch
+widgets.
+
+When the user switches screens, cancel_all() is called. Jobs that have not started yet are cancelled, and
+the results of jobs that were already running are thrown away when they arrive, so a stale result never
+lands on the new screen. Jobs submitted with background=True (like building the vanity ranking at start-up)
+do not belong to any screen and are left alone by cancel_all(). They run one at a time on a worker of their
+own, so a long start-up build never holds up the jobs the user is waiting for.
+
+A job can also produce a stream of results (submit_stream). Each item is handed to the Tk thread as soon as
+it is ready, and a streaming job that has been cancelled stops asking its iterator for more.
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+"""This class is a handle to one submitted job."""
+class Task():
+    def __init__(self, runner, generation, background=False):
+        self.runner = runner
+        self.generation = generation
+        self.background = background
+        self.future = None
+
+    def cancel(self):
+        # Stops the job if it has not started. Its result is discarded either way.
+        self.generation = None
+        if self.future is not None:
+            self.future.cancel()
+
+    def is_stale(self) -> bool:
+        # True once the task has been cancelled or the user has moved on. Safe to call from the worker.
+        if self.background:
+            return self.generation is None
+        return self.generation != self.runner.generation
+
+"""This class owns the worker pool and the result queue for one Tk root window."""
+class TaskRunner():
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, root, executor=None, max_workers=2, background_executor=None):
+        self.root = root
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="helper-task")
+        self.background_executor = background_executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="helper-background")
+        self.results = queue.Queue()
+        self.generation = 0         # bumped by cancel_all(); tasks from an older generation are stale
+        self.pending = set()
+        self.polling = False
+
+    def submit(self, job, *args, on_done=None, on_error=None, background=False) -> Task:
+        # Runs job(*args) on a worker. on_done(result) or on_error(exception) is then called on the Tk thread.
+        # A background job survives cancel_all() and runs on the background worker.
+        task = Task(self, self.generation, background)
+        task.future = (self.background_executor if background else self.executor).submit(job, *args)
+        self.pending.add(task)
+        task.future.add_done_callback(lambda future: self.results.put((task, True, lambda: self._finish(task, on_done, on_error))))
+        self._schedule_poll()
+        return task
+
+    def submit_stream(self, make_items, *args, on_item=None, on_done=None, on_error=None) -> Task:
+        # Runs make_items(*args), which returns an iterator, on a worker. on_item(item) is called on the Tk
+        # thread for each item as it comes out, then on_done(count of items) or on_error(exception).
+        task = Task(self, self.generation)
+
+        def deliver_items():
+            count = 0
+            for item in make_items(*args):
+                if task.is_stale():
+                    break           # nobody is waiting for the rest
+                if on_item is not None:
+                    self.results.put((task, False, lambda item=item: on_item(item)))
+                count += 1
+            return count
+
+        task.future = self.executor.submit(deliver_items)
+        self.pending.add(task)
+        task.future.add_done_callback(lambda future: self.results.put((task, True, lambda: self._finish(task, on_done, on_error))))
+        self._schedule_poll()
+        return task
+
+    def cancel_all(self):
+        # Discards every job submitted so far. Called when the user leaves the screen that asked for them.
+        self.generation += 1
+        for task in self.pending:
+            if not task.background:
+                task.future.cancel()
+
+    def _schedule_poll(self):
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.POLL_INTERVAL_MS, self.poll)
+
+    def poll(self):
+        # Delivers finished results (and streamed items) to their callbacks. Keeps polling while any job is 
+        # still out.
+        self.polling = False
+        while True:
+            try:
+                task, is_final, deliver = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if is_final:
+                self.pending.discard(task)
+            if not task.is_stale():     # otherwise the user has moved on
+                deliver()
+        if self.pending:
+            self._schedule_poll()
+
+    def _finish(self, task, on_done, on_error):
+        # Hands a finished job's result or exception to its callback.
+        if task.future.cancelled():
+            return
+        exception = task.future.exception()
+        if exception is not None:
+            if on_error is not None:
+                on_error(exception)
+            else:       # report it the way Tk reports an exception in any other callback
+                self.root.report_callback_exception(type(exception), exception, exception.__traceback__)
+        elif on_done is not None:
+            on_done(task.future.result())
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.background_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,83 @@
+"""This program will test the proper functioning of alternatives.py."""
+
+import random
+import unittest
+import alternatives as al
+import available_num_finder as anf
+import word_checker as wc
+
+class TestAlternatives(unittest.TestCase):
+
+    def setUp(self):
+        self.word_index = wc.TemporaryWordIndex(["taxi", "taxa", "tax", "cool", "move", "go"])
+        self.word_index.start()
+
+    def tearDown(self):
+        self.word_index.stop()
+
+    def test_edit_distance(self):
+        self.assertEqual(al.edit_distance("taxi", "taxa"), 1)
+        self.assertEqual(al.edit_distance("taxi", "tax"), 1)
+        self.assertEqual(al.edit_distance("kitten", "sitting"), 3)
+        self.assertEqual(al.edit_distance("", "cab"), 3)
+        self.assertEqual(al.edit_distance("move", "move"), 0)
+        generator = random.Random(5)
+        for _ in range(500):        # the distance must agree both ways round
+            first = "".join(generator.choice("2345") for _ in range(generator.randint(0, 7)))
+            second = "".join(generator.choice("2345") for _ in range(generator.randint(0, 7)))
+            self.assertEqual(al.edit_distance(first, second), al.edit_distance(second, first))
+
+    def test_bk_tree_search(self):
+        keys = ["8294", "8292", "829", "2665", "6683", "46", "8294"]
+        tree = al.BKTree(keys)
+        self.assertEqual(len(tree), 6)
+        self.assertEqual(tree.search("8294", 1), [(0, "8294"), (1, "829"), (1, "8292")])
+        self.assertEqual(tree.search("1111", 1), [])
+        generator = random.Random(7)
+        for _ in range(50):         # every key within the radius is found, and nothing else
+            key = "".join(generator.choice("23468") for _ in range(generator.randint(2, 5)))
+            expected = sorted((al.edit_distance(key, other), other) for other in set(keys) if al.edit_distance(key, other) <= 2)
+            self.assertEqual(tree.search(key, 2), expected)
+
+    def test_find_alternatives(self):
+        inventory = anf.AvailabilityIndex(["18008294555", "18002228292", "18009992005", "18005550001"])
+        alternatives = al.find_alternatives("taxi", inventory)
+        self.assertEqual([(alternative.phone_num, alternative.word, alternative.kind) for alternative in alternatives],
+                         [("18008294555", "taxi", "position"), ("18002228292", "taxa", "similar")])
+        self.assertEqual(alternatives[0].describe(), "1-800-TAXI-555  (same word, another place)")
+        self.assertEqual(alternatives[1].spelled_number(), "1-800-222-TAXA")
+
+        lookalikes = al.find_alternatives("cool", inventory)
+        self.assertEqual([(alternative.phone_num, alternative.word, alternative.kind) for alternative in lookalikes],
+                         [("18009992005", "c00l", "lookalike")])
+        self.assertEqual(lookalikes[0].spelled_number(), "1-800-999-C00L")
+
+    def test_list_of_numbers_and_limit(self):
+        available_nums = ["18008294555", "18002829401", "18002228292"]
+        alternatives = al.find_alternatives("taxi", available_nums)
+        self.assertEqual([alternative.phone_num for alternative in alternatives], ["18008294555", "18002829401", "18002228292"])
+        self.assertEqual(len(al.find_alternatives("taxi", available_nums, limit=1)), 1)
+
+    @unittest.skipIf(anf.np is None, "a million numbers are only scanned quickly with numpy")
+    def test_inventory_scale(self):
+        # A million numbers, none of which has TAXI anywhere in it, so every place has to be checked all the way 
+        # through. How long that takes is measured by benchmark.py.
+        local_numbers = anf.generate_local_numbers(1_000_000, random.Random(3)).astype(anf.np.int64)
+        spells_taxi = anf.np.zeros(len(local_numbers), dtype=bool)
+        for stop in range(4, anf.LOCAL_DIGITS + 1):
+            spells_taxi |= local_numbers // 10 ** (anf.LOCAL_DIGITS - stop) % 10000 == 8294
+        inventory = anf.PhoneInventory.from_local_numbers(local_numbers[~spells_taxi])
+        alternatives = al.find_alternatives("taxi", inventory)
+        self.assertEqual([alternative for alternative in alternatives if alternative.kind == "position"], [])
+        inventory.add("18001829400")
+        self.assertEqual(al.find_same_word_elsewhere("taxi", "8294", inventory)[0].phone_num, "18001829400")
+
+    def test_nothing_to_offer(self):
+        inventory = anf.AvailabilityIndex(["18002222222"])
+        self.assertEqual(al.find_alternatives("", inventory), [])
+        self.assertEqual(al.find_alternatives("toolongword", inventory), [])
+        self.assertEqual(al.find_alternatives("taxi!", inventory), [])
+        self.assertEqual(al.find_alternatives("taxi", inventory), [])
+
+if __name__ == "__main__":
+    unittest.main()
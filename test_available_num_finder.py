@@ -0,0 +1,229 @@
+"""This program will test the proper functioning of available_num_finder.py."""
+
+import os
+import tempfile
+import threading
+import unittest
+import available_num_finder as anf
+import word_checker as wc
+
+class TestANF(unittest.TestCase):
+
+    def setUp(self):
+        self.available_nums = ["18002278779", "18004444364", "18005556683", "18001116683"]
+
+    def test_availability_index_find_first(self):
+        index = anf.AvailabilityIndex(self.available_nums)
+        self.assertEqual(index.find_first("2278779"), "18002278779")
+        self.assertEqual(index.find_first("364"), "18004444364")
+        self.assertEqual(index.find_first("6683"), "18005556683")
+        self.assertEqual(index.find_first("06683"), None)
+        self.assertEqual(index.find_first("7777"), None)
+        self.assertEqual(index.find_first("64"), "18004444364")      # shorter than the index, so scanned
+
+    def test_availability_index_find_all(self):
+        index = anf.AvailabilityIndex(self.available_nums)
+        self.assertEqual(index.find_all("6683"), ["18005556683", "18001116683"])
+        self.assertEqual(index.find_all("116683"), ["18001116683"])
+        self.assertEqual(index.find_all("9999"), [])
+
+    def test_availability_index_acts_like_list(self):
+        index = anf.NumberRetrieval().index_available_phone_nums(self.available_nums)
+        self.assertEqual(list(index), self.available_nums)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index[1], "18004444364")
+        self.assertIs(anf.NumberRetrieval().index_available_phone_nums(index), index)
+
+    def test_closed_index_stops_listening(self):
+        inventory = anf.PhoneInventory(self.available_nums)
+        for _ in range(3):
+            anf.AvailabilityIndex(inventory).close()
+        index = anf.AvailabilityIndex(inventory)
+        self.assertEqual(len(inventory.listeners), 1)
+        index.close()
+        index.close()
+        self.assertEqual(inventory.listeners, [])
+
+    def test_index_and_inventory_agree_after_removals(self):
+        wc.clear_caches()
+        inventory = anf.PhoneInventory(["18001112683", "18002222683", "18003332683", "18004442683"])
+        index = anf.AvailabilityIndex(inventory)
+        inventory.remove("18001112683")         # the last number moves into the freed slot
+        self.assertEqual(inventory.find_first("2683"), "18004442683")
+        self.assertEqual(index.find_first("2683"), inventory.find_first("2683"))
+        self.assertEqual(index.find_all("2683"), inventory.find_all("2683"))
+        self.assertEqual(wc.search_available_nums_for_word("2683", index), "18004442683")
+        wc.clear_caches()
+        self.assertEqual(wc.search_available_nums_for_word("2683", inventory), "18004442683")
+        index.mark_sold("18004442683")
+        self.assertEqual(index.find_first("442683"), None)
+        self.assertEqual(index.find_all("2683"), inventory.find_all("2683"))
+        self.assertEqual(wc.search_available_nums_for_word("2683", index), inventory.find_first("2683"))
+
+    def test_phone_inventory(self):
+        inventory = anf.PhoneInventory(self.available_nums + ["18002278779"])
+        self.assertEqual(len(inventory), 4)     # the repeated number is only stored once
+        self.assertEqual(list(inventory), self.available_nums)
+        self.assertEqual(inventory[0], "18002278779")
+        self.assertIn("18004444364", inventory)
+        self.assertIn("8004444364", inventory)
+        self.assertNotIn("18004444365", inventory)
+        self.assertNotIn("not a number", inventory)
+        self.assertEqual(inventory.local_numbers.itemsize, 4)
+
+    def test_phone_inventory_suffix_matching(self):
+        inventory = anf.PhoneInventory(self.available_nums)
+        self.assertEqual(inventory.find_first("6683"), "18005556683")
+        self.assertEqual(inventory.find_all("6683"), ["18005556683", "18001116683"])
+        self.assertEqual(inventory.find_first("4444364"), "18004444364")
+        self.assertEqual(inventory.find_first("8004444364"), "18004444364")
+        self.assertEqual(inventory.find_first("9004444364"), None)
+        self.assertEqual(inventory.find_first("06683"), None)
+        self.assertEqual(inventory.find_first("abc"), None)
+        self.assertEqual(inventory.find_all("4444364"), ["18004444364"])
+        self.assertEqual(inventory.find_all("4444365"), [])
+
+    def test_find_first_at(self):
+        index = anf.AvailabilityIndex(self.available_nums)
+        for available_nums in (index, index.inventory):
+            self.assertEqual(available_nums.find_first_at("444", 3), "18004444364")
+            self.assertEqual(available_nums.find_first_at("555", 3), "18005556683")
+            self.assertEqual(available_nums.find_first_at("5566", 5), "18005556683")
+            self.assertEqual(available_nums.find_first_at("6683", 7), "18005556683")
+            self.assertEqual(available_nums.find_first_at("6683", 4), None)
+            self.assertEqual(available_nums.find_first_at("6683", 3), None)        # does not fit before position 3
+            self.assertEqual(available_nums.find_first_at_each("6683", range(3, 8)), {7: "18005556683"})
+            self.assertEqual(available_nums.find_first_at_each("44", range(2, 8)), {2: "18004444364", 3: "18004444364", 4: "18004444364"})
+        anf.SCAN_BLOCK_NUMBERS, saved_block = 1, anf.SCAN_BLOCK_NUMBERS
+        try:
+            self.assertEqual(index.inventory.find_first_at("111", 3), "18001116683")
+            self.assertEqual(index.inventory.find_first_at_each("6", [4, 5, 6, 7]), {4: "18005556683", 5: "18005556683", 6: "18004444364"})
+        finally:
+            anf.SCAN_BLOCK_NUMBERS = saved_block
+
+    def test_phone_inventory_sample(self):
+        inventory = anf.PhoneInventory(self.available_nums)
+        sample = inventory.sample(3)
+        self.assertEqual(len(sample), 3)
+        self.assertEqual(len(set(sample)), 3)
+        for phone_num in sample:
+            self.assertIn(phone_num, self.available_nums)
+        self.assertEqual(len(inventory.sample(10)), 4)
+
+    def test_remove_and_mark_sold(self):
+        index = anf.AvailabilityIndex(self.available_nums)
+        events = []
+        index.subscribe(lambda event, phone_num: events.append((event, phone_num)))
+        self.assertTrue(index.mark_sold("18005556683"))
+        self.assertFalse(index.remove("18005556683"))
+        self.assertTrue(index.remove("18002278779"))
+        self.assertTrue(index.add("18009996683"))
+        self.assertEqual(events, [("sold", "18005556683"), ("removed", "18002278779"), ("added", "18009996683")])
+        self.assertEqual(len(index), 3)
+        self.assertNotIn("18005556683", index)
+        self.assertEqual(sorted(index), ["18001116683", "18004444364", "18009996683"])
+        self.assertEqual(index.find_all("6683"), ["18001116683", "18009996683"])      # in the inventory's order
+        self.assertEqual(index.find_first("556683"), None)
+        self.assertEqual(index.find_first("2278779"), None)
+        self.assertEqual(index.inventory.find_first("4444364"), "18004444364")
+        self.assertEqual(index.inventory.find_all("6683"), ["18001116683", "18009996683"])
+
+    def test_failed_change_leaves_inventory_intact(self):
+        inventory = anf.PhoneInventory(self.available_nums)
+        inventory.mark_sold("18001116683")          # builds the map from numbers to slots
+        local_array = inventory.as_numpy()
+        if local_array is not None:         # the array cannot be resized while it is viewed
+            with self.assertRaises(BufferError):
+                inventory.mark_sold("18005556683")
+            with self.assertRaises(BufferError):
+                inventory.add("18009999999")
+            self.assertIn("18005556683", inventory)
+            self.assertNotIn("18009999999", inventory)
+            del local_array
+        self.assertTrue(inventory.mark_sold("18005556683"))
+        self.assertEqual(sorted(inventory), ["18002278779", "18004444364"])
+        self.assertEqual(inventory.positions, {local_num: position for position, local_num in enumerate(inventory.local_numbers)})
+
+    def test_changes_wait_for_scans(self):
+        inventory = anf.PhoneInventory(self.available_nums)
+        finished = threading.Event()
+        with inventory.lock:            # as a scan on another thread would
+            seller = threading.Thread(target=lambda: inventory.mark_sold("18005556683") and finished.set())
+            seller.start()
+            self.assertFalse(finished.wait(0.05))
+            self.assertEqual(inventory.find_first("6683"), "18005556683")
+        seller.join()
+        self.assertTrue(finished.is_set())
+        self.assertEqual(inventory.find_first("6683"), "18001116683")
+
+    def test_snapshot_and_diff(self):
+        inventory = anf.PhoneInventory(self.available_nums)
+        snapshot = inventory.snapshot()
+        self.assertEqual(inventory.diff(snapshot), ([], []))
+        inventory.add("18002222222")
+        inventory.mark_sold("18004444364")
+        inventory.add("18003333333")
+        inventory.remove("18003333333")         # added and removed again, so it does not show
+        inventory.remove("18002278779")
+        inventory.add("18002278779")            # removed and put back, so it does not show
+        self.assertEqual(inventory.diff(snapshot), (["18002222222"], ["18004444364"]))
+        self.assertEqual(list(snapshot), self.available_nums)
+        inventory.changes.clear()               # the snapshot is now older than the change log
+        inventory.add("18003333333")
+        self.assertEqual(inventory.diff(snapshot), (["18002222222", "18003333333"], ["18004444364"]))
+        with self.assertRaises(ValueError):
+            anf.PhoneInventory().diff(snapshot)
+
+    def test_generated_numbers_are_unique_and_seeded(self):
+        number_retrieval = anf.NumberRetrieval(seed=7)
+        number_retrieval.LONG_RUN = 5000
+        long_list = number_retrieval.get_available_phone_nums_long()
+        self.assertEqual(len(set(long_list)), 5000)
+        self.assertTrue(all(len(phone_num) == 11 and phone_num.startswith("1800") for phone_num in long_list))
+        self.assertEqual(anf.NumberRetrieval(seed=7).generate_inventory(5000)[:], anf.NumberRetrieval(seed=7).generate_inventory(5000)[:])
+        short_list = number_retrieval.get_available_phone_nums_short(long_list)
+        self.assertEqual(len(set(short_list)), number_retrieval.SHORT_RUN)
+        self.assertEqual(len(set(number_retrieval.get_available_phone_nums_short(anf.PhoneInventory(long_list)))), number_retrieval.SHORT_RUN)
+        self.assertEqual(len(number_retrieval.get_available_phone_nums_short(self.available_nums)), 4)
+
+    def test_from_local_numbers(self):
+        local_numbers = [2278779, 4444364, 2278779, 5556683]
+        expected = anf.PhoneInventory(local_numbers)
+        saved_np = anf.np
+        try:
+            for numpy_module in (saved_np, None):       # with and without numpy
+                anf.np = numpy_module
+                inventory = anf.PhoneInventory.from_local_numbers(local_numbers)
+                self.assertEqual(list(inventory), list(expected))
+                self.assertEqual(inventory.bitmap, expected.bitmap)
+                with self.assertRaises(anf.InvalidInventoryNumberError):
+                    anf.PhoneInventory.from_local_numbers([10 ** 7])
+        finally:
+            anf.np = saved_np
+
+    def test_load_inventory_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixed_path = os.path.join(temp_dir, "fixed.txt")
+            with open(fixed_path, "w", newline="") as inventory_file:
+                inventory_file.write("18002278779\r\n18004444364\r\n19004444364\r\n18002278779\r\n")
+            inventory, stats = anf.load_inventory_file(fixed_path)
+            self.assertEqual(list(inventory), ["18002278779", "18004444364"])
+            self.assertEqual(stats, {"lines": 4, "numbers": 2, "invalid": 1, "duplicates": 1})
+
+            mixed_path = os.path.join(temp_dir, "mixed.txt")
+            with open(mixed_path, "w") as inventory_file:
+                inventory_file.write("1-800-227-8779\n\n8004444364\nnot a number\n5556683\n18004444364")
+            inventory, stats = anf.load_inventory_file(mixed_path)
+            self.assertEqual(list(inventory), ["18002278779", "18004444364", "18005556683"])
+            self.assertEqual(stats, {"lines": 5, "numbers": 3, "invalid": 1, "duplicates": 1})
+
+            empty_path = os.path.join(temp_dir, "empty.txt")
+            open(empty_path, "w").close()
+            self.assertEqual(len(anf.NumberRetrieval().load_available_phone_nums(empty_path)), 0)
+
+    def test_invalid_number_is_rejected(self):
+        with self.assertRaises(anf.InvalidInventoryNumberError):
+            anf.PhoneInventory(["19002278779"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""This program will test the proper functioning of batch_cli.py."""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+import batch_cli
+import available_num_finder as anf
+import word_checker as wc
+
+class TestBatchCLI(unittest.TestCase):
+
+    def setUp(self):
+        self.word_index = wc.TemporaryWordIndex(["move", "taxi", "cab", "go"])
+        self.temp_dir = self.word_index.start()
+
+    def tearDown(self):
+        self.word_index.stop()
+
+    def write_file(self, name, text):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_read_values(self):
+        self.assertEqual(list(batch_cli.read_values(io.StringIO("taxi\n\n move \n"), "lines")), ["taxi", "move"])
+        self.assertEqual(list(batch_cli.read_values(io.StringIO("id,word\n1,taxi\n2,move\n"), "csv", "word")), ["taxi", "move"])
+        self.assertEqual(list(batch_cli.read_values(io.StringIO('{"word": "taxi"}\n"move"\n'), "jsonl", "word")), ["taxi", "move"])
+        with self.assertRaises(ValueError):
+            list(batch_cli.read_values(io.StringIO("id,name\n"), "csv", "word"))
+        self.assertEqual(list(batch_cli.read_values(io.StringIO('{"name": "taxi"}\n{"word"\n"move"\n'), "jsonl", "word")),
+                         [batch_cli.InvalidRecord("The record has no 'word' field"), batch_cli.InvalidRecord("The line is not valid JSON"), "move"])
+
+    def test_lookup_words(self):
+        inventory = anf.AvailabilityIndex(["18002226683", "18004444364"])
+        rows = list(batch_cli.lookup_words(["move", "dog", "taxi", "move"], inventory, batch_size=3))
+        self.assertEqual([row["number"] for row in rows], ["18002226683", "18004444364", None, "18002226683"])
+        self.assertEqual(rows[2], {"word": "taxi", "digits": "8294", "number": None})
+        rows = list(batch_cli.lookup_words(["move", batch_cli.InvalidRecord("The record has no 'word' field")], inventory))
+        self.assertEqual(rows[1], {"word": None, "error": "The record has no 'word' field"})
+
+    def test_lookup_numbers(self):
+        rows = list(batch_cli.lookup_numbers(["18002226683", "123", "18008294100"]))
+        self.assertEqual(rows[0], {"number": "18002226683", "words": ["move"]})
+        self.assertEqual(rows[1], {"number": "123", "error": "The input is not a valid phone number"})
+        self.assertEqual(rows[2], {"number": "18008294100", "words": []})
+
+    def test_malformed_numbers_become_error_rows(self):
+        phone_nums = ["18002226a83", "28002226683", batch_cli.InvalidRecord("The record has no 'number' field"), "18002226683"]
+        expected_rows = [{"number": "18002226a83", "error": "The phone number must be all digits"},
+                         {"number": "28002226683", "error": "The phone number must start with 1800"},
+                         {"number": None, "error": "The record has no 'number' field"},
+                         {"number": "18002226683", "words": ["move"]}]
+        self.assertEqual(list(batch_cli.lookup_numbers(phone_nums)), expected_rows)
+        rows = list(batch_cli.lookup_numbers(phone_nums, workers=2, chunk_size=1))
+        self.assertEqual(sorted(rows, key=str), sorted(expected_rows, key=str))
+
+    def test_invalid_numbers_are_reported_when_reached(self):
+        # A long run of invalid numbers is not read ahead of the workers: the first rows come back after a few
+        # chunks have been handed out, and not once the whole input has been read.
+        numbers_read = []
+
+        def phone_nums():
+            for count in range(10000):
+                numbers_read.append(count)
+                yield "123"
+            yield "18002226683"
+
+        rows = batch_cli.lookup_numbers(phone_nums(), workers=2, chunk_size=10)
+        try:
+            self.assertEqual(next(rows), {"number": "123", "error": "The input is not a valid phone number"})
+            self.assertLessEqual(len(numbers_read), 10 * 2 * 2)
+        finally:
+            rows.close()
+
+    def test_words_mode_rejects_workers(self):
+        words_path = self.write_file("words.txt", "move\n")
+        with contextlib.redirect_stderr(io.StringIO()) as error_output, self.assertRaises(SystemExit):
+            batch_cli.main(["words", words_path, "--workers", "2"])
+        self.assertIn("--workers only applies to numbers mode", error_output.getvalue())
+
+    def test_main_reports_records_without_the_field(self):
+        numbers_path = self.write_file("numbers.jsonl", '{"number": "18002226683"}\n{"phone": "18002222222"}\n{"number": "18002226a83"}\n')
+        output_path = os.path.join(self.temp_dir, "results.jsonl")
+        self.assertEqual(batch_cli.main(["numbers", numbers_path, "--output", output_path]), 0)
+        with open(output_path) as output_file:
+            rows = [json.loads(line) for line in output_file]
+        self.assertEqual(rows, [{"number": "18002226683", "words": ["move"]},
+                                {"number": None, "error": "The record has no 'number' field"},
+                                {"number": "18002226a83", "error": "The phone number must be all digits"}])
+
+    def test_main_writes_csv(self):
+        words_path = self.write_file("words.txt", "move\ntaxi\n")
+        inventory_path = self.write_file("inventory.txt", "18002226683\nnot a number\n")
+        output_path = os.path.join(self.temp_dir, "results.csv")
+        self.assertEqual(batch_cli.main(["words", words_path, "--inventory", inventory_path, "--output", output_path]), 0)
+        with open(output_path) as output_file:
+            self.assertEqual(output_file.read().splitlines(), ["word,digits,number,error", "move,6683,18002226683,", "taxi,8294,,"])
+
+    def test_main_writes_jsonl(self):
+        numbers_path = self.write_file("numbers.jsonl", '{"number": "18002226683"}\n{"number": "18002222222"}\n')
+        output_path = os.path.join(self.temp_dir, "results.jsonl")
+        batch_cli.main(["numbers", numbers_path, "--output", output_path, "--workers", "2", "--chunk-size", "1"])
+        with open(output_path) as output_file:
+            rows = sorted((json.loads(line) for line in output_file), key=lambda row: row["number"])
+        self.assertEqual(rows, [{"number": "18002222222", "words": ["cab"]}, {"number": "18002226683", "words": ["move"]}])
+
+    def test_does_not_import_the_window_or_api_key(self):
+        loaded = subprocess.run([sys.executable, "-c", "import sys, batch_cli; print([name for name in ('tkinter', 'confidential', 'enchant', 'main_module') if name in sys.modules])"],
+                                cwd=os.path.dirname(os.path.abspath(batch_cli.__file__)), capture_output=True, text=True, check=True)
+        self.assertEqual(loaded.stdout.strip(), "[]")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+"""This program will test the proper functioning of chatgpt_api_caller.py against a stub HTTP server running on
+this machine, so no API key or network connection is needed."""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import chatgpt_api_caller as cac
+import suggestion_cache as sc
+
+def completion(content):
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+"""Answers each POST with the next scripted (status, body) pair, and keeps answering with the last one."""
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests.append(body)
+            status, reply = self.server.script[min(len(self.server.requests), len(self.server.script)) - 1]
+        if body.get("stream") and status == 200:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for text_piece in reply:
+                event = {"choices": [{"delta": {"content": text_piece}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        payload = json.dumps(reply).encode() if not isinstance(reply, bytes) else reply
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+class TestChatClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.script = [(200, completion("['taxi', 'fast', 'ride', 'cab',]"))]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+        self.client = cac.AsyncChatClient(api_key="test-key", url=url, max_concurrency=4, max_retries=2, backoff_base=0.01)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = sc.SuggestionCache(os.path.join(self.temp_dir.name, "cache.sqlite3"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_suggestions_are_returned(self):
+        result = cac.APICall("A taxi company", client=self.client, cache=self.cache).prepare_suggestions()
+        self.assertTrue(result.ok)
+        self.assertEqual(result.suggestions, ["taxi", "fast", "ride", "cab"])
+        self.assertEqual(list(result), ["taxi", "fast", "ride", "cab"])
+        self.assertEqual(self.server.requests[0]["model"], cac.DEFAULT_MODEL)
+        self.assertIn("A taxi company", self.server.requests[0]["messages"][0]["content"])
+
+    def test_repeated_descriptions_come_from_the_cache(self):
+        first_result = cac.APICall("A taxi company", client=self.client, cache=self.cache).prepare_suggestions()
+        second_result = cac.APICall("  a TAXI   company. ", client=self.client, cache=self.cache).prepare_suggestions()
+        self.assertFalse(first_result.cached)
+        self.assertTrue(second_result.cached)
+        self.assertEqual(second_result.suggestions, first_result.suggestions)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.5)
+
+        self.server.script = [(500, {"error": "down"})]
+        failed_call = cac.APICall("A bus company", client=self.client, cache=self.cache)
+        self.assertFalse(failed_call.prepare_suggestions().ok)
+        self.assertIsNone(self.cache.get(failed_call.cache_key))        # failures are not cached
+
+    def test_streamed_suggestions(self):
+        self.server.script = [(429, {"error": "slow down"}), (200, ["Sure! ['ta", "xi', 'fa", "st', ", "'cab'", ", 'ride',]"])]
+        api_call = cac.APICall("A taxi company", client=self.client, cache=self.cache)
+        self.assertEqual(list(api_call.stream_suggestions()), ["taxi", "fast", "cab", "ride"])
+        self.assertTrue(self.server.requests[-1]["stream"])
+        self.assertEqual(self.cache.get(api_call.cache_key), ["taxi", "fast", "cab", "ride"])
+
+        self.server.script = [(401, {"error": "bad key"})]
+        with self.assertRaises(cac.SuggestionError) as raised:
+            list(cac.APICall("A bus company", client=self.client, cache=self.cache).stream_suggestions())
+        self.assertEqual(raised.exception.result.status_code, 401)
+
+    def test_stream_parser_matches_match_list(self):
+        text = "Here you go: ['taxi', 'fast', \"cab\", 'ride', 'go2',\n 'last']"
+        for piece_size in (1, 2, 3, 7, len(text)):
+            parser = cac.SuggestionStreamParser()
+            words = []
+            for start in range(0, len(text), piece_size):
+                words.extend(parser.feed(text[start:start + piece_size]))
+            self.assertEqual(words, cac.match_list(text))
+
+    def test_rate_limits_are_retried(self):
+        self.server.script = [(429, {"error": "slow down"}), (503, {"error": "busy"}), (200, completion("['cab', 'taxi',]"))]
+        result = asyncio.run(self.client.suggest("A taxi company"))
+        self.assertTrue(result.ok)
+        self.assertEqual(result.attempts, 3)
+        self.assertEqual(result.suggestions, ["cab", "taxi"])
+
+    def test_errors_are_structured(self):
+        self.server.script = [(401, {"error": "bad key"})]
+        result = asyncio.run(self.client.suggest("A taxi company"))
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error_type, "http")
+        self.assertEqual(result.status_code, 401)
+        self.assertEqual(result.attempts, 1)        # a 401 is not worth retrying
+        self.assertEqual(list(result), [])
+
+        self.server.script = [(500, {"error": "down"})]
+        result = asyncio.run(self.client.suggest("A taxi company"))
+        self.assertEqual((result.error_type, result.attempts), ("http", 3))
+
+        self.server.script = [(200, b"not json")]
+        self.assertEqual(asyncio.run(self.client.suggest("A taxi company")).error_type, "response")
+
+    def test_unreachable_server(self):
+        client = cac.AsyncChatClient(api_key="test-key", url="http://127.0.0.1:9/", max_retries=1, backoff_base=0.01, timeout=2)
+        result = asyncio.run(client.suggest("A taxi company"))
+        client.close()
+        self.assertEqual((result.error_type, result.attempts), ("network", 2))
+
+    def test_many_requests_at_once(self):
+        messages = [f"Company number {i}" for i in range(10)]
+        results = asyncio.run(self.client.suggest_many(messages))
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(len(self.server.requests), 10)
+
+class TestSuggestionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_normalization(self):
+        self.assertEqual(sc.make_cache_key("We sell  Tacos!", "gpt", 0.7), sc.make_cache_key("we sell tacos", "gpt", 0.7))
+        self.assertNotEqual(sc.make_cache_key("we sell tacos", "gpt", 0.7), sc.make_cache_key("we sell tacos", "gpt", 0.2))
+        self.assertNotEqual(sc.make_cache_key("we sell tacos", "gpt", 0.7), sc.make_cache_key("we sell burritos", "gpt", 0.7))
+
+    def test_expiry_and_eviction(self):
+        cache = sc.SuggestionCache(self.path, ttl_seconds=60, max_entries=2)
+        cache.put("a", ["one"])
+        cache.put("b", ["two"])
+        time.sleep(0.01)
+        self.assertEqual(cache.get("a"), ["one"])       # "a" is now more recently used than "b"
+        cache.put("c", ["three"])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), ["three"])
+        cache.ttl_seconds = 0
+        time.sleep(0.01)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 1)
+        cache.close()
+
+    def test_entries_persist(self):
+        cache = sc.SuggestionCache(self.path)
+        cache.put("a", ["one", "two"])
+        cache.close()
+        cache = sc.SuggestionCache(self.path)
+        self.assertEqual(cache.get("a"), ["one", "two"])
+        cache.close()
+
+    def test_stats_command(self):
+        cache = sc.SuggestionCache(self.path)
+        self.assertEqual(cache.stats()["oldest_entry"], None)
+        cache.put("a", ["one"])
+        time.sleep(0.01)
+        cache.put("b", ["two"])
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertLess(stats["oldest_entry"], stats["newest_entry"])
+        self.assertGreater(stats["size_bytes"], 0)
+        cache.close()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            sc.main(["--path", self.path, "--stats"])
+        printed_stats = json.loads(output.getvalue())
+        self.assertEqual(printed_stats["entries"], 2)
+        self.assertEqual(len(printed_stats["oldest_entry"]), len("2024-01-01 00:00:00"))
+
+if __name__ == "__main__":
+    unittest.main()
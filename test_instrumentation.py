@@ -0,0 +1,83 @@
+"""This program will test the proper functioning of instrumentation.py."""
+
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+import instrumentation
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.was_enabled = instrumentation._recorder
+        instrumentation.disable()
+
+    def tearDown(self):
+        instrumentation._recorder = self.was_enabled
+        if tracemalloc.is_tracing() and self.was_enabled is None:
+            tracemalloc.stop()
+
+    def test_disabled_costs_nothing(self):
+        def lookup(word):
+            return word.upper()
+        self.assertIs(instrumentation.timed("lookup")(lookup), lookup)
+        with instrumentation.measure("lookup"):
+            instrumentation.count("hits")
+        self.assertEqual(instrumentation.stats(), {})
+
+    def test_timed_and_counted(self):
+        instrumentation.enable()
+        @instrumentation.timed("lookup")
+        def lookup(word):
+            if not word:
+                raise ValueError("no word")
+            return word.upper()
+        self.assertEqual(lookup("taxi"), "TAXI")
+        self.assertEqual(lookup.__name__, "lookup")
+        with self.assertRaises(ValueError):
+            lookup("")
+        with instrumentation.measure("outer"):
+            lookup("cab")
+        instrumentation.count("hits")
+        instrumentation.count("hits", 2)
+        stats = instrumentation.stats()
+        self.assertEqual(stats["operations"]["lookup"]["calls"], 3)
+        self.assertEqual(stats["operations"]["lookup"]["errors"], 1)
+        self.assertEqual(stats["operations"]["outer"]["calls"], 1)
+        self.assertEqual(sum(stats["operations"]["lookup"]["histogram_ms"].values()), 3)
+        self.assertEqual(stats["counters"], {"hits": 3})
+
+    def test_percentiles_come_from_the_histogram(self):
+        operation = instrumentation.OperationStats()
+        for _ in range(98):
+            operation.record(0.0005)        # 0.5 ms, in the <=1 ms bucket
+        operation.record(0.020)
+        operation.record(0.020)
+        self.assertEqual(operation.percentile_ms(0.50), 1)
+        self.assertEqual(operation.percentile_ms(0.99), 20.0)     # capped at the slowest call
+        self.assertEqual(operation.as_dict()["max_ms"], 20.0)
+
+    def test_profile_capture_and_dump(self):
+        instrumentation.enable({"cprofile", "tracemalloc"})
+        instrumentation.add_source("extra", lambda: {"size": 1})
+        with instrumentation.measure("build"):
+            sorted(str(number) for number in range(10000))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "stats.json")
+            instrumentation.dump_json(path)
+            with open(path) as stats_file:
+                stats = json.load(stats_file)
+            self.assertTrue(os.path.exists(path + ".pstats"))
+        self.assertEqual(stats["extra"], {"size": 1})
+        self.assertGreater(stats["operations"]["build"]["peak_kib"], 0)
+        self.assertTrue(stats["cprofile_top"])
+        self.assertTrue(stats["tracemalloc_top"])
+        self.assertIn("build", instrumentation.format_report(stats))
+
+    def test_unknown_profile_mode(self):
+        with self.assertRaises(ValueError):
+            instrumentation.enable({"perf"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""This program will test the proper functioning of lookup_server.py."""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import unittest
+import alternatives
+import available_num_finder as anf
+import lookup_server as ls
+import word_checker as wc
+
+class TestSharedInventory(unittest.TestCase):
+
+    def test_shared_copy_follows_the_inventory(self):
+        inventory = anf.PhoneInventory(["18002226683", "18008294555", "18004444364"])
+        shared = ls.SharedInventory.create(inventory, capacity=4)
+        shared.follow(inventory)
+        attached = ls.SharedInventory.attach(shared.name)
+        try:
+            self.assertEqual(list(attached), list(inventory))
+            self.assertIn("18002226683", attached)
+            self.assertEqual(attached.find_first("6683"), "18002226683")
+            self.assertEqual(attached.find_first("8004444364"), "18004444364")
+            self.assertEqual(attached.find_first_at("8294", 4), "18008294555")
+            self.assertEqual(attached.find_first_at_each("4", [3, 4, 7]), {3: "18004444364", 4: "18008294555", 7: "18004444364"})
+            self.assertEqual(wc.search_available_nums_for_words(["6683", "364", "7777"], attached), {"6683": "18002226683", "364": "18004444364", "7777": None})
+
+            inventory.mark_sold("18002226683")
+            inventory.add("18009992005")
+            self.assertNotIn("18002226683", attached)
+            self.assertEqual(attached.find_first("6683"), None)
+            self.assertEqual(sorted(attached), sorted(inventory))
+            inventory.add("18001111111")
+            with self.assertRaises(ls.SharedInventoryFullError):
+                inventory.add("18002222222")
+        finally:
+            attached.close()
+            inventory.unsubscribe(shared._on_change)
+            shared.close()
+
+    def test_shared_copy_keeps_up_with_many_changes(self):
+        generator = random.Random(11)
+        inventory = anf.PhoneInventory(f"1800{number:07d}" for number in generator.sample(range(anf.LOCAL_RANGE), 50))
+        shared = ls.SharedInventory.create(inventory, capacity=100)
+        shared.follow(inventory)
+        try:
+            for _ in range(200):
+                if len(inventory) > 20 and generator.random() < 0.5:
+                    inventory.mark_sold(inventory.sample(1, generator)[0])
+                else:
+                    inventory.add(f"1800{generator.randrange(anf.LOCAL_RANGE):07d}")
+            self.assertEqual(sorted(shared), sorted(inventory))
+            self.assertEqual(shared.positions, {shared.numbers[position]: position for position in range(len(shared))})
+        finally:
+            inventory.unsubscribe(shared._on_change)
+            shared.close()
+
+    def test_parse_address(self):
+        self.assertEqual(ls.parse_address("127.0.0.1:8790"), (socket.AF_INET, ("127.0.0.1", 8790)))
+        self.assertEqual(ls.parse_address("/tmp/helper.sock"), (socket.AF_UNIX, "/tmp/helper.sock"))
+
+class TestLookupClient(unittest.TestCase):
+
+    def test_reconnects_after_a_timeout_and_skips_other_answers(self):
+        # A stand-in server that never answers the first connection, then answers the second with a reply to 
+        # some other request before the real one.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            address = os.path.join(temp_dir, "lookup.sock")
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(address)
+            listener.listen()
+            listener.settimeout(5)
+
+            def serve():
+                silent_connection, _ = listener.accept()
+                silent_connection.makefile("rb").readline()
+                connection, _ = listener.accept()
+                request = json.loads(connection.makefile("rb").readline())
+                replies = [{"id": request["id"] + 100, "result": "18009999999"}, {"id": request["id"], "result": "18002226683"}]
+                connection.sendall("".join(json.dumps(reply) + "\n" for reply in replies).encode())
+                connection.close()
+                silent_connection.close()
+
+            server_thread = threading.Thread(target=serve)
+            server_thread.start()
+            client = ls.LookupClient(address, timeout=0.2)
+            try:
+                with self.assertRaises(OSError):
+                    client.find_first("6683")
+                self.assertIsNone(client.socket)
+                self.assertEqual(client.find_first("6683"), "18002226683")
+            finally:
+                client.close()
+                server_thread.join()
+                listener.close()
+
+class TestLookupServer(unittest.TestCase):
+
+    def setUp(self):
+        self.word_index = wc.TemporaryWordIndex(["move", "taxi", "cab", "go"])
+        self.address = os.path.join(self.word_index.start(), "lookup.sock")
+        self.server = ls.LookupServer(anf.AvailabilityIndex(["18002226683", "18004444364", "18008294555"]), workers=1)
+        ready = threading.Event()
+        self.thread = threading.Thread(target=asyncio.run, args=(self.server.serve(self.address, on_ready=ready.set),))
+        self.thread.start()
+        self.assertTrue(ready.wait(30))
+        self.client = ls.LookupClient(self.address)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        self.thread.join()
+        self.server.close()
+        self.word_index.stop()
+
+    def test_lookups(self):
+        self.assertEqual(len(self.client), 3)
+        self.assertEqual(self.client.find_first("6683"), "18002226683")
+        self.assertEqual(self.client.find_first_at("8294", 4), "18008294555")
+        self.assertEqual(self.client.find_first_at_each("8294", [4, 5, 6]), {4: "18008294555"})
+        self.assertEqual(self.client.find_numbers_for_words(["move", "taxi", "cab"]), {"move": "18002226683", "taxi": None, "cab": None})
+        self.assertEqual(self.client.find_words("18002226683"), ["move"])
+        self.assertEqual(wc.search_available_nums_for_word("move", self.client), "18002226683")
+        self.assertEqual(wc.search_available_nums_for_words(["move", "taxi"], self.client), {"move": "18002226683", "taxi": None})
+        self.assertIn("18004444364", self.client)
+        self.assertEqual(sorted(self.client.sample(5)), ["18002226683", "18004444364", "18008294555"])
+        with self.assertRaises(wc.InvalidPhoneNumberError):
+            self.client.find_words("123")
+        with self.assertRaises(ls.LookupRequestError):
+            self.client.call("reverse", "taxi")
+
+    def test_words_and_alternatives_come_from_the_server(self):
+        self.assertEqual(self.client.words_for_num("18002226683"), ["move"])
+        self.assertEqual(self.client.words_for_many(["18002226683", "18008294555", "18004444364"], limit=1), [["move"], [], []])
+        self.assertEqual(self.client.words_for_num("18008294555", position="anywhere"), ["taxi"])
+        local_alternatives = alternatives.find_alternatives("taxi", ["18002226683", "18004444364", "18008294555"])
+        served_alternatives = alternatives.find_alternatives("taxi", self.client)
+        self.assertEqual([alternative.as_list() for alternative in served_alternatives], [alternative.as_list() for alternative in local_alternatives])
+        self.assertEqual(served_alternatives[0].describe(), "1-800-TAXI-555  (same word, another place)")
+        with self.assertRaises(wc.InvalidPhoneNumberError):
+            self.client.words_for_num("123")
+
+    def test_sold_numbers_are_gone_for_every_client(self):
+        with ls.LookupClient(self.address) as other_client:
+            self.assertTrue(other_client.mark_sold("18002226683"))
+            self.assertFalse(other_client.mark_sold("18002226683"))
+        self.assertNotIn("18002226683", self.client)
+        self.assertEqual(self.client.find_first("6683"), None)
+
+    def test_added_numbers_can_be_found(self):
+        self.assertTrue(self.client.add("18005550000"))
+        self.assertFalse(self.client.add("18005550000"))
+        self.assertIn("18005550000", self.client)
+        self.assertEqual(self.client.find_first("0000"), "18005550000")
+        with self.assertRaises(anf.InvalidInventoryNumberError):
+            self.client.add("18001")
+
+    def test_add_checks_for_room_before_changing_anything(self):
+        full_server = ls.LookupServer(anf.PhoneInventory(["18002226683"]), workers=1, spare_capacity=0)
+        try:
+            self.assertFalse(full_server.add("18002226683"))
+            with self.assertRaises(ls.SharedInventoryFullError):
+                full_server.add("18005550000")
+            self.assertNotIn("18005550000", full_server.inventory)
+            self.assertEqual(list(full_server.shared_inventory), list(full_server.inventory))
+        finally:
+            full_server.close()
+
+    def test_requests_are_batched(self):
+        endings = [str(number).zfill(4) for number in range(200)] + ["6683"]
+        results = self.client.call_many("find_first", endings)
+        self.assertEqual(results[-1], "18002226683")
+        stats = self.client.stats()
+        self.assertEqual(stats["batched_requests"], len(endings))
+        self.assertLess(stats["batches"], len(endings) // 10)
+
+    def test_load_test(self):
+        results = ls.run_load_test(self.address, clients=3, requests_per_client=40, pipeline=8)
+        self.assertEqual(results["failures"], [])
+        self.assertEqual(results["requests"], 120)
+        self.assertEqual(results["round_trips"]["calls"], 15)
+
+if __name__ == "__main__":
+    unittest.main()
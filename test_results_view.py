@@ -0,0 +1,39 @@
+"""This program will test the parts of results_view.py that do not need a window."""
+
+import itertools
+import unittest
+from results_view import PagedRows, ResultRow
+
+class TestPagedRows(unittest.TestCase):
+
+    def test_rows_are_pulled_a_page_at_a_time(self):
+        pulled = []
+        def numbered_rows():
+            for number in itertools.count():
+                pulled.append(number)
+                yield ResultRow(str(number), number)
+
+        rows = PagedRows(numbered_rows(), page_size=10)
+        self.assertEqual(len(rows), 0)
+        self.assertEqual([row.value for row in rows.window(0, 5)], [0, 1, 2, 3, 4])
+        self.assertEqual(len(pulled), 10)           # only the first page, from an endless generator
+        self.assertEqual([row.value for row in rows.window(8, 4)], [8, 9, 10, 11])
+        self.assertEqual(len(pulled), 20)
+        self.assertFalse(rows.exhausted)
+
+    def test_short_source_runs_out(self):
+        rows = PagedRows([ResultRow("a"), ResultRow("b", "18002226683", "blue")], page_size=10)
+        self.assertEqual(rows.ensure(50), 2)
+        self.assertTrue(rows.exhausted)
+        self.assertEqual(rows.window(1, 5), [ResultRow("b", "18002226683", "blue")])
+        self.assertEqual(rows.window(5, 5), [])
+
+    def test_streamed_rows_are_appended(self):
+        rows = PagedRows()
+        rows.append(ResultRow("taxi", None, "grey"))
+        rows.append(ResultRow("move", "18002226683", "blue"))
+        self.assertEqual([row.text for row in rows.window(0, 10)], ["taxi", "move"])
+        self.assertEqual(rows[1].value, "18002226683")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""This program will test the proper functioning of task_runner.py without opening a window."""
+
+import threading
+import time
+import unittest
+from task_runner import TaskRunner
+
+"""Stands in for a Tk root: after() callbacks are collected and run by hand."""
+class FakeRoot():
+    def __init__(self):
+        self.scheduled = []
+        self.reported = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+    def report_callback_exception(self, exc_type, exc_value, traceback):
+        self.reported.append(exc_value)
+
+    def run_until_idle(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.scheduled and time.monotonic() < deadline:
+            callback = self.scheduled.pop(0)
+            callback()
+            time.sleep(0.01)
+
+class TestTaskRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.runner = TaskRunner(self.root)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_result_is_delivered_on_polling_thread(self):
+        delivered = []
+        self.runner.submit(sum, [1, 2, 3], on_done=lambda result: delivered.append((result, threading.current_thread())))
+        self.root.run_until_idle()
+        self.assertEqual(delivered, [(6, threading.current_thread())])
+
+    def test_errors_are_delivered(self):
+        errors = []
+        self.runner.submit(int, "not a number", on_error=errors.append)
+        self.runner.submit(int, "also not a number")
+        self.root.run_until_idle()
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ValueError)
+        self.assertEqual(len(self.root.reported), 1)
+
+    def test_cancelled_results_are_discarded(self):
+        delivered = []
+        release = threading.Event()
+        self.runner.submit(release.wait, on_done=delivered.append)
+        self.runner.cancel_all()
+        self.runner.submit(lambda: "fresh", on_done=delivered.append)
+        release.set()
+        self.root.run_until_idle()
+        self.assertEqual(delivered, ["fresh"])
+        self.assertEqual(self.runner.pending, set())
+
+    def test_background_results_survive_cancel_all(self):
+        delivered = []
+        release = threading.Event()
+        self.runner.submit(lambda: release.wait() and "ranking", on_done=delivered.append, background=True)
+        self.runner.cancel_all()
+        release.set()
+        self.root.run_until_idle()
+        self.assertEqual(delivered, ["ranking"])
+
+    def test_background_jobs_leave_workers_free(self):
+        delivered = []
+        release = threading.Event()
+        for _ in range(3):          # more long builds than there are workers
+            self.runner.submit(release.wait, background=True)
+        self.runner.submit(lambda: "search", on_done=delivered.append)
+        self.root.run_until_idle(timeout=1)
+        release.set()
+        self.assertEqual(delivered, ["search"])
+
+    def test_streamed_items_are_delivered_in_order(self):
+        items = []
+        finished = []
+        self.runner.submit_stream(iter, ["a", "b", "c"], on_item=items.append, on_done=finished.append)
+        self.root.run_until_idle()
+        self.assertEqual(items, ["a", "b", "c"])
+        self.assertEqual(finished, [3])
+
+    def test_cancelled_stream_stops_early(self):
+        items = []
+        pulled = []
+        release = threading.Event()
+
+        def slow_items():
+            for item in range(100):
+                pulled.append(item)
+                yield item
+                release.wait()
+
+        self.runner.submit_stream(slow_items, on_item=items.append)
+        time.sleep(0.05)
+        self.runner.cancel_all()
+        release.set()
+        self.root.run_until_idle()
+        self.assertEqual(items, [])
+        self.assertLess(len(pulled), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""This program will test the proper functioning of vanity_ranking.py against a small word index."""
+
+import os
+import unittest
+import available_num_finder as anf
+import vanity_ranking as vr
+import word_checker as wc
+
+class TestVanityRanking(unittest.TestCase):
+
+    def setUp(self):
+        self.word_index = wc.TemporaryWordIndex(["move", "taxi", "cab", "go"])
+        self.temp_dir = self.word_index.start()
+
+    def tearDown(self):
+        self.word_index.stop()
+
+    def test_score_number(self):
+        self.assertEqual(vr.score_number("18002226683", {}), (46, "move"))        # word at the end
+        self.assertEqual(vr.score_number("18008294222", {}), (42, "taxi"))        # word at the start
+        self.assertEqual(vr.score_number("18002000000", {}), (0.0, None))
+        self.assertEqual(vr.score_span(0, 7, "fastest", 7, {}), 70 + 6 + 20)
+        self.assertEqual(vr.score_span(0, 6, "go-taxi", 7, {}), 60 + 2 - 8)
+
+    def test_word_frequency_counts(self):
+        frequencies = {"taxi": 999.0, "move": 9.0}
+        self.assertEqual(vr.score_number("18002228294", frequencies), (46 + 4 * 3, "taxi"))
+        self.assertEqual(vr.score_number("18002226683", frequencies), (46 + 4 * 1, "move"))
+        self.assertEqual(vr.score_span(0, 6, "go-taxi", 7, frequencies), 60 + 2 - 8)      # as common as "go"
+        ranking = vr.VanityRanking(["18002226683", "18002228294"], frequencies=frequencies)
+        self.assertEqual([phone_num for phone_num, score, word in ranking.top(2)], ["18002228294", "18002226683"])
+
+    def test_word_frequency_file(self):
+        frequency_path = os.path.join(self.temp_dir, "word_frequencies.txt")
+        with open(frequency_path, "w") as frequency_file:
+            frequency_file.write("move 3\ntaxi 1\n")
+        self.assertEqual(vr.load_word_frequencies(frequency_path), {"move": 750000.0, "taxi": 250000.0})
+        self.assertEqual(vr.load_word_frequencies(os.path.join(self.temp_dir, "missing.txt")), {})
+
+    def test_top_numbers(self):
+        ranking = vr.VanityRanking(["18008294222", "18002000000", "18002226683", "18002222222"], frequencies={})
+        self.assertEqual(len(ranking), 3)
+        self.assertNotIn("18002000000", ranking)
+        self.assertEqual(ranking.top(2), [("18002226683", 46, "move"), ("18008294222", 42, "taxi")])
+        self.assertEqual(ranking.top(5, offset=2), [("18002222222", 36, "cab")])
+        self.assertEqual(ranking.top(2), ranking.top(2))        # reading the top does not use it up
+        best = ranking.iter_best()
+        self.assertEqual(next(best), ("18002226683", 46, "move"))
+        ranking.remove("18008294222")                           # sold while the list was being read
+        self.assertEqual(list(best), [("18002222222", 36, "cab")])
+
+    def test_add_and_remove(self):
+        ranking = vr.VanityRanking(["18008294222", "18002226683"], frequencies={})
+        self.assertTrue(ranking.remove("18002226683"))
+        self.assertFalse(ranking.remove("18002226683"))
+        self.assertEqual(ranking.top(2), [("18008294222", 42, "taxi")])
+        ranking.add("18002226683")
+        self.assertEqual([phone_num for phone_num, score, word in ranking.top(2)], ["18002226683", "18008294222"])
+        for _ in range(100):        # removed entries are dropped from the heap once they pile up
+            ranking.remove("18008294222")
+            ranking.add("18008294222")
+        self.assertLessEqual(len(ranking.heap), 2 * len(ranking) + 64)
+        self.assertEqual(len(ranking.top(10)), 2)
+
+    def test_follow_inventory(self):
+        inventory = anf.AvailabilityIndex(["18008294222", "18002000000"])
+        snapshot = inventory.snapshot()
+        ranking = vr.VanityRanking(snapshot, frequencies={})
+        inventory.add("18002226683")            # changed while the ranking was being built
+        ranking.follow(inventory, snapshot)
+        self.assertEqual([phone_num for phone_num, score, word in ranking.top(5)], ["18002226683", "18008294222"])
+        inventory.mark_sold("18002226683")
+        inventory.add("18002222222")
+        self.assertEqual([phone_num for phone_num, score, word in ranking.top(5)], ["18008294222", "18002222222"])
+
+if __name__ == '__main__':
+    unittest.main()
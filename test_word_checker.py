@@ -1,8 +1,17 @@
 """This program will test the proper functioning of word_checker.py."""
 
+import os
 import unittest
+import available_num_finder as anf
 import word_checker as wc
 
+# The real dictionary tests only run where enchant and its en_US dictionary are installed.
+try:
+    wc.get_spell_checker()
+    HAVE_SPELL_CHECKER = True
+except Exception:
+    HAVE_SPELL_CHECKER = False
+
 class TestWC(unittest.TestCase):
 
     def test_word_list_exists(self):
@@ -41,13 +50,34 @@ class TestWC(unittest.TestCase):
         self.assertEqual(type(prepared_phone_num), list)
         self.assertEqual(type(prepared_phone_num[0]), str)
         self.assertEqual(len(prepared_phone_num), 7)
+        for phone_num in ("18002226a83", "28003334444", "1800333444", 18003334444):
+            with self.assertRaises(wc.InvalidPhoneNumberError):
+                wc.prepare_phone_number(phone_num)
 
+    @unittest.skipUnless(HAVE_SPELL_CHECKER, "enchant or its en_US dictionary is not installed")
     def test_find_words_for_num(self):
         words_spelled_by_num = wc.find_words_for_num(['3', '3', '3', '4', '4', '4', '4'])
         self.assertEqual(type(words_spelled_by_num), list)
         self.assertEqual(type(words_spelled_by_num[0]), str)
         self.assertIn("high", words_spelled_by_num)
 
+    def test_find_words_for_num_from_word_source(self):
+        # Uses a small word list of its own, indexed ahead of time, so the system word list and spell checker
+        # are not needed.
+        with wc.TemporaryWordIndex(["high", "igh", "move", "taxi"], source=True):
+            words_spelled_by_num = wc.find_words_for_num(['3', '3', '3', '4', '4', '4', '4'])
+            self.assertEqual(type(words_spelled_by_num), list)
+            self.assertEqual(type(words_spelled_by_num[0]), str)
+            self.assertIn("high", words_spelled_by_num)
+
+    def test_build_word_index(self):
+        word_index = wc.build_word_index(["move", "love", "taxi", "move"])
+        self.assertEqual(type(word_index), dict)
+        self.assertEqual(word_index["6683"], ["move"])
+        self.assertEqual(word_index["5683"], ["love"])
+        self.assertEqual(word_index["8294"], ["taxi"])
+        self.assertNotIn("2222", word_index)
+
     def test_find_num_for_word(self):
         peach_lower_result = wc.find_num_for_word("peach")
         peach_upper_result = wc.find_num_for_word("Peach")
@@ -83,5 +113,137 @@ class TestWC(unittest.TestCase):
         negative_results2 = wc.search_available_nums_for_word(test_word2, available_nums_without_test_words)
         self.assertEqual(negative_results2, None)
 
+        indexed_nums = anf.AvailabilityIndex(available_nums_with_test_words)
+        self.assertEqual(wc.search_available_nums_for_word(test_word1, indexed_nums), "18002278779")
+        self.assertEqual(wc.search_available_nums_for_word(test_word2, indexed_nums), "18004444364")
+        self.assertEqual(wc.search_available_nums_for_word("cat", indexed_nums), None)
+
+    def test_search_available_nums_for_words(self):
+        words = ["puppy", "dog", "cat", "Dog", "4444364", ""]
+        available_nums = ["18002278779", "18004444364", "18005556683"]
+        expected_results = {"puppy": "18002278779", "dog": "18004444364", "cat": None, "Dog": "18004444364", "4444364": "18004444364", "": "18002278779"}
+
+        self.assertEqual(wc.search_available_nums_for_words(words, available_nums), expected_results)
+        self.assertEqual(wc.search_available_nums_for_words(words, anf.PhoneInventory(available_nums)), expected_results)
+        self.assertEqual(wc.search_available_nums_for_words(words, anf.AvailabilityIndex(available_nums)), expected_results)
+        self.assertEqual(wc.search_available_nums_for_words([], anf.PhoneInventory(available_nums)), {})
+
+    def test_lru_cache(self):
+        cache = wc.LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)     # "a" is now the most recently used
+        cache.put("c", 3)                       # so "b" is dropped
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1, "size": 2, "maxsize": 2})
+
+    def test_available_num_cache_follows_inventory(self):
+        wc.clear_caches()
+        inventory = anf.AvailabilityIndex(["18002278779"])
+        self.assertEqual(wc.search_available_nums_for_word("dog", inventory), None)
+        self.assertEqual(wc.search_available_nums_for_word("dog", inventory), None)
+        self.assertEqual(wc.cache_stats()["available_num"]["hits"], 1)
+        inventory.add("18004444364")
+        self.assertEqual(wc.search_available_nums_for_word("dog", inventory), "18004444364")
+        self.assertEqual(wc.search_available_nums_for_words(["dog", "puppy"], inventory.inventory), {"dog": "18004444364", "puppy": "18002278779"})
+        inventory.mark_sold("18004444364")
+        self.assertEqual(wc.search_available_nums_for_word("dog", inventory), None)
+        self.assertEqual(wc.search_available_nums_for_words(["dog", "puppy"], inventory.inventory), {"dog": None, "puppy": "18002278779"})
+        self.assertEqual(wc.search_available_nums_for_word("puppy", inventory), "18002278779")
+        self.assertEqual(wc.cache_stats()["available_num"]["size"], 2)     # the answer for puppy was kept
+
+    def test_answers_found_during_a_change_are_not_cached(self):
+        wc.clear_caches()
+        inventory = anf.PhoneInventory(["18002278779"])
+        find_first, as_numpy = inventory.find_first, inventory.as_numpy
+
+        def find_first_while_adding(suffix):
+            found = find_first(suffix)
+            inventory.add("18004444364")        # arrives after the lookup has looked
+            return found
+        inventory.find_first = find_first_while_adding
+        self.assertEqual(wc.search_available_nums_for_word("dog", inventory), None)
+        inventory.find_first = find_first
+        self.assertEqual(wc.search_available_nums_for_word("dog", inventory), "18004444364")
+
+        def as_numpy_while_selling():
+            inventory.mark_sold("18004444364")
+            return as_numpy()
+        inventory.as_numpy = as_numpy_while_selling
+        self.assertEqual(wc.search_available_nums_for_words(["puppy"], inventory), {"puppy": "18002278779"})
+        self.assertEqual(wc.cache_stats()["available_num"]["size"], 0)     # the sale dropped dog, and puppy was not kept
+        inventory.as_numpy = as_numpy
+        self.assertEqual(wc.search_available_nums_for_word("dog", inventory), None)
+
+"""These tests run against a small index written to a temporary file, so they do not need the spell checker."""
+
+class TestWCWithSmallIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.word_index = wc.TemporaryWordIndex(["high", "igh", "hii", "move", "taxi", "cab", "go", "ax"])
+        self.word_index.start()
+
+    def tearDown(self):
+        self.word_index.stop()
+
+    def test_find_words_for_num(self):
+        self.assertEqual(wc.find_words_for_num(list("3334444")), ["hii", "igh", "high"])
+        self.assertEqual(wc.find_words_for_num(list("2226683")), ["move"])
+        self.assertEqual(wc.find_words_for_num(list("0226683")), [])
+
+    def test_find_words_for_num_options(self):
+        self.assertEqual(wc.find_words_for_num(list("2468294"), max_words=2), ["go-taxi", "taxi"])
+        self.assertEqual(wc.find_words_for_num(list("2468294")), ["taxi"])
+        self.assertEqual(wc.find_words_for_num(list("8294100"), position="anywhere"), ["taxi"])
+        self.assertEqual(wc.find_words_for_num(list("8294100")), [])
+        self.assertEqual(wc.find_word_spans(list("1462221"), position="anywhere", max_words=2), [(1, 6, "go-cab"), (3, 6, "cab")])
+        with self.assertRaises(ValueError):
+            wc.find_word_spans(list("4682294"), position="middle")
+
+    def test_iter_words_for_num(self):
+        self.assertEqual(list(wc.iter_words_for_num(list("3334444"))), ["high", "hii", "igh"])
+        self.assertEqual(list(wc.iter_words_for_num(list("3334444"), order="shortest")), ["hii", "igh", "high"])
+        self.assertEqual(list(wc.iter_words_for_num(list("3334444"), limit=2)), ["high", "hii"])
+        self.assertEqual(list(wc.iter_words_for_num(list("3034444"))), [])
+        self.assertEqual(list(wc.iter_words_for_num(list("2468294"), max_words=2)), ["go-taxi", "taxi"])
+        self.assertEqual(sorted(wc.iter_words_for_num(list("1462221"), position="anywhere", max_words=2)), ["cab", "go-cab"])
+        with self.assertRaises(ValueError):
+            list(wc.iter_words_for_num(list("3334444"), order="random"))
+
+    def test_find_words_for_many(self):
+        phone_nums = ["18003334444", "18002226683", "18005558294", "18000226683", "18002222222"]
+        expected_results = {phone_num: wc.find_words_for_num(wc.prepare_phone_number(phone_num)) for phone_num in phone_nums}
+        self.assertEqual(list(wc.find_words_for_many(phone_nums, workers=1)), list(expected_results.items()))
+        self.assertEqual(dict(wc.find_words_for_many(iter(phone_nums), workers=2, chunk_size=2)), expected_results)
+        self.assertEqual(dict(wc.find_words_for_many(anf.PhoneInventory(phone_nums), workers=2)), expected_results)
+
+"""This spell checker knows a handful of words, so the spell-checked fallback can be tested without enchant."""
+class SmallSpellChecker():
+    def __init__(self, words):
+        self.words = set(words)
+
+    def check(self, word):
+        return word in self.words
+
+"""These tests run with neither a word source nor an index file, so words are found by spell checking."""
+
+class TestWCWithoutWordSource(unittest.TestCase):
+
+    def setUp(self):
+        self.word_index = wc.TemporaryWordIndex(spell_checker=SmallSpellChecker(["high", "igh", "hii", "move", "taxi", "go"]))
+        self.word_index.start()
+
+    def tearDown(self):
+        self.word_index.stop()
+
+    def test_find_words_for_num(self):
+        self.assertEqual(wc.find_words_for_num(list("3334444")), ["hii", "igh", "high"])
+        self.assertEqual(wc.find_words_for_num(list("2226683")), ["move"])
+        self.assertEqual(wc.find_words_for_num(list("0226683")), [])
+        self.assertEqual(wc.find_words_for_num(list("2468294"), max_words=2), ["go-taxi", "taxi"])
+        self.assertIsInstance(wc.get_word_index(), wc.SpellCheckedWordIndex)
+        self.assertFalse(os.path.exists(wc.WORD_INDEX_PATH))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""This program will test the proper functioning of word_index.py."""
+
+import os
+import tempfile
+import unittest
+import word_index as wi
+
+class TestWordIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "word_index.bin")
+        self.checksum = bytes(range(32))
+        wi.write_word_index({"6683": ["move", "nove"], "8294": ["taxi"], "222": ["cab"]}, self.path, self.checksum)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        word_index = wi.load_word_index(self.path, self.checksum)
+        self.assertEqual(len(word_index), 3)
+        self.assertEqual(word_index.get("6683"), ["move", "nove"])
+        self.assertEqual(word_index.get("8294"), ["taxi"])
+        self.assertEqual(word_index.get("222"), ["cab"])
+        self.assertIsNone(word_index.get("2222"))
+        self.assertIsNone(word_index.get("0222"))
+        self.assertEqual(word_index.get("", ()), ())
+        self.assertIn("222", word_index)
+        self.assertEqual([digits for digits, _ in word_index.items()], ["222", "6683", "8294"])
+        word_index.close()
+
+    def test_stale_index_is_rejected(self):
+        with self.assertRaises(wi.StaleIndexError):
+            wi.load_word_index(self.path, bytes(32))
+
+    def test_bad_file_is_rejected(self):
+        with open(self.path, "r+b") as index_file:
+            index_file.write(b"XXXX")
+        with self.assertRaises(wi.IndexFormatError):
+            wi.load_word_index(self.path)
+
+    def test_empty_and_truncated_files_are_rejected(self):
+        with open(self.path, "r+b") as index_file:
+            index_file.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(wi.IndexFormatError):
+            wi.load_word_index(self.path)
+        open(self.path, "wb").close()
+        with self.assertRaises(wi.IndexFormatError):
+            wi.load_word_index(self.path)
+
+    def test_writing_leaves_no_temporary_files(self):
+        wi.write_word_index({"6683": ["move"]}, self.path)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["word_index.bin"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""This module ranks available numbers by how good a vanity number they make, so that the program can offer the
+best numbers in the inventory instead of a random handful.
+
+A number is scored by the best word (or phrase) it spells. Longer words score more, common words score more
+(when a word frequency list is available; without one every word counts the same), a word at the end of the
+number scores more than one in the middle (1-800-222-MOVE reads better than 1-800-MOV-E222), and a word that
+uses all seven digits gets a bonus. The scores are kept in a heap, so the top numbers can be read off at any
+time, and numbers can be added or removed (when they are sold) one at a time without scoring the rest of the
+inventory again. A ranking can follow an available_num_finder inventory, so that this happens on its own as
+the inventory changes.
+"""
+
+import heapq
+import math
+import os
+import threading
+
+import instrumentation
+import word_checker as wc
+
+# An optional list of word frequencies: one "word count" pair per line, as in most frequency lists.
+WORD_FREQUENCY_PATH = os.environ.get("HELPER_WORD_FREQUENCIES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "word_frequencies.txt"))
+# The word frequencies, read from WORD_FREQUENCY_PATH on first use
+_word_frequencies = None
+_word_frequencies_lock = threading.Lock()
+
+# How much each quality of a word is worth
+POINTS_PER_DIGIT = 10
+POINTS_PER_FREQUENCY_DECADE = 4     # for every tenfold increase in a word's uses per million
+POINTS_AT_END = 6
+POINTS_AT_START = 2
+POINTS_FOR_ALL_DIGITS = 20
+POINTS_PER_EXTRA_WORD = -8          # phrases are harder to remember than single words
+
+def load_word_frequencies(path : str = WORD_FREQUENCY_PATH) -> dict[str, float]:
+    # Reads a word frequency list and returns each word's uses per million. Returns an empty dict if there
+    # is no list, in which case frequency does not count towards scores.
+    if not os.path.exists(path):
+        return {}
+    counts = {}
+    with open(path, encoding="utf-8", errors="ignore") as frequency_file:
+        for line in frequency_file:
+            parts = line.split()
+            if len(parts) >= 2 and parts[-1].replace(".", "", 1).isdigit():
+                counts[parts[0].lower()] = counts.get(parts[0].lower(), 0) + float(parts[-1])
+    total = sum(counts.values()) or 1
+    return {word: 1e6 * count / total for word, count in counts.items()}
+
+def get_word_frequencies() -> dict[str, float]:
+    # Returns the word frequencies, reading them the first time.
+    global _word_frequencies
+    if _word_frequencies is None:
+        with _word_frequencies_lock:
+            if _word_frequencies is None:
+                _word_frequencies = load_word_frequencies()
+    return _word_frequencies
+
+def score_span(start : int, stop : int, phrase : str, number_length : int, frequencies : dict[str, float]|None = None) -> float:
+    # Scores one spelling that covers phone_num[start:stop]. A phrase counts as common as its rarest word. 
+    # Without frequencies, the ones from WORD_FREQUENCY_PATH are used.
+    words = phrase.split('-')
+    score = POINTS_PER_DIGIT * (stop - start) + POINTS_PER_EXTRA_WORD * (len(words) - 1)
+    frequencies = get_word_frequencies() if frequencies is None else frequencies
+    if frequencies:
+        rarest_use = min(frequencies.get(word, 0.0) for word in words)
+        score += POINTS_PER_FREQUENCY_DECADE * math.log10(1 + rarest_use)
+    if stop == number_length:
+        score += POINTS_AT_END
+    elif start == 0:
+        score += POINTS_AT_START
+    if start == 0 and stop == number_length:
+        score += POINTS_FOR_ALL_DIGITS
+    return score
+
+def score_number(phone_num : str, frequencies : dict[str, float]|None = None, max_words : int = 1) -> tuple[float, str|None]:
+    # Returns (score, best word) for a 1-800 phone number string. A number that spells nothing scores 0.
+    prepared_num = wc.prepare_phone_number(phone_num)
+    best_score, best_word = 0.0, None
+    for start, stop, phrase in wc.find_word_spans(prepared_num, position="anywhere", max_words=max_words):
+        score = score_span(start, stop, phrase, len(prepared_num), frequencies)
+        if score > best_score:
+            best_score, best_word = score, phrase
+    return best_score, best_word
+
+"""This class keeps every scored number in a heap, best first. Removing a number only forgets its score; its
+heap entry is skipped when it comes to the top, and the heap is rebuilt once such entries pile up. So adding
+or removing a number costs O(log n), and reading the top k costs O(k log n)."""
+class VanityRanking():
+    def __init__(self, phone_nums=(), frequencies=None, max_words=1):
+        self.frequencies = get_word_frequencies() if frequencies is None else frequencies
+        self.max_words = max_words
+        self.scores = {}        # phone number -> (score, best word), for numbers that spell something
+        self.heap = []          # (-score, phone number, best word); may hold entries for removed numbers
+        self.add_many(phone_nums)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, phone_num):
+        return phone_num in self.scores
+
+    def add(self, phone_num : str) -> float:
+        # Scores a number and adds it to the ranking. Returns its score (0 if it spells nothing, in which
+        # case it is not ranked).
+        score, best_word = score_number(phone_num, self.frequencies, self.max_words)
+        if best_word is not None and self.scores.get(phone_num) != (score, best_word):
+            self.scores[phone_num] = (score, best_word)
+            heapq.heappush(self.heap, (-score, phone_num, best_word))
+        return score
+
+    @instrumentation.timed("vanity_ranking.add_many")
+    def add_many(self, phone_nums):
+        for phone_num in phone_nums:
+            self.add(phone_num)
+
+    def remove(self, phone_num : str) -> bool:
+        # Takes a number (for example, one that was just sold) out of the ranking. Returns False if it was
+        # not ranked.
+        if self.scores.pop(phone_num, None) is None:
+            return False
+        if len(self.heap) > 2 * len(self.scores) + 64:
+            self._rebuild()
+        return True
+
+    def follow(self, inventory, snapshot=None):
+        # Keeps the ranking in step with an inventory from now on. If the ranking was built from a snapshot 
+        # of the inventory (say on a worker thread, while the inventory went on changing), the changes made 
+        # since the snapshot are applied first.
+        if snapshot is not None:
+            added, removed = inventory.diff(snapshot)
+            for phone_num in removed:
+                self.remove(phone_num)
+            self.add_many(added)
+        inventory.subscribe(self.on_inventory_change)
+
+    def on_inventory_change(self, event : str, phone_num : str):
+        if event == "added":
+            self.add(phone_num)
+        else:       # removed or sold
+            self.remove(phone_num)
+
+    def _rebuild(self):
+        # Drops the heap entries of removed numbers.
+        self.heap = [(-score, phone_num, best_word) for phone_num, (score, best_word) in self.scores.items()]
+        heapq.heapify(self.heap)
+
+    def iter_best(self):
+        # Yields (phone number, score, best word) for every ranked number, best first. It pops from a copy of 
+        # the heap as it goes, so reading the first k costs O(n) for the copy plus O(k log n). A number removed 
+        # while this is being read is skipped when it comes up.
+        heap = list(self.heap)
+        yielded_nums = set()
+        while heap:
+            negative_score, phone_num, best_word = heapq.heappop(heap)
+            if self.scores.get(phone_num) == (-negative_score, best_word) and phone_num not in yielded_nums:
+                yielded_nums.add(phone_num)
+                yield phone_num, -negative_score, best_word
+
+    @instrumentation.timed("vanity_ranking.top")
+    def top(self, count : int, offset : int = 0) -> list[tuple[str, float, str]]:
+        # Returns (phone number, score, best word) for the best numbers, best first, skipping the first
+        # `offset` of them. Entries of removed numbers that come up on the way are dropped for good.
+        taken = []
+        taken_nums = set()
+        while self.heap and len(taken) < offset + count:
+            entry = heapq.heappop(self.heap)
+            negative_score, phone_num, best_word = entry
+            # a number that was removed and added again can have an old entry that looks current
+            if self.scores.get(phone_num) == (-negative_score, best_word) and phone_num not in taken_nums:
+                taken.append(entry)
+                taken_nums.add(phone_num)
+        for entry in taken:
+            heapq.heappush(self.heap, entry)
+        return [(phone_num, -negative_score, best_word) for negative_score, phone_num, best_word in taken[offset:]]
@@ -2,11 +2,32 @@
 matches with English words.
 """
 
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from itertools import product
-import enchant
+import instrumentation
+import word_index as wi
+from keypad_trie import KeypadTrie
 
-# A dictionary against which to check whether derived words are English words
-word_list = enchant.Dict("en_US")
+# A dictionary against which to check whether derived words are English words. It is only loaded when the
+# word index has to be built, so that importing this module stays fast. See get_spell_checker().
+_spell_checker = None
+# Enchant can check a word but cannot list the words it knows, so the word index is built from this plain 
+# text file (one word per line) and every candidate is confirmed with the spell checker. Without the file, 
+# words are found by spell checking every spelling of the digits, as the program first did (see 
+# SpellCheckedWordIndex).
+WORD_SOURCE_PATH = os.environ.get("HELPER_WORD_SOURCE", "/usr/share/dict/words")
+# Words longer than this can never be spelled by a 1-800 number. Two letter words are only offered as part of 
+# a phrase (like GO-TAXI): a word or phrase must be spelled by at least MIN_SPAN_LENGTH digits.
+MIN_WORD_LENGTH = 2
+MAX_WORD_LENGTH = 7
+MIN_SPAN_LENGTH = 3
+# Where the prebuilt word index is kept. Build it ahead of time with `python word_index.py`.
+WORD_INDEX_PATH = os.environ.get("HELPER_WORD_INDEX", os.path.join(os.path.dirname(os.path.abspath(__file__)), "word_index.bin"))
 # The keyboard of a phone, with letters assigned to different digits
 letter_assignments = {
     '0':[], 
@@ -33,6 +54,29 @@ letter_assignments_plus_nums = {
     '8':['t', 'u', 'v', '8'], 
     '9':['w', 'x', 'y', 'z', '9']
 }
+# The reverse of the keyboard above, so that each character can be turned into its digit with one lookup
+digit_for_character = {character: digit for digit, characters in letter_assignments_plus_nums.items() for character in characters}
+# Maps strings of digits to the sorted dictionary words that spell them. Built on first use. The lock keeps 
+# two worker threads from building it at the same time.
+_word_index = None
+_word_index_lock = threading.Lock()
+# A trie of the index's digit strings, for finding words anywhere in a number. Built on first use.
+_keypad_trie = None
+_keypad_trie_lock = threading.Lock()
+
+def get_spell_checker():
+    # Loads the enchant dictionary the first time it is needed.
+    global _spell_checker
+    if _spell_checker is None:
+        import enchant
+        _spell_checker = enchant.Dict("en_US")
+    return _spell_checker
+
+def __getattr__(name):
+    # Keeps `word_checker.word_list` working for code that used the spell checker directly.
+    if name == "word_list":
+        return get_spell_checker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Throws an exception when the input is not a valid phone number.
 class InvalidPhoneNumberError(Exception):
@@ -41,57 +85,491 @@ class InvalidPhoneNumberError(Exception):
         super().__init__(self.message)
         self.message = message
 
+"""This class is a dict with a size limit. When it is full, the entry that was used longest ago is dropped. It 
+counts hits and misses so that its size can be tuned."""
+class LRUCache():
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()        # lookups come from worker threads as well as the Tk thread
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "maxsize": self.maxsize}
+
+"""This class stands in for the word index when there is no word source to build one from. It finds the words 
+for a digit string by spell checking every combination of the digits' letters, and keeps the answer. It cannot 
+list the words it knows, so items() yields nothing and alternatives that need the whole index find none."""
+class SpellCheckedWordIndex():
+    def __init__(self, maxsize=65536):
+        self.words_for_digits = LRUCache(maxsize)
+
+    def get(self, digits : str, default=None):
+        # Returns the sorted words spelled by the digits, or the default if there are none.
+        words = self.words_for_digits.get(digits)
+        if words is None:
+            words = ()
+            if MIN_WORD_LENGTH <= len(digits) <= MAX_WORD_LENGTH and all(letter_assignments.get(digit) for digit in digits):
+                spell_checker = get_spell_checker()
+                spellings = (''.join(letters) for letters in product(*(letter_assignments[digit] for digit in digits)))
+                words = tuple(sorted(word for word in spellings if spell_checker.check(word)))
+            self.words_for_digits.put(digits, words)
+        return list(words) if words else default
+
+    def __contains__(self, digits):
+        return self.get(digits) is not None
+
+    def items(self):
+        return iter(())
+
+    def close(self):
+        pass
+
+"""This class is the keypad trie for a SpellCheckedWordIndex, which has no list of digit strings to build a 
+trie from. Each stretch of digits is looked up in the index instead."""
+class SpellCheckedTrie(KeypadTrie):
+    def __init__(self, word_index : SpellCheckedWordIndex):
+        super().__init__()
+        self.word_index = word_index
+
+    def __contains__(self, digits):
+        return digits in self.word_index
+
+    def match_from(self, phone_num, start:int=0, stop:int|None=None) -> list[int]:
+        stop = len(phone_num) if stop is None else stop
+        return [end for end in range(start + MIN_WORD_LENGTH, stop + 1) if ''.join(phone_num[start:end]) in self.word_index]
+
+# Remembers recent answers, so that asking the same question again costs one dict lookup.
+# Misses are marked with this object, because None is a real answer for available numbers.
+_NOT_CACHED = object()
+words_for_digits_cache = LRUCache(4096)     # (digits, position, max_words) -> words spelled by them
+digits_for_word_cache = LRUCache(8192)      # word -> digits that spell it
+available_num_cache = LRUCache(8192)        # (inventory cache key, digits) -> first available number or None
+# The inventories whose changes available_num_cache is listening to, by cache key
+_watched_inventories = set()
+_watched_inventories_lock = threading.Lock()
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    # Returns the hit and miss counts of each lookup cache.
+    return {
+        "words_for_digits": words_for_digits_cache.stats(),
+        "digits_for_word": digits_for_word_cache.stats(),
+        "available_num": available_num_cache.stats(),
+    }
+
+instrumentation.add_source("word_checker_caches", cache_stats)
+
+def clear_caches():
+    # Empties every lookup cache. Needed only if the word index is swapped out; inventory changes are 
+    # noticed on their own (see watch_inventory).
+    words_for_digits_cache.clear()
+    digits_for_word_cache.clear()
+    available_num_cache.clear()
+
 def prepare_phone_number(phone_num : str) -> list[str]:
     # Strips 1-800 or 800 off of the input and makes sure that it is a valid number. 
     # Then returns number as a list of digit strings
     if type(phone_num) == str:
-        if len(phone_num) == 11:
-            shortened_num = phone_num[4:]
-            digit_list = [num for num in shortened_num]
-        else:   # when the phone_num is too long or short
+        if len(phone_num) != 11:    # when the phone_num is too long or short
             raise InvalidPhoneNumberError
+        elif not (phone_num.isascii() and phone_num.isdigit()):     # when it has letters or symbols in it
+            raise InvalidPhoneNumberError("The phone number must be all digits")
+        elif not phone_num.startswith("1800"):
+            raise InvalidPhoneNumberError("The phone number must start with 1800")
+        shortened_num = phone_num[4:]
+        digit_list = [num for num in shortened_num]
     else:   # when the phone_num is not a string
         raise InvalidPhoneNumberError
     return digit_list
 
-def find_words_for_num(phone_num : list[str]) -> list[str]:
+@instrumentation.timed("word_checker.load_source_words")
+def load_source_words(path : str = WORD_SOURCE_PATH) -> list[str]:
+    # Reads the word source file and keeps the lowercase words of a usable length that the spell checker 
+    # accepts. These are exactly the words that the letter-by-letter search could have found.
+    source_words = set()
+    with open(path, encoding="utf-8", errors="ignore") as source_file:
+        for line in source_file:
+            word = line.strip().lower()
+            if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH and word.isascii() and word.isalpha():
+                source_words.add(word)
+    spell_checker = get_spell_checker()
+    return sorted(word for word in source_words if spell_checker.check(word))
+
+@instrumentation.timed("word_checker.build_word_index")
+def build_word_index(words) -> dict[str, list[str]]:
+    # Takes an iterable of words and groups them by the digits that spell them. Each group is sorted and 
+    # free of duplicates, so a reverse lookup is a single dict probe.
+    grouped_words = {}
+    for word in words:
+        grouped_words.setdefault(find_num_for_word(word), set()).add(word)
+    return {digits: sorted(group) for digits, group in grouped_words.items()}
+
+def get_word_index() -> wi.WordIndex|SpellCheckedWordIndex:
+    # Returns the digit-to-word index. The index file on disk is used when it matches the word source; 
+    # otherwise it is rebuilt from the source first. With neither an index file nor a word source, words are 
+    # found by spell checking instead (a SpellCheckedWordIndex).
+    global _word_index
+    if _word_index is None:
+        with _word_index_lock:
+            if _word_index is None:
+                with instrumentation.measure("word_checker.load_word_index"):
+                    checksum = wi.source_checksum(WORD_SOURCE_PATH) if os.path.exists(WORD_SOURCE_PATH) else None
+                    try:
+                        _word_index = wi.load_word_index(WORD_INDEX_PATH, checksum)
+                    except (FileNotFoundError, wi.IndexFormatError, wi.StaleIndexError):
+                        if checksum is None:        # no word source to build the index from
+                            _word_index = SpellCheckedWordIndex()
+                        else:
+                            wi.build_index_file(WORD_SOURCE_PATH, WORD_INDEX_PATH)
+                            _word_index = wi.load_word_index(WORD_INDEX_PATH, checksum)
+    return _word_index
+
+def get_keypad_trie() -> KeypadTrie:
+    # Returns the trie of digit strings that spell words, building it from the word index the first time.
+    global _keypad_trie
+    if _keypad_trie is None:
+        with _keypad_trie_lock:
+            if _keypad_trie is None:
+                word_index = get_word_index()
+                with instrumentation.measure("word_checker.build_keypad_trie"):
+                    if isinstance(word_index, SpellCheckedWordIndex):
+                        _keypad_trie = SpellCheckedTrie(word_index)
+                    else:
+                        _keypad_trie = KeypadTrie.from_word_index(word_index)
+    return _keypad_trie
+
+"""This class swaps in a word index of just the given words, written to a temporary directory, and puts back
+the real one when it is stopped. It is meant for tests. With source=True the words are also written as the word
+source the index was built from. With no words there is neither an index nor a source, so words are found by
+spell checking, with the given spell checker if there is one. Use it in a with block, or call start() and stop()."""
+class TemporaryWordIndex():
+    def __init__(self, words=None, source:bool=False, spell_checker=None):
+        self.words = None if words is None else list(words)
+        self.source = source
+        self.spell_checker = spell_checker
+        self.directory = None
+
+    def start(self) -> str:
+        # Writes the index, points the module at it and returns the temporary directory, which tests may also use.
+        global WORD_INDEX_PATH, WORD_SOURCE_PATH, _word_index, _keypad_trie, _spell_checker
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.temp_dir.name
+        self.saved_state = (WORD_INDEX_PATH, WORD_SOURCE_PATH, _word_index, _keypad_trie, _spell_checker)
+        WORD_INDEX_PATH = os.path.join(self.directory, "word_index.bin")
+        WORD_SOURCE_PATH = os.path.join(self.directory, "words")
+        if self.words is not None and self.source:
+            with open(WORD_SOURCE_PATH, "w") as source_file:
+                source_file.writelines(word + "\n" for word in self.words)
+            wi.write_word_index(build_word_index(self.words), WORD_INDEX_PATH, wi.source_checksum(WORD_SOURCE_PATH))
+        elif self.words is not None:
+            wi.write_word_index(build_word_index(self.words), WORD_INDEX_PATH)
+        if self.spell_checker is not None:
+            _spell_checker = self.spell_checker
+        _word_index = _keypad_trie = None
+        clear_caches()
+        return self.directory
+
+    def stop(self):
+        # Closes the temporary index and puts back the module's own paths, index and caches.
+        global WORD_INDEX_PATH, WORD_SOURCE_PATH, _word_index, _keypad_trie, _spell_checker
+        if _word_index is not None:
+            _word_index.close()
+        WORD_INDEX_PATH, WORD_SOURCE_PATH, _word_index, _keypad_trie, _spell_checker = self.saved_state
+        clear_caches()
+        self.temp_dir.cleanup()
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def _iter_word_spans(phone_num : list[str], position : str, max_words : int, longest_first : bool = True):
+    # Yields (start, stop, phrase) for the spellings in a phone number, one stretch of digits at a time, 
+    # longest stretches first (or shortest first). Nothing is looked up for stretches that are never reached.
+    if position not in ("end", "anywhere"):
+        raise ValueError(f"position must be 'end' or 'anywhere', not {position!r}")
+    word_index = get_word_index()
+    keypad_trie = get_keypad_trie() if max_words > 1 else None
+    lengths = range(len(phone_num), MIN_SPAN_LENGTH - 1, -1) if longest_first else range(MIN_SPAN_LENGTH, len(phone_num) + 1)
+    for length in lengths:
+        starts = [len(phone_num) - length] if position == "end" else range(0, len(phone_num) - length + 1)
+        for start in starts:
+            stop = start + length
+            if keypad_trie is None:         # single words need no trie, just one index lookup
+                phrases = word_index.get(''.join(phone_num[start:stop]), ())
+            else:
+                phrases = []
+                for digit_keys in sorted(keypad_trie.segmentations(phone_num, start, stop, max_words), key=len):
+                    phrases.extend('-'.join(words) for words in product(*(word_index.get(digits, ()) for digits in digit_keys)))
+            for phrase in phrases:
+                yield start, stop, phrase
+
+def find_word_spans(phone_num : list[str], position : str = "end", max_words : int = 1) -> list[tuple[int, int, str]]:
+    # Finds the words and phrases in a phone number given as a list of digit strings. Each result is 
+    # (start, stop, phrase), where phone_num[start:stop] spells the phrase and a phrase's words are joined 
+    # with "-". position="end" only finds spellings that run to the last digit, as in 222-MOVE; 
+    # position="anywhere" finds them anywhere in the number. max_words above 1 also finds phrases of 
+    # several words, like GO-TAXI. Results are ordered longest first.
+    spans = list(_iter_word_spans(phone_num, position, max_words))
+    spans.sort(key=lambda span: (span[0] - span[1], span[2].count('-'), span[0], span[2]))
+    return spans
+
+def iter_words_for_num(phone_num : list[str], order : str = "longest", limit : int|None = None, position : str = "end", max_words : int = 1):
+    # The lazy form of find_words_for_num. Yields each word (or phrase) once, longest first or shortest 
+    # first, and stops after `limit` of them without looking for the rest. Finds the same words as 
+    # find_words_for_num with the same position and max_words.
+    if order not in ("longest", "shortest"):
+        raise ValueError(f"order must be 'longest' or 'shortest', not {order!r}")
+    if limit is not None and limit <= 0:
+        return
+    if position == "end" and max_words == 1 and not all(letter_assignments[digit] for digit in phone_num):
+        return      # as in find_words_for_num, 0 and 1 have no letters, so such a number spells nothing
+    seen_words = set()
+    for _, _, word in _iter_word_spans(phone_num, position, max_words, longest_first=(order == "longest")):
+        if word not in seen_words:
+            seen_words.add(word)
+            yield word
+            if len(seen_words) == limit:
+                return
+
+@instrumentation.timed("word_checker.find_words_for_num")
+def find_words_for_num(phone_num : list[str], position : str = "end", max_words : int = 1) -> list[str]:
     # Takes a phone number in the form of a list of digit strings.  
     # Outputs a list of words that can be spelled using that phone number.
+    # By default these are single words that end at the last digit. The position and max_words options 
+    # widen the search to words anywhere in the number and to phrases; see find_word_spans.
 
-    words = product(*(letter_assignments[digit] for digit in phone_num))
-    
-    solution_words = []
+    cache_key = (''.join(phone_num), position, max_words)
+    solution_words = words_for_digits_cache.get(cache_key, _NOT_CACHED)
+    if solution_words is _NOT_CACHED:
+        solution_words = tuple(_find_words_for_num(phone_num, position, max_words))
+        words_for_digits_cache.put(cache_key, solution_words)
+    return list(solution_words)     # a fresh list, since callers sort it in place
 
-    for word in words:
-        word = ''.join(word)
-        for i in range(0, 5):
-            if word_list.check(word[i:]) == True:
-                if word[i:] not in solution_words:
-                    solution_words.append(word[i:])
-        
+def _find_words_for_num(phone_num : list[str], position : str, max_words : int) -> list[str]:
+    if position != "end" or max_words != 1:
+        phrases = {}        # a dict keeps the first (longest) occurrence of each phrase, in order
+        for _, _, phrase in find_word_spans(phone_num, position, max_words):
+            phrases.setdefault(phrase)
+        return list(phrases)
+
+    # 0 and 1 have no letters, so a number containing them spells nothing at all
+    if not all(letter_assignments[digit] for digit in phone_num):
+        return []
+
+    word_index = get_word_index()
+    # The words are ordered as the letter-by-letter search would have found them: by their spelling with 
+    # the earliest letter of each skipped digit in front, then by where they start.
+    first_letters = ''.join(letter_assignments[digit][0] for digit in phone_num)
+    found_words = []
+    for i in range(0, 5):
+        for word in word_index.get(''.join(phone_num[i:]), ()):
+            found_words.append((first_letters[:i] + word, i, word))
+    found_words.sort()
+
+    solution_words = [word for _, _, word in found_words]
     return solution_words
 
+def _load_worker_word_index(index_path : str, source_path : str):
+    # Runs once in each worker process of find_words_for_many, so the word data is opened once per worker 
+    # and not once per number.
+    global WORD_INDEX_PATH, WORD_SOURCE_PATH
+    WORD_INDEX_PATH, WORD_SOURCE_PATH = index_path, source_path
+    get_word_index()
+
+def _find_words_for_chunk(phone_nums : list[str], keep_invalid : bool = False) -> list[tuple[str, list[str]|InvalidPhoneNumberError]]:
+    results = []
+    for phone_num in phone_nums:
+        try:
+            results.append((phone_num, find_words_for_num(prepare_phone_number(phone_num))))
+        except InvalidPhoneNumberError as error:
+            if not keep_invalid:
+                raise
+            results.append((phone_num, error))
+    return results
+
+def find_words_for_many(phone_nums, workers : int|None = None, chunk_size : int = 2000, keep_invalid : bool = False):
+    # Takes an iterable of 1-800 phone number strings (a list, or an available_num_finder.PhoneInventory) 
+    # and yields (phone_num, words) for each one, where words is what find_words_for_num returns. The numbers 
+    # are split into chunks that run on a pool of worker processes, and results are yielded as each chunk 
+    # finishes, so they do not come back in input order. Only a few chunks are in flight at once, so the 
+    # input can be a stream of any length. With workers=1 everything runs in this process, in order.
+    # An invalid number raises InvalidPhoneNumberError, or with keep_invalid is yielded with the error in 
+    # place of its words.
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunked(phone_nums, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield from _find_words_for_chunk(chunk, keep_invalid)
+        return
+
+    # Make sure the index file exists before the workers go looking for it, so it is only built once.
+    get_word_index()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_load_worker_word_index, initargs=(WORD_INDEX_PATH, WORD_SOURCE_PATH))
+    try:
+        in_flight = set()
+        for chunk in chunks:
+            in_flight.add(executor.submit(_find_words_for_chunk, chunk, keep_invalid))
+            if len(in_flight) >= 2 * workers:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield from future.result()
+        while in_flight:
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield from future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _chunked(items, chunk_size : int):
+    # Yields lists of up to chunk_size items from any iterable.
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def watch_inventory(available_nums):
+    # Makes available_num_cache listen to an inventory's changes. A number that is added or removed can only 
+    # change the answer for one of its own endings, so just those (at most 12) entries are dropped.
+    cache_key = available_nums.cache_key
+    with _watched_inventories_lock:
+        if cache_key in _watched_inventories:
+            return
+        _watched_inventories.add(cache_key)
+
+    def forget_changed_answers(event, phone_num):
+        for start in range(len(phone_num) + 1):
+            available_num_cache.discard((cache_key, phone_num[start:]))
+    available_nums.subscribe(forget_changed_answers)
+
 def find_num_for_word(word : str) -> str:
     # Takes a desired word and returns the string of digits that spell it. Returns an empty string if passed 
     # an empty string. 
-    letter_list = [letter for letter in word.lower()]
-    digit_list = []
-    for letter in letter_list:
-        for key, value in letter_assignments_plus_nums.items():
-            for num in value:
-                if num == letter:
-                    digit_list.append(key)
-    phone_num = ''.join(digit_list)
+    phone_num = digits_for_word_cache.get(word)
+    if phone_num is None:
+        digit_list = [digit_for_character.get(letter, '') for letter in word.lower()]
+        phone_num = ''.join(digit_list)
+        digits_for_word_cache.put(word, phone_num)
     return phone_num
 
-def search_available_nums_for_word(word : str, available_nums : list[str]) -> str|None:
-    # Given a desired word and a list of available numbers, this function outputs the number that 
-    # spells the desired word. The number is in the form of a string. If the word is not available, the
-    # function will return None.
+@instrumentation.timed("word_checker.search_available_nums_for_word")
+def search_available_nums_for_word(word : str, available_nums) -> str|None:
+    # Given a desired word and the available numbers, this function outputs the number that spells the 
+    # desired word. The number is in the form of a string. If the word is not available, the function will 
+    # return None. The available numbers can be a list of number strings or an index of them (anything with 
+    # a find_first method, such as available_num_finder.AvailabilityIndex), which avoids a scan.
     needed_num = find_num_for_word(word)
-    for digit_list in available_nums:
-        digit_str = ''.join(digit_list)
-        if digit_str.endswith(needed_num):
-            return digit_list
+    if hasattr(available_nums, "cache_key"):       # the inventory can tell us when it changes, so answers can be kept
+        watch_inventory(available_nums)
+        cache_key = (available_nums.cache_key, needed_num)
+        phone_num = available_num_cache.get(cache_key, _NOT_CACHED)
+        if phone_num is _NOT_CACHED:
+            version = available_nums.version
+            phone_num = available_nums.find_first(needed_num)
+            _cache_if_unchanged(available_nums, version, {cache_key: phone_num})
+        return phone_num
+    if hasattr(available_nums, "find_first"):
+        return available_nums.find_first(needed_num)
+    for phone_num in available_nums:
+        if phone_num.endswith(needed_num):
+            return phone_num
     return None
 
+@instrumentation.timed("word_checker.search_available_nums_for_words")
+def search_available_nums_for_words(words, available_nums) -> dict[str, str|None]:
+    # The batch form of search_available_nums_for_word. Takes many words (or digit endings) and returns a 
+    # dict from each word to the first available number that spells it, or None. When the available numbers 
+    # can be viewed as a numpy array (an available_num_finder.PhoneInventory with numpy installed), the words 
+    # are grouped by the length of their ending and each group is matched in one vectorized pass using 
+    # number % 10**length. Otherwise each word is looked up on its own. As in search_available_nums_for_word, 
+    # answers are only cached for inventories with a cache_key, which tell their listeners when they change. 
+    # Numbers kept by a lookup server (a lookup_server.LookupClient) are found in one round trip.
+    if hasattr(available_nums, "find_numbers_for_words"):
+        return available_nums.find_numbers_for_words(words)
+    needed_nums = {word: find_num_for_word(word) for word in words}
+    if not hasattr(available_nums, "as_numpy"):
+        return {word: search_available_nums_for_word(word, available_nums) for word in needed_nums}
+
+    cacheable = hasattr(available_nums, "cache_key")
+    if cacheable:
+        watch_inventory(available_nums)
+        version = available_nums.version
+    results = dict.fromkeys(needed_nums)
+    wanted_by_modulus = {}      # modulus -> remainder -> the words whose ending it is
+    for word, needed_num in needed_nums.items():
+        cached_num = available_num_cache.get((available_nums.cache_key, needed_num), _NOT_CACHED) if cacheable else _NOT_CACHED
+        if cached_num is not _NOT_CACHED:
+            results[word] = cached_num
+            continue
+        local_suffix = available_nums.local_suffix(needed_num)
+        if local_suffix is not None:
+            modulus, remainder = local_suffix
+            wanted_by_modulus.setdefault(modulus, {}).setdefault(remainder, []).append(word)
+    # An inventory cannot change while its numbers are viewed as an array, so the view is only kept while 
+    # the inventory's lock is held.
+    with getattr(available_nums, "lock", None) or nullcontext():
+        local_array = available_nums.as_numpy()
+        if local_array is None:         # no numpy
+            return {word: search_available_nums_for_word(word, available_nums) for word in needed_nums}
+        _match_endings(available_nums, local_array, wanted_by_modulus, results)
+        del local_array
+    if cacheable:
+        _cache_if_unchanged(available_nums, version, {(available_nums.cache_key, needed_num): results[word] for word, needed_num in needed_nums.items()})
+    return results
+
+def _cache_if_unchanged(available_nums, version : int, answers : dict):
+    # Caches answers found when the inventory was at the given version, unless it has changed since. A change 
+    # made during the lookup has already dropped its cache entries, so caching an answer from before it would 
+    # keep a stale one. The inventory's lock stops a change from slipping in between the check and the put.
+    with getattr(available_nums, "lock", None) or nullcontext():
+        if available_nums.version == version:
+            for cache_key, phone_num in answers.items():
+                available_num_cache.put(cache_key, phone_num)
+
+def _match_endings(available_nums, local_array, wanted_by_modulus : dict[int, dict[int, list[str]]], results : dict[str, str|None]):
+    # Matches each group of endings against the stored ints in one vectorized pass, and fills in the first 
+    # number found for each of their words.
+    import numpy as np
+    for modulus, wanted in wanted_by_modulus.items():
+        remainders = local_array % modulus
+        hit_positions = np.flatnonzero(np.isin(remainders, np.fromiter(wanted, dtype=np.int64, count=len(wanted))))
+        found_remainders, first_hits = np.unique(remainders[hit_positions], return_index=True)
+        for remainder, position in zip(found_remainders.tolist(), hit_positions[first_hits].tolist()):
+            phone_num = available_nums[position]
+            for word in wanted[remainder]:
+                results[word] = phone_num
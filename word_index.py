@@ -0,0 +1,184 @@
+"""This module stores the digit-to-word index on disk, so that the program does not have to read the word
+source and spell check it every time it starts. The file is memory-mapped and read lazily: a lookup is a
+binary search over a sorted array of digit keys and a slice of the word data, so no Python objects are
+made for words that are never asked for.
+
+The file is laid out as:
+
+    header      magic, format version, sha256 of the word source, number of keys, size of word data
+    keys        sorted uint32 array of the digit strings, read as integers
+    offsets     uint32 array (one more than the keys) marking where each key's words start in the word data
+    word data   the words for each key, separated by newlines
+
+Run this module directly to build the index ahead of time.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"VWIX"
+# Bump this whenever the layout or the rules for which words go in the index change. Old files are rebuilt.
+FORMAT_VERSION = 2      # 2: two letter words are indexed, for phrases like GO-TAXI
+HEADER = struct.Struct("<4sHH32sII")
+
+# Throws an exception when an index file is damaged or was written by a different version of the program.
+class IndexFormatError(Exception):
+    def __init__(self, message="The word index file is not in a readable format"):
+        self.message = message
+        super().__init__(self.message)
+
+# Throws an exception when an index file was built from a different word source than the current one.
+class StaleIndexError(Exception):
+    def __init__(self, message="The word index was built from a different word source"):
+        self.message = message
+        super().__init__(self.message)
+
+def source_checksum(path : str) -> bytes:
+    # Returns the sha256 digest of the word source file, which ties an index to the words it came from.
+    digest = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+def write_word_index(word_index : dict[str, list[str]], path : str, checksum : bytes = bytes(32)):
+    # Writes a digit-to-word dict in the on-disk format. The file is written next to its destination and
+    # then moved into place, so a reader never sees half of an index.
+    digit_keys = sorted(word_index, key=int)
+    keys = array("I", (int(digits) for digits in digit_keys))
+    offsets = array("I", [0])
+    word_data = bytearray()
+    for digits in digit_keys:
+        word_data += "\n".join(word_index[digits]).encode("ascii")
+        offsets.append(len(word_data))
+    if sys.byteorder != "little":
+        keys.byteswap()
+        offsets.byteswap()
+
+    # Each writer gets its own temporary file, so two processes rebuilding the index at once cannot write
+    # into the same one.
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".word_index.")
+    try:
+        with os.fdopen(temp_fd, "wb") as index_file:
+            index_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, checksum, len(keys), len(word_data)))
+            index_file.write(keys.tobytes())
+            index_file.write(offsets.tobytes())
+            index_file.write(word_data)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+"""This class reads an index file written by write_word_index. It answers the same get() calls as the
+in-memory dict built by word_checker.build_word_index."""
+class WordIndex():
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as index_file:
+            try:
+                self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:      # an empty file cannot be mapped
+                raise IndexFormatError(f"{path} is empty") from None
+        try:
+            key_count = self._check_header(path)
+        except IndexFormatError:
+            self._map.close()
+            raise
+        offsets_start = HEADER.size + 4 * key_count
+        data_start = offsets_start + 4 * (key_count + 1)
+
+        view = memoryview(self._map)
+        if sys.byteorder == "little":
+            self._keys = view[HEADER.size:offsets_start].cast("I")
+            self._offsets = view[offsets_start:data_start].cast("I")
+        else:   # the file is little endian, so big endian machines keep a swapped copy of the small arrays
+            self._keys = array("I", view[HEADER.size:offsets_start])
+            self._offsets = array("I", view[offsets_start:data_start])
+            self._keys.byteswap()
+            self._offsets.byteswap()
+        self._data = view[data_start:]
+
+    def _check_header(self, path) -> int:
+        # Checks that the mapped file is a whole index in this format. Returns its number of keys.
+        if len(self._map) < HEADER.size:
+            raise IndexFormatError(f"{path} is too short to be a word index")
+        magic, version, _, self.checksum, key_count, data_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise IndexFormatError(f"{path} is not a word index")
+        if version != FORMAT_VERSION:
+            raise IndexFormatError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        if len(self._map) != HEADER.size + 4 * (2 * key_count + 1) + data_size:
+            raise IndexFormatError(f"{path} is truncated")
+        return key_count
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _position(self, digits : str) -> int|None:
+        # Finds where a digit string sits in the key array, or None if no word is spelled by it.
+        if not digits.isdigit():
+            return None
+        key = int(digits)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key and str(key) == digits:
+            return position
+        return None
+
+    def _words_at(self, position : int) -> list[str]:
+        return bytes(self._data[self._offsets[position]:self._offsets[position + 1]]).decode("ascii").split("\n")
+
+    def __contains__(self, digits):
+        return self._position(digits) is not None
+
+    def get(self, digits : str, default=None):
+        # Returns the words spelled by the digits, or the default if there are none.
+        position = self._position(digits)
+        if position is None:
+            return default
+        return self._words_at(position)
+
+    def items(self):
+        # Yields every digit string in the index, in key order, with its words.
+        for position in range(len(self._keys)):
+            yield str(self._keys[position]), self._words_at(position)
+
+    def close(self):
+        for view in (self._keys, self._offsets, self._data):
+            if isinstance(view, memoryview):
+                view.release()
+        self._map.close()
+
+def load_word_index(path : str, expected_checksum : bytes|None = None) -> WordIndex:
+    # Opens an index file. When a checksum is given, an index built from another word source is rejected.
+    word_index = WordIndex(path)
+    if expected_checksum is not None and word_index.checksum != expected_checksum:
+        word_index.close()
+        raise StaleIndexError(f"{path} was built from a different word source")
+    return word_index
+
+def build_index_file(source_path : str, output_path : str) -> int:
+    # Reads and spell checks the word source, then writes the index for it. Returns the number of keys.
+    import word_checker as wc
+    word_index = wc.build_word_index(wc.load_source_words(source_path))
+    write_word_index(word_index, output_path, source_checksum(source_path))
+    return len(word_index)
+
+def main(argv=None):
+    import argparse
+    import word_checker as wc
+    parser = argparse.ArgumentParser(description="Build the on-disk digit-to-word index.")
+    parser.add_argument("--source", default=wc.WORD_SOURCE_PATH, help="word list to index, one word per line")
+    parser.add_argument("--output", default=wc.WORD_INDEX_PATH, help="where to write the index file")
+    args = parser.parse_args(argv)
+    key_count = build_index_file(args.source, args.output)
+    print(f"Wrote {key_count} digit keys from {args.source} to {args.output}")
+
+if __name__ == "__main__":
+    main()